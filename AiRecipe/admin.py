@@ -1,14 +1,31 @@
 from django.contrib import admin
-from .models import AIGeneratedRecipe,ProTips
+from .models import AIGeneratedRecipe,ProTips,AIRecipeJob,AICallMetric
 
 
 
 @admin.register(AIGeneratedRecipe)
 class AIGeneratedRecipeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'recipe_type', 'cuisine', 'serving_size', 'created_at')
-    search_fields = ('user__username', 'cuisine', 'main_ingredients')
+    list_display = ('id', 'title', 'user', 'recipe_type', 'cuisine', 'serving_size', 'created_at')
+    search_fields = ('title', 'user__username', 'cuisine', 'main_ingredients')
     list_filter = ('recipe_type', 'cuisine', 'created_at')
-   
+
+
+
+
+@admin.register(AIRecipeJob)
+class AIRecipeJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'status', 'recipe', 'created_at', 'updated_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('user__username', 'user__email')
+    readonly_fields = ('payload', 'parsed_result', 'error')
+
+
+
+@admin.register(AICallMetric)
+class AICallMetricAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'endpoint', 'tier', 'call', 'model', 'latency_ms', 'prompt_tokens', 'completion_tokens', 'retries', 'error_class')
+    list_filter = ('endpoint', 'tier', 'call', 'model', 'error_class')
+    ordering = ('-created_at',)
 
 
 
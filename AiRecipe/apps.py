@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AirecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'AiRecipe'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+_LIST_SEPARATORS = re.compile(r"[,;\n]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize_text(value):
+    return _WHITESPACE.sub(" ", str(value or "")).strip().lower()
+
+
+def _normalize_list(value):
+    items = {_normalize_text(item) for item in _LIST_SEPARATORS.split(str(value or ""))}
+    items.discard("")
+    return sorted(items)
+
+
+def canonical_recipe_key(payload):
+    """
+    Build a cache key from the generation inputs. Ingredient and exclusion
+    lists are lowercased, deduplicated and sorted, and whitespace is
+    collapsed, so "Rice,  chicken" and "chicken, rice, rice" share a key.
+    """
+    canonical = {
+        'recipe_type': _normalize_text(payload.get('recipe_type')),
+        'cuisine': _normalize_text(payload.get('cuisine')),
+        'main_ingredients': _normalize_list(payload.get('main_ingredients')),
+        'serving_size': _normalize_text(payload.get('serving_size')),
+        'exclusion': _normalize_list(payload.get('exclusion')),
+    }
+    encoded = json.dumps(canonical, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class RecipeResultCache:
+    """
+    Thread-safe, size-bounded LRU cache with a per-entry TTL.
+    It is per process, so each worker process keeps its own entries and counters.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+recipe_cache = RecipeResultCache(
+    maxsize=settings.AI_RECIPE_CACHE_SIZE,
+    ttl=settings.AI_RECIPE_CACHE_TTL,
+)
@@ -0,0 +1,108 @@
+import logging
+import threading
+from io import BytesIO
+
+import requests
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .metrics import track_call
+from .models import AIGeneratedRecipe
+
+
+logger = logging.getLogger(__name__)
+
+# Formats browsers render directly; anything else is converted to JPEG
+PASSTHROUGH_FORMATS = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+}
+
+_session = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=settings.AI_JOB_WORKERS * 2,
+    max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504], allowed_methods=['GET']),
+)
+_session.mount('https://', _adapter)
+_session.mount('http://', _adapter)
+
+
+def recipe_image_name(filename):
+    """Apply AIGeneratedRecipe.image's upload_to to a bare filename."""
+    return AIGeneratedRecipe._meta.get_field('image').generate_filename(None, filename)
+
+
+class IngestCancellation:
+    """
+    Handshake between an ingest_remote_image() thread and the coroutine
+    awaiting it. A cancelled coroutine cannot stop the thread, so whichever
+    side finishes second deletes the stored file: the thread when the
+    caller gave up before the save, the caller when the file was already
+    saved but never handed over.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._stored = None
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    def stored(self, name):
+        """Thread side: record a saved file. Deletes it and returns None when the caller already gave up."""
+        with self._lock:
+            if not self._cancelled:
+                self._stored = name
+                return name
+        default_storage.delete(name)
+        return None
+
+    def cancel(self):
+        """Caller side: give up on the result, deleting the file if it was already saved."""
+        with self._lock:
+            self._cancelled = True
+            name, self._stored = self._stored, None
+        if name:
+            default_storage.delete(name)
+
+
+def ingest_remote_image(image_url, basename, cancellation=None):
+    """
+    Stream a generated image from `image_url` into default_storage and
+    return the stored name. Bytes are copied chunk by chunk from a pooled
+    session without decoding; only formats outside PASSTHROUGH_FORMATS are
+    decoded and re-encoded as JPEG.
+
+    With an IngestCancellation, a caller that gives up never leaves the
+    file behind, and the download is skipped if it gave up early enough.
+    """
+    if cancellation is None:
+        cancellation = IngestCancellation()
+    if cancellation.cancelled:
+        return None
+    with track_call('image_download') as call, \
+            _session.get(image_url, stream=True, timeout=settings.AI_IMAGE_TIMEOUT) as response:
+        # Retries made by the pooled adapter's Retry policy
+        call.retries = len(getattr(response.raw.retries, 'history', ()) or ())
+        response.raise_for_status()
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        extension = PASSTHROUGH_FORMATS.get(content_type)
+
+        if extension:
+            response.raw.decode_content = True
+            return cancellation.stored(default_storage.save(recipe_image_name(f"{basename}.{extension}"), File(response.raw)))
+
+        logger.info("Converting generated image from %r to JPEG", content_type)
+        image = Image.open(BytesIO(response.content))
+        buffer = BytesIO()
+        image.convert('RGB').save(buffer, format='JPEG')
+        return cancellation.stored(default_storage.save(recipe_image_name(f"{basename}.jpg"), ContentFile(buffer.getvalue())))
@@ -0,0 +1,105 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from subscription.constants import USAGE_AI_RECIPE
+from subscription.usage import release_usage
+
+from .models import AIRecipeJob
+from .metrics import ai_endpoint
+from .scheduler import ai_priority
+from .services import generate_ai_recipe
+
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.AI_JOB_WORKERS,
+    thread_name_prefix='ai-recipe-job',
+)
+
+
+def submit_ai_recipe_job(job):
+    """Queue a job on the worker pool once the creating transaction commits."""
+    transaction.on_commit(lambda: _executor.submit(run_ai_recipe_job, job.pk))
+
+
+def notify_job_update(job):
+    """Push the job status to the user's websocket group (see Task.consumers)."""
+    try:
+        channel_layer = get_channel_layer()
+        async_to_sync(channel_layer.group_send)(
+            f"user_{job.user_id}",
+            {
+                "type": "ai_recipe_job_update",
+                "job_id": str(job.id),
+                "status": job.status,
+                "recipe_id": job.recipe_id,
+                "error": job.error,
+            }
+        )
+    except Exception as e:
+        logger.warning("WebSocket job notification failed: %s", e)
+
+
+def _transition(job, from_status, **fields):
+    """Move `job` on from `from_status` unless something else (the expiry sweep) already did."""
+    fields['updated_at'] = timezone.now()
+    if not AIRecipeJob.objects.filter(pk=job.pk, status=from_status).update(**fields):
+        return False
+    for name, value in fields.items():
+        setattr(job, name, value)
+    return True
+
+
+def run_ai_recipe_job(job_id):
+    close_old_connections()
+    try:
+        job = AIRecipeJob.objects.select_related('user').get(pk=job_id)
+        if not _transition(job, 'pending', status='running'):
+            logger.warning("AI recipe job %s expired before it started", job_id)
+            return
+        notify_job_update(job)
+
+        try:
+            with ai_priority(job.user), ai_endpoint('generate-async'):
+                recipe, parsed = generate_ai_recipe(job.user, job.payload)
+        except Exception as e:
+            logger.exception("AI recipe job %s failed", job_id)
+            with transaction.atomic():
+                # Hand back the use reserved when the job was submitted, unless the sweep did
+                if _transition(job, 'running', status='failed', error=str(e)):
+                    release_usage(job.user, USAGE_AI_RECIPE)
+        else:
+            if not _transition(job, 'running', status='done', recipe=recipe, parsed_result=parsed):
+                logger.warning("AI recipe job %s finished after it expired; recipe %s kept", job_id, recipe.pk)
+                return
+        notify_job_update(job)
+    finally:
+        close_old_connections()
+
+
+def expire_stale_jobs():
+    """
+    Fail pending/running jobs that have not moved for AI_JOB_EXPIRY_MINUTES
+    and release the quota reserved for them. Jobs live in the in-process
+    worker pool, so a restart or crash leaves them stuck otherwise.
+    Returns the number of jobs expired.
+    """
+    cutoff = timezone.now() - timedelta(minutes=settings.AI_JOB_EXPIRY_MINUTES)
+    stale = AIRecipeJob.objects.filter(status__in=('pending', 'running'), updated_at__lt=cutoff).select_related('user')
+
+    expired = 0
+    for job in stale.iterator():
+        with transaction.atomic():
+            if not _transition(job, job.status, status='failed', error="The job was lost before it finished. Please try again."):
+                continue
+            release_usage(job.user, USAGE_AI_RECIPE)
+        notify_job_update(job)
+        expired += 1
+    return expired
@@ -0,0 +1,77 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from AiRecipe.models import AICallMetric
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Summarize logged outbound AI calls: latency percentiles, token usage, errors and "
+        "retries per endpoint, tier, call type and model, plus where generation time goes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=24, help="Report on calls made in the last N hours.")
+        parser.add_argument('--endpoint', help="Only include calls made by this endpoint.")
+        parser.add_argument('--prune-days', type=int, help="Delete logged calls older than N days after reporting.")
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(hours=options['hours'])
+        calls = AICallMetric.objects.filter(created_at__gte=since)
+        if options['endpoint']:
+            calls = calls.filter(endpoint=options['endpoint'])
+
+        groups = defaultdict(lambda: {'latencies': [], 'prompt': 0, 'completion': 0, 'retries': 0, 'errors': Counter()})
+        time_by_call = Counter()
+        rows = calls.values_list('endpoint', 'tier', 'call', 'model', 'latency_ms',
+                                 'prompt_tokens', 'completion_tokens', 'retries', 'error_class')
+        for endpoint, tier, call, model, latency_ms, prompt, completion, retries, error_class in rows.iterator(chunk_size=2000):
+            group = groups[(endpoint, tier, call, model)]
+            group['latencies'].append(latency_ms)
+            group['prompt'] += prompt
+            group['completion'] += completion
+            group['retries'] += retries
+            if error_class:
+                group['errors'][error_class] += 1
+            time_by_call[(endpoint, call)] += latency_ms
+
+        if not groups:
+            self.stdout.write(f"No AI calls logged since {since:%Y-%m-%d %H:%M}.")
+        else:
+            self.stdout.write(f"AI calls since {since:%Y-%m-%d %H:%M}\n")
+            self.stdout.write(
+                f"{'endpoint':<16} {'tier':<10} {'call':<15} {'model':<12} {'calls':>6} {'p50 ms':>8} "
+                f"{'p95 ms':>8} {'p99 ms':>8} {'prompt tok':>11} {'compl tok':>10} {'retries':>7}  errors"
+            )
+            for (endpoint, tier, call, model), group in sorted(groups.items()):
+                latencies = sorted(group['latencies'])
+                errors = ', '.join(f"{name}={count}" for name, count in group['errors'].most_common()) or '-'
+                self.stdout.write(
+                    f"{endpoint:<16} {tier:<10} {call:<15} {model or '-':<12} {len(latencies):>6} "
+                    f"{_percentile(latencies, 0.50):>8.0f} {_percentile(latencies, 0.95):>8.0f} "
+                    f"{_percentile(latencies, 0.99):>8.0f} {group['prompt']:>11} {group['completion']:>10} "
+                    f"{group['retries']:>7}  {errors}"
+                )
+
+            # Share of each endpoint's total outbound time spent per call type
+            self.stdout.write("\nTime spent per endpoint")
+            totals = Counter()
+            for (endpoint, _), spent in time_by_call.items():
+                totals[endpoint] += spent
+            for (endpoint, call), spent in sorted(time_by_call.items()):
+                self.stdout.write(f"  {endpoint:<16} {call:<15} {spent / 1000:>9.1f}s  {spent / totals[endpoint]:>5.0%}")
+
+        if options['prune_days']:
+            cutoff = timezone.now() - timedelta(days=options['prune_days'])
+            deleted, _ = AICallMetric.objects.filter(created_at__lt=cutoff).delete()
+            self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} logged calls older than {options['prune_days']} days."))
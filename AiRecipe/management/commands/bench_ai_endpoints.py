@@ -0,0 +1,170 @@
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+
+ENDPOINTS = ('generate', 'generate-async', 'generate-stream', 'pro-tips')
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the AI endpoints at a target concurrency and report latency percentiles, "
+        "throughput and saturation. Run against a server whose OPENAI_API_BASE points at "
+        "`manage.py fake_openai_server` to measure pipeline changes offline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--token', required=True, help="JWT access token of a member account.")
+        parser.add_argument('--admin-token', help="Admin JWT; enables sampling of adminapi/ai-scheduler/ during the run.")
+        parser.add_argument('--endpoint', choices=ENDPOINTS, default='generate')
+        parser.add_argument('--recipe-id', type=int, help="ManualRecipe id for --endpoint pro-tips.")
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--timeout', type=float, default=180)
+        parser.add_argument('--repeat-inputs', action='store_true',
+                            help="Send identical generation inputs (exercises the result cache).")
+
+    def handle(self, *args, **options):
+        if options['endpoint'] == 'pro-tips' and not options['recipe_id']:
+            raise CommandError("--recipe-id is required for --endpoint pro-tips")
+
+        self.options = options
+        self.base_url = options['base_url'].rstrip('/')
+        self.headers = {'Authorization': f"Bearer {options['token']}"}
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.active = 0
+        self.active_samples = []
+        self.scheduler_samples = []
+
+        stop_sampling = threading.Event()
+        sampler = threading.Thread(target=self._sample, args=(stop_sampling,), daemon=True)
+        sampler.start()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(self._run_one, range(options['requests'])))
+        elapsed = time.perf_counter() - started
+
+        stop_sampling.set()
+        sampler.join()
+        self._report(results, elapsed)
+
+    def _session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+            self.local.session.headers.update(self.headers)
+        return self.local.session
+
+    def _payload(self, index):
+        suffix = '' if self.options['repeat_inputs'] else f", bench-{index}-{time.time_ns()}"
+        return {
+            'recipe_type': 'food',
+            'cuisine': 'thai',
+            'main_ingredients': f"rice, egg{suffix}",
+            'serving_size': 2,
+        }
+
+    def _run_one(self, index):
+        with self.lock:
+            self.active += 1
+        started = time.perf_counter()
+        try:
+            status = self._call(index)
+        except requests.RequestException as e:
+            status = type(e).__name__
+        finally:
+            with self.lock:
+                self.active -= 1
+        return status, time.perf_counter() - started
+
+    def _call(self, index):
+        session = self._session()
+        endpoint = self.options['endpoint']
+        timeout = self.options['timeout']
+
+        if endpoint == 'pro-tips':
+            url = f"{self.base_url}/member/generate-pro-tips/{self.options['recipe_id']}/"
+            return session.post(url, timeout=timeout).status_code
+
+        url = f"{self.base_url}/member/ai-recipes/{endpoint}/"
+        if endpoint == 'generate-stream':
+            with session.post(url, json=self._payload(index), stream=True, timeout=timeout) as response:
+                for _ in response.iter_lines():
+                    pass
+                return response.status_code
+
+        response = session.post(url, json=self._payload(index), timeout=timeout)
+        if endpoint != 'generate-async' or response.status_code != 202:
+            return response.status_code
+
+        # Async jobs count as finished when the job reaches a final state
+        status_url = response.json()['status_url']
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            job = session.get(status_url, timeout=timeout).json()
+            if job['status'] == 'done':
+                return 201
+            if job['status'] == 'failed':
+                return 'job-failed'
+            time.sleep(0.25)
+        return 'job-timeout'
+
+    def _sample(self, stop):
+        admin_session = None
+        if self.options['admin_token']:
+            admin_session = requests.Session()
+            admin_session.headers['Authorization'] = f"Bearer {self.options['admin_token']}"
+
+        while not stop.wait(0.5):
+            with self.lock:
+                self.active_samples.append(self.active)
+            if admin_session is not None:
+                try:
+                    stats = admin_session.get(f"{self.base_url}/adminapi/ai-scheduler/", timeout=5).json()
+                    self.scheduler_samples.append(stats)
+                except (requests.RequestException, ValueError):
+                    pass
+
+    def _report(self, results, elapsed):
+        latencies = sorted(latency for _, latency in results)
+        statuses = Counter(str(status) for status, _ in results)
+        succeeded = sum(count for status, count in statuses.items() if status in ('200', '201'))
+        concurrency = self.options['concurrency']
+
+        self.stdout.write(f"Endpoint:      {self.options['endpoint']}")
+        self.stdout.write(f"Requests:      {len(results)} at concurrency {concurrency} in {elapsed:.2f}s")
+        self.stdout.write(f"Statuses:      {dict(statuses)}")
+        self.stdout.write(f"Throughput:    {len(results) / elapsed:.2f} req/s ({succeeded / elapsed:.2f} successful/s)")
+        self.stdout.write(
+            f"Latency (s):   p50 {_percentile(latencies, 0.50):.3f}  p95 {_percentile(latencies, 0.95):.3f}  "
+            f"p99 {_percentile(latencies, 0.99):.3f}  max {latencies[-1] if latencies else 0:.3f}"
+        )
+
+        if self.active_samples:
+            mean_active = sum(self.active_samples) / len(self.active_samples)
+            self.stdout.write(f"Client saturation: {mean_active / concurrency:.0%} of workers busy on average")
+
+        if self.scheduler_samples:
+            limit = self.scheduler_samples[-1]['limits']['max_in_flight']
+            peak_in_flight = max(sample['in_flight'] for sample in self.scheduler_samples)
+            mean_in_flight = sum(sample['in_flight'] for sample in self.scheduler_samples) / len(self.scheduler_samples)
+            peak_queue = max(sample['queue_depth'] for sample in self.scheduler_samples)
+            last = self.scheduler_samples[-1]
+            self.stdout.write(
+                f"Server scheduler: in-flight mean {mean_in_flight:.1f} / peak {peak_in_flight} of {limit} "
+                f"({mean_in_flight / limit:.0%} saturated), peak queue {peak_queue}, "
+                f"wait p95 {last['wait_seconds_p95']}s, rejected {last['rejected']}"
+            )
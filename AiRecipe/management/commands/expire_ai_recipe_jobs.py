@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from AiRecipe.jobs import expire_stale_jobs
+
+
+class Command(BaseCommand):
+    help = "Fail AI recipe jobs stuck pending/running (lost with a restarted worker process) and release their quota."
+
+    def handle(self, *args, **options):
+        expired = expire_stale_jobs()
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {expired} AI recipe jobs idle for more than {settings.AI_JOB_EXPIRY_MINUTES} minutes"
+        ))
@@ -0,0 +1,180 @@
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+
+RECIPE_TEXT = (
+    "### Recipe Name: Benchmark Fried Rice\n"
+    "### Description: A quick weeknight fried rice used for load testing.\n"
+    "#### Ingredients:\n- 2 cups cooked rice\n- 2 eggs\n- 1 tbsp soy sauce\n- 2 scallions\n"
+    "#### Instructions:\n1. Scramble the eggs.\n2. Fry the rice until hot.\n3. Season and fold in the eggs and scallions.\n"
+)
+
+FUNCTION_ARGUMENTS = {
+    "save_recipe": {
+        "title": "Benchmark Fried Rice",
+        "description": "A quick weeknight fried rice used for load testing.",
+        "ingredients": ["2 cups cooked rice", "2 eggs", "1 tbsp soy sauce", "2 scallions"],
+        "instructions": ["Scramble the eggs.", "Fry the rice until hot.", "Season and fold in the eggs and scallions."],
+    },
+    "save_pro_tips": {
+        "tips": ["Use day-old rice so it fries instead of steaming.", "Keep the wok very hot."],
+    },
+}
+
+
+def _png_bytes(size):
+    buffer = BytesIO()
+    Image.new('RGB', (size, size), (214, 140, 69)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    # Populated by the command before the server starts
+    options = {}
+    image_bytes = b''
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.options.get('verbose'):
+            super().log_message(format, *args)
+
+    def _sleep(self, latency_ms):
+        jitter = self.options['jitter_ms']
+        time.sleep(max(0, latency_ms + random.uniform(-jitter, jitter)) / 1000)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _maybe_fail(self):
+        if random.random() >= self.options['error_rate']:
+            return False
+        status = random.choice([429, 500, 503])
+        self._send_json(status, {"error": {"message": f"Injected fake error ({status})", "type": "fake_error", "code": status}})
+        return True
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_POST(self):
+        if self.path.endswith('/chat/completions'):
+            return self._chat_completion(self._read_json())
+        if self.path.endswith('/images/generations'):
+            return self._image_generation(self._read_json())
+        self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_GET(self):
+        if self.path.startswith('/images/'):
+            self._sleep(self.options['download_latency_ms'])
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(self.image_bytes)))
+            self.end_headers()
+            self.wfile.write(self.image_bytes)
+            return
+        self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def _chat_completion(self, body):
+        model = body.get('model', 'gpt-4')
+        usage = {"prompt_tokens": 350, "completion_tokens": 220, "total_tokens": 570}
+
+        if body.get('stream'):
+            return self._stream_completion(model)
+
+        self._sleep(self.options['chat_latency_ms'])
+        if self._maybe_fail():
+            return
+
+        functions = body.get('functions') or []
+        if functions:
+            name = functions[0]['name']
+            message = {"role": "assistant", "content": None, "function_call": {
+                "name": name, "arguments": json.dumps(FUNCTION_ARGUMENTS.get(name, {})),
+            }}
+        else:
+            message = {"role": "assistant", "content": RECIPE_TEXT}
+
+        self._send_json(200, {
+            "id": f"chatcmpl-fake-{random.randint(0, 10 ** 9)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    def _stream_completion(self, model):
+        if self._maybe_fail():
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        pieces = [RECIPE_TEXT[i:i + 12] for i in range(0, len(RECIPE_TEXT), 12)]
+        delay = self.options['chat_latency_ms'] / max(len(pieces), 1)
+        for piece in pieces:
+            self._sleep(delay)
+            chunk = {"object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def _image_generation(self, body):
+        self._sleep(self.options['image_latency_ms'])
+        if self._maybe_fail():
+            return
+        host, port = self.server.server_address[:2]
+        url = f"http://{self.options['public_host'] or host}:{port}/images/{random.randint(0, 10 ** 9)}.png"
+        self._send_json(200, {"created": int(time.time()), "data": [{"url": url} for _ in range(body.get('n', 1))]})
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local stand-in for the OpenAI chat completion and image endpoints. "
+        "Point OPENAI_API_BASE at http://<host>:<port>/v1 to load-test the AI endpoints offline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--public-host', default='', help="Host name used in returned image URLs (defaults to --host).")
+        parser.add_argument('--chat-latency-ms', type=float, default=2000)
+        parser.add_argument('--image-latency-ms', type=float, default=4000)
+        parser.add_argument('--download-latency-ms', type=float, default=100)
+        parser.add_argument('--jitter-ms', type=float, default=250)
+        parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of API calls answered with 429/500/503.")
+        parser.add_argument('--image-size', type=int, default=512)
+        parser.add_argument('--verbose', action='store_true')
+
+    def handle(self, *args, **options):
+        FakeOpenAIHandler.options = options
+        FakeOpenAIHandler.image_bytes = _png_bytes(options['image_size'])
+
+        server = ThreadingHTTPServer((options['host'], options['port']), FakeOpenAIHandler)
+        server.daemon_threads = True
+        self.stdout.write(self.style.SUCCESS(
+            f"Fake OpenAI listening on http://{options['host']}:{options['port']}/v1 "
+            f"(chat {options['chat_latency_ms']}ms, image {options['image_latency_ms']}ms, "
+            f"error rate {options['error_rate']:.0%})"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
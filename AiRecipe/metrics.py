@@ -0,0 +1,201 @@
+import bisect
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .scheduler import PRIORITY_SUBSCRIBER, call_priority
+
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+# Endpoint that the outbound calls made by the current request/job belong to
+call_endpoint = ContextVar('ai_call_endpoint', default='unknown')
+
+
+@contextmanager
+def ai_endpoint(name):
+    """Tag the enclosed OpenAI calls with the endpoint that made them."""
+    token = call_endpoint.set(name)
+    try:
+        yield
+    finally:
+        call_endpoint.reset(token)
+
+
+def current_tier():
+    return 'subscriber' if call_priority.get() == PRIORITY_SUBSCRIBER else 'free'
+
+
+class track_call:
+    """
+    Time one outbound AI call and record it on exit, tagged with the current
+    endpoint and tier. Works with `with` and `async with`:
+
+        async with track_call('chat', 'gpt-4') as call:
+            response = await openai.ChatCompletion.acreate(...)
+            call.usage(response)
+
+    An exception escaping the block is recorded as the error class and re-raised.
+    """
+
+    def __init__(self, call, model='', retries=0):
+        self.call = call
+        self.model = model
+        self.retries = retries
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def usage(self, response):
+        usage = response.get('usage') or {}
+        self.prompt_tokens = usage.get('prompt_tokens') or 0
+        self.completion_tokens = usage.get('completion_tokens') or 0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ai_metrics.record(
+            endpoint=call_endpoint.get(),
+            tier=current_tier(),
+            call=self.call,
+            model=self.model,
+            latency=time.perf_counter() - self.started,
+            prompt_tokens=self.prompt_tokens,
+            completion_tokens=self.completion_tokens,
+            retries=self.retries,
+            error_class=exc_type.__name__ if exc_type else '',
+        )
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+class AICallMetrics:
+    """
+    Per-process latency histograms and token/error counters for outbound AI
+    calls, keyed on (endpoint, tier, call, model). Each sample is also
+    buffered and written to AICallMetric in batches off the request path,
+    so reports can cover every process and survive restarts.
+    """
+
+    def __init__(self, db_log, flush_size, flush_interval):
+        self.db_log = db_log
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._series = defaultdict(self._new_series)
+        self._pending = []
+        self._flushed_at = time.monotonic()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ai-metrics')
+
+    @staticmethod
+    def _new_series():
+        return {
+            'count': 0,
+            'errors': defaultdict(int),
+            'latency_sum': 0.0,
+            'buckets': [0] * (len(LATENCY_BUCKETS) + 1),
+            'recent': deque(maxlen=1000),
+            'prompt_tokens': 0,
+            'completion_tokens': 0,
+            'retries': 0,
+        }
+
+    def record(self, endpoint, tier, call, model, latency, prompt_tokens=0, completion_tokens=0, retries=0, error_class=''):
+        sample = {
+            'endpoint': endpoint, 'tier': tier, 'call': call, 'model': model,
+            'latency_ms': round(latency * 1000, 1),
+            'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+            'retries': retries, 'error_class': error_class,
+        }
+        with self._lock:
+            series = self._series[(endpoint, tier, call, model)]
+            series['count'] += 1
+            series['latency_sum'] += latency
+            series['buckets'][bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+            series['recent'].append(latency)
+            series['prompt_tokens'] += prompt_tokens
+            series['completion_tokens'] += completion_tokens
+            series['retries'] += retries
+            if error_class:
+                series['errors'][error_class] += 1
+
+            if not self.db_log:
+                return
+            self._pending.append(sample)
+            if len(self._pending) < self.flush_size and time.monotonic() - self._flushed_at < self.flush_interval:
+                return
+            batch, self._pending = self._pending, []
+            self._flushed_at = time.monotonic()
+        self._writer.submit(self._write, batch)
+
+    @staticmethod
+    def _write(batch):
+        from .models import AICallMetric
+
+        close_old_connections()
+        try:
+            AICallMetric.objects.bulk_create([AICallMetric(**sample) for sample in batch])
+        except Exception:
+            logger.exception("Writing %s AI call metrics failed", len(batch))
+        finally:
+            close_old_connections()
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+            self._flushed_at = time.monotonic()
+        if batch:
+            self._writer.submit(self._write, batch).result()
+
+    def snapshot(self):
+        with self._lock:
+            series = []
+            for (endpoint, tier, call, model), data in sorted(self._series.items()):
+                recent = sorted(data['recent'])
+
+                def percentile(p):
+                    return round(recent[min(len(recent) - 1, int(p * len(recent)))], 4) if recent else 0.0
+
+                histogram = {f"le_{bound}": count for bound, count in zip(LATENCY_BUCKETS, data['buckets'])}
+                histogram['le_inf'] = data['buckets'][-1]
+                series.append({
+                    'endpoint': endpoint,
+                    'tier': tier,
+                    'call': call,
+                    'model': model,
+                    'count': data['count'],
+                    'errors': dict(data['errors']),
+                    'retries': data['retries'],
+                    'latency_seconds_avg': round(data['latency_sum'] / data['count'], 4),
+                    'latency_seconds_p50': percentile(0.50),
+                    'latency_seconds_p95': percentile(0.95),
+                    'latency_seconds_p99': percentile(0.99),
+                    'latency_histogram': histogram,
+                    'prompt_tokens': data['prompt_tokens'],
+                    'completion_tokens': data['completion_tokens'],
+                })
+            return {'series': series, 'pending_db_writes': len(self._pending)}
+
+
+ai_metrics = AICallMetrics(
+    db_log=settings.AI_METRICS_DB_LOG,
+    flush_size=settings.AI_METRICS_FLUSH_SIZE,
+    flush_interval=settings.AI_METRICS_FLUSH_INTERVAL,
+)
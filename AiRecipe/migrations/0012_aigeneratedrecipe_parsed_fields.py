@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AiRecipe', '0011_aigeneratedrecipe_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aigeneratedrecipe',
+            name='description',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='aigeneratedrecipe',
+            name='ingredients',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='aigeneratedrecipe',
+            name='instructions',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='aigeneratedrecipe',
+            name='title',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='aigeneratedrecipe',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='airecipe_user_created_idx'),
+        ),
+    ]
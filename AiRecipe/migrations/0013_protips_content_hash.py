@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('AiRecipe', '0012_aigeneratedrecipe_parsed_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='protips',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 of the recipe content the tips were generated from', max_length=64),
+        ),
+    ]
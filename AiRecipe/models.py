@@ -1,6 +1,8 @@
+import uuid
 from django.db import models
 from accounts.models import User
 from ManualRecipe.models import ManualRecipe
+from .constants import JOB_STATUS_CHOICES
 # Create your models here.
 
 
@@ -13,12 +15,41 @@ class AIGeneratedRecipe(models.Model):
     cuisine = models.CharField(max_length=300, blank=True)
     image_url = models.URLField(max_length=1024,blank=True, null=True)
     image = models.ImageField(upload_to='media/ai/recipes/images/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, help_text="Resized WebP/JPEG derivatives of image")
+
+    # Parsed sections of the generated recipe
+    title = models.CharField(max_length=255, blank=True)
+    description = models.TextField(blank=True)
+    ingredients = models.TextField(blank=True)
+    instructions = models.TextField(blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='airecipe_user_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.recipe_type} by {self.user.username}"
-    
+
+
+
+
+class AIRecipeJob(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ai_recipe_jobs')
+    payload = models.JSONField(help_text="Generation inputs (recipe_type, cuisine, main_ingredients, serving_size, exclusion)")
+    status = models.CharField(max_length=20, choices=JOB_STATUS_CHOICES, default='pending')
+    recipe = models.ForeignKey(AIGeneratedRecipe, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    parsed_result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"AI recipe job {self.id} ({self.status}) for {self.user.username}"
 
 
 
@@ -26,6 +57,7 @@ class AIGeneratedRecipe(models.Model):
 class ProTips(models.Model):
     manual_recipe = models.OneToOneField(ManualRecipe, on_delete=models.CASCADE, related_name='pro_tips')
     tips = models.TextField(help_text="AI-generated pro tips for the recipe")
+    content_hash = models.CharField(max_length=64, blank=True, help_text="SHA-256 of the recipe content the tips were generated from")
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -39,3 +71,23 @@ class ProTips(models.Model):
 
 
     
+
+
+
+
+class AICallMetric(models.Model):
+    """One outbound AI call (chat, streamed chat, image or image download)."""
+    endpoint = models.CharField(max_length=50)
+    tier = models.CharField(max_length=20)
+    call = models.CharField(max_length=30)
+    model = models.CharField(max_length=50, blank=True)
+    latency_ms = models.FloatField()
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    retries = models.PositiveSmallIntegerField(default=0)
+    error_class = models.CharField(max_length=100, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.endpoint} {self.call} {self.model} {self.latency_ms}ms"
@@ -0,0 +1,20 @@
+from rest_framework.pagination import CursorPagination
+
+
+
+class AIRecipeCursorPagination(CursorPagination):
+    """Keyset pagination over (created_at, id), served by airecipe_user_created_idx."""
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+
+
+
+class ProTipsCursorPagination(CursorPagination):
+    """Keyset pagination over (created_at, id) for a member's pro tips."""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
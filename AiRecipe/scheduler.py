@@ -0,0 +1,197 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from subscription.entitlements import has_active_subscription
+
+
+PRIORITY_SUBSCRIBER = 0
+PRIORITY_FREE = 1
+
+# Priority of the outbound calls made while handling the current request/job
+call_priority = ContextVar('ai_call_priority', default=PRIORITY_FREE)
+
+
+class SchedulerSaturated(Exception):
+    """Raised when the call queue is full or a call waited longer than allowed."""
+
+
+def priority_for_user(user):
+    if has_active_subscription(user):
+        return PRIORITY_SUBSCRIBER
+    return PRIORITY_FREE
+
+
+@contextmanager
+def ai_priority(user):
+    """Run the enclosed OpenAI calls at the user's tier priority."""
+    token = call_priority.set(priority_for_user(user))
+    try:
+        yield
+    finally:
+        call_priority.reset(token)
+
+
+class OpenAICallScheduler:
+    """
+    Process-wide gate for outbound OpenAI calls.
+
+    A call needs a token from a token bucket (`rate` per second, up to
+    `burst` banked) and a free in-flight slot (`max_in_flight`). Waiting
+    calls sit in a bounded priority queue: subscribers go ahead of free
+    tier, FIFO within a tier. When `max_queue` calls are already waiting,
+    new calls are rejected straight away with SchedulerSaturated. The same
+    happens to a call that waits longer than `max_wait` seconds.
+
+    Limits apply per server process; each daphne process has its own bucket.
+    """
+
+    def __init__(self, rate, burst, max_in_flight, max_queue, max_wait):
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self._cond = threading.Condition()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._in_flight = 0
+
+        self._submitted = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._waits = deque(maxlen=1000)
+        # Waiters for async callers block here instead of on the event loop
+        self._waiter_pool = ThreadPoolExecutor(max_workers=max(max_queue, 1), thread_name_prefix='ai-scheduler')
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _remove(self, ticket):
+        self._queue.remove(ticket)
+        heapq.heapify(self._queue)
+
+    def acquire(self, priority=None):
+        if priority is None:
+            priority = call_priority.get()
+
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self._rejected += 1
+                raise SchedulerSaturated("Too many AI requests are queued. Please try again shortly.")
+
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._queue, ticket)
+            self._submitted += 1
+            enqueued_at = time.monotonic()
+            deadline = enqueued_at + self.max_wait
+
+            while True:
+                self._refill()
+                if self._queue[0] == ticket and self._in_flight < self.max_in_flight and self._tokens >= 1:
+                    heapq.heappop(self._queue)
+                    self._tokens -= 1
+                    self._in_flight += 1
+                    self._waits.append(time.monotonic() - enqueued_at)
+                    self._cond.notify_all()
+                    return
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._remove(ticket)
+                    self._timed_out += 1
+                    self._cond.notify_all()
+                    raise SchedulerSaturated("Timed out waiting for AI capacity. Please try again shortly.")
+
+                timeout = remaining
+                if self._tokens < 1:
+                    timeout = min(timeout, (1 - self._tokens) / self.rate)
+                self._cond.wait(timeout)
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _release_abandoned(self, waiter):
+        # A waiter cancelled before its thread ran, or whose acquire() raised, holds no slot
+        if waiter.cancelled() or waiter.exception() is not None:
+            return
+        self.release()
+
+    @contextmanager
+    def slot(self, priority=None):
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self, priority=None):
+        if priority is None:
+            priority = call_priority.get()
+        future = self._waiter_pool.submit(self.acquire, priority)
+        try:
+            await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # The waiting thread cannot be interrupted; hand its slot back once it gets one
+            future.add_done_callback(self._release_abandoned)
+            raise
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._cond:
+            self._refill()
+            waits = sorted(self._waits)
+            by_priority = {}
+            for priority, _ in self._queue:
+                by_priority[priority] = by_priority.get(priority, 0) + 1
+
+            def percentile(p):
+                return round(waits[min(len(waits) - 1, int(p * len(waits)))], 4) if waits else 0.0
+
+            return {
+                'queue_depth': len(self._queue),
+                'queue_depth_subscriber': by_priority.get(PRIORITY_SUBSCRIBER, 0),
+                'queue_depth_free': by_priority.get(PRIORITY_FREE, 0),
+                'in_flight': self._in_flight,
+                'tokens_available': round(self._tokens, 2),
+                'submitted': self._submitted,
+                'rejected': self._rejected,
+                'timed_out': self._timed_out,
+                'wait_seconds_p50': percentile(0.50),
+                'wait_seconds_p95': percentile(0.95),
+                'wait_seconds_max': round(waits[-1], 4) if waits else 0.0,
+                'limits': {
+                    'rate_per_second': self.rate,
+                    'burst': self.burst,
+                    'max_in_flight': self.max_in_flight,
+                    'max_queue': self.max_queue,
+                    'max_wait_seconds': self.max_wait,
+                },
+            }
+
+
+ai_scheduler = OpenAICallScheduler(
+    rate=settings.AI_SCHEDULER_RATE,
+    burst=settings.AI_SCHEDULER_BURST,
+    max_in_flight=settings.AI_SCHEDULER_MAX_IN_FLIGHT,
+    max_queue=settings.AI_SCHEDULER_MAX_QUEUE,
+    max_wait=settings.AI_SCHEDULER_MAX_WAIT,
+)
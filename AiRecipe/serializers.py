@@ -1,12 +1,41 @@
 from rest_framework import serializers
-from .models import AIGeneratedRecipe,ProTips
-from ManualRecipe.serializers import ManualRecipeSerializer
+from .models import AIGeneratedRecipe,ProTips,AIRecipeJob
+from ManualRecipe.serializers import ManualRecipeSerializer, ManualRecipeSummarySerializer
+from accounts.fieldsets import SparseFieldsetMixin
+from accounts.serializers import ImageVariantsField
+
+class AIGeneratedRecipeSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+    sparse_field_sources = {'image_url': ['image']}
 
-class AIGeneratedRecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = AIGeneratedRecipe
         fields = '__all__'
-        read_only_fields = ['user']
+        read_only_fields = ['user', 'title', 'description', 'ingredients', 'instructions']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'image_url' in data:
+            # image_url mirrors the stored image, so expose the absolute image URL
+            data['image_url'] = data['image'] if 'image' in data else self._absolute_image_url(instance)
+        return data
+
+    def _absolute_image_url(self, instance):
+        if not instance.image:
+            return None
+        request = self.context.get('request')
+        return request.build_absolute_uri(instance.image.url) if request is not None else instance.image.url
+
+
+
+
+class AIRecipeJobSerializer(serializers.ModelSerializer):
+    recipe = AIGeneratedRecipeSerializer(read_only=True)
+
+    class Meta:
+        model = AIRecipeJob
+        fields = ['id', 'status', 'recipe', 'parsed_result', 'error', 'created_at', 'updated_at']
+        read_only_fields = fields
 
 
 
@@ -16,4 +45,13 @@ class ProTipsSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProTips
         fields = ['manual_recipe', 'tips', 'created_at', 'updated_at']
-        
\ No newline at end of file
+
+
+
+
+class ProTipsSummarySerializer(serializers.ModelSerializer):
+    manual_recipe = ManualRecipeSummarySerializer(read_only=True)
+
+    class Meta:
+        model = ProTips
+        fields = ['manual_recipe', 'tips', 'created_at', 'updated_at']
@@ -0,0 +1,346 @@
+import asyncio
+import hashlib
+import logging
+
+import openai
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .cache import canonical_recipe_key, recipe_cache
+from .images import IngestCancellation, ingest_remote_image
+from .metrics import track_call
+from .scheduler import ai_scheduler
+from .structured import PRO_TIPS_FUNCTION, RECIPE_FUNCTION, astructured_completion, validate_pro_tips_output, validate_recipe_output
+from .models import AIGeneratedRecipe
+from .utils import IncrementalRecipeParser, parse_ai_recipe_response
+
+
+openai.api_key = settings.OPENAI_API_KEY
+openai.api_base = settings.OPENAI_API_BASE
+logger = logging.getLogger(__name__)
+
+REQUIRED_RECIPE_FIELDS = ('recipe_type', 'cuisine', 'main_ingredients', 'serving_size')
+
+
+def extract_recipe_payload(data):
+    """
+    Pull the generation inputs out of request data.
+    Returns None when a required field is missing.
+    """
+    payload = {
+        'recipe_type': data.get('recipe_type'),
+        'cuisine': data.get('cuisine'),
+        'main_ingredients': data.get('main_ingredients'),
+        'serving_size': data.get('serving_size'),
+        'exclusion': data.get('exclusion', ''),
+    }
+    if not all(payload[field] for field in REQUIRED_RECIPE_FIELDS):
+        return None
+    return payload
+
+
+def build_recipe_prompt(payload):
+    recipe_type = payload['recipe_type']
+    prompt = (
+        f"Generate a recipe for {recipe_type} with the following details:\n"
+        f"Generate a food image for {recipe_type} with the following details:\n...do not provide any kind of text with the image when showing the output..skip the label part..."
+        f"Cuisine: {payload['cuisine']}\n"
+        f"Main Ingredients: {payload['main_ingredients']}\n"
+        f"Serving Size: {payload['serving_size']}\n"
+    )
+    if payload.get('exclusion'):
+        prompt += f"Exclude ingredients or items: {payload['exclusion']}\n"
+    prompt += "\nPlease provide a recipe name, followed by '#### Ingredients:' and '#### Instructions:'"
+
+    prompt += (
+        "\nPlease provide a recipe in the following format:\n"
+        "### Recipe Name: <Name>\n"
+        "### Description: <A short paragraph describing the dish>\n"
+        "#### Ingredients:\n<List of ingredients>\n"
+        "#### Instructions:\n<Step-by-step instructions>"
+    )
+    return prompt
+
+
+def recipe_image_basename(cache_key):
+    """Generated images are shared through the result cache, so they are named after the inputs, never the requester."""
+    return f"recipes/images/{cache_key[:32]}"
+
+
+async def _generate_recipe_content(prompt):
+    """Return the parsed recipe, via function calling unless AI_STRUCTURED_OUTPUT is off."""
+    messages = [{"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": prompt}]
+
+    if settings.AI_STRUCTURED_OUTPUT:
+        return await astructured_completion(
+            messages,
+            RECIPE_FUNCTION,
+            validate_recipe_output,
+            parse_ai_recipe_response,
+            model="gpt-4-turbo",
+            temperature=0.7,
+            request_timeout=settings.AI_CHAT_TIMEOUT,
+        )
+
+    async with ai_scheduler.aslot():
+        async with track_call('chat', 'gpt-4-turbo') as call:
+            response = await openai.ChatCompletion.acreate(
+                model="gpt-4-turbo",
+                messages=messages,
+                temperature=0.7,
+                request_timeout=settings.AI_CHAT_TIMEOUT,
+            )
+            call.usage(response)
+    return parse_ai_recipe_response(response['choices'][0]['message']['content'])
+
+
+async def _generate_recipe_image(prompt, image_basename):
+    logger.info(f"Generating image with prompt: {prompt}")
+    async with ai_scheduler.aslot():
+        async with track_call('image', 'dall-e-2'):
+            image_response = await openai.Image.acreate(
+                prompt=prompt,
+                n=1,
+                size="512x512",
+                request_timeout=settings.AI_IMAGE_TIMEOUT,
+            )
+    image_url = image_response['data'][0]['url']  # URL returned by OpenAI
+    cancellation = IngestCancellation()
+    try:
+        return await asyncio.to_thread(ingest_remote_image, image_url, image_basename, cancellation)
+    except asyncio.CancelledError:
+        # The ingest thread keeps running; it (or this call) deletes whatever it stores
+        cancellation.cancel()
+        raise
+
+
+def _discard_stored_image(image_task):
+    # Covers an image that was fully ingested before the task was cancelled;
+    # an ingest still in flight cleans up after itself (see IngestCancellation)
+    if not image_task.cancelled() and image_task.exception() is None and image_task.result():
+        default_storage.delete(image_task.result())
+
+
+async def _image_or_none(image_task):
+    try:
+        return await image_task
+    except asyncio.TimeoutError:
+        logger.warning("Recipe image generation timed out after %ss", settings.AI_IMAGE_TIMEOUT)
+    except Exception as e:
+        logger.warning("Recipe image generation failed: %s", e)
+    return None
+
+
+async def run_generation_calls(prompt, image_basename):
+    """
+    Fire the chat completion and the image generation (plus its ingestion
+    into storage) at the same time, each under its own timeout.
+
+    A failed or timed-out chat call cancels the image call and re-raises.
+    A failed or timed-out image call is logged and yields None, so the
+    recipe text is never held back by a slow image.
+    Returns (parsed_recipe, stored_image_name_or_None).
+    """
+    text_task = asyncio.ensure_future(
+        asyncio.wait_for(_generate_recipe_content(prompt), timeout=settings.AI_CHAT_TIMEOUT)
+    )
+    image_task = asyncio.ensure_future(
+        asyncio.wait_for(_generate_recipe_image(prompt, image_basename), timeout=settings.AI_IMAGE_TIMEOUT)
+    )
+
+    try:
+        parsed = await text_task
+    except BaseException:
+        image_task.cancel()
+        image_task.add_done_callback(_discard_stored_image)
+        raise
+
+    image_name = await _image_or_none(image_task)
+
+    return parsed, image_name
+
+
+def _new_recipe(user, payload, parsed):
+    return AIGeneratedRecipe(
+        user=user,
+        recipe_type=payload['recipe_type'],
+        main_ingredients=payload['main_ingredients'],
+        serving_size=payload['serving_size'],
+        exclusion=payload.get('exclusion', ''),
+        cuisine=payload['cuisine'],
+        title=parsed['title'][:255],
+        description=parsed['description'],
+        ingredients=parsed['ingredients'],
+        instructions=parsed['instructions'],
+    )
+
+
+def create_recipe_from_cache(user, payload, cached):
+    """Create the user's row for a cache hit, sharing the stored image file."""
+    recipe = _new_recipe(user, payload, cached['parsed'])
+    recipe.image = cached['image']
+    recipe.image_url = cached['image']
+    recipe.save()
+    return recipe
+
+
+def save_generated_recipe(user, payload, parsed, image_name, cache_key):
+    """Store a freshly generated recipe in one write and cache complete results."""
+    recipe = _new_recipe(user, payload, parsed)
+    recipe.image = image_name
+    recipe.image_url = image_name
+    recipe.save()
+
+    # Incomplete results are not cached so the next request retries the image
+    if image_name:
+        recipe_cache.set(cache_key, {'parsed': parsed, 'image': image_name})
+    return recipe
+
+
+def generate_ai_recipe(user, payload):
+    """
+    Run the generation pipeline (recipe text and image concurrently) and
+    store the resulting AIGeneratedRecipe. Returns (recipe, parsed_result).
+
+    Results are cached on the normalized inputs; a cache hit skips OpenAI
+    but still creates the user's row, sharing the stored image file.
+    """
+    cache_key = canonical_recipe_key(payload)
+    cached = recipe_cache.get(cache_key)
+    if cached is not None:
+        return create_recipe_from_cache(user, payload, cached), dict(cached['parsed'])
+
+    prompt = build_recipe_prompt(payload)
+    parsed, image_name = async_to_sync(run_generation_calls)(prompt, recipe_image_basename(cache_key))
+
+    recipe = save_generated_recipe(user, payload, parsed, image_name, cache_key)
+    return recipe, parsed
+
+
+async def _read_streamed_completion(prompt, deltas):
+    """
+    Read the streamed recipe completion into the `deltas` queue, then put
+    None. The call is timed and holds its slot only until the upstream
+    stream ends, not while the SSE client is still reading the sections.
+    """
+    try:
+        async with ai_scheduler.aslot():
+            # Streamed completions report no token usage, so only latency is recorded
+            async with track_call('chat_stream', 'gpt-4-turbo'):
+                completion = await openai.ChatCompletion.acreate(
+                    model="gpt-4-turbo",
+                    messages=[{"role": "system", "content": "You are a helpful assistant."},
+                              {"role": "user", "content": prompt}],
+                    temperature=0.7,
+                    stream=True,
+                    request_timeout=settings.AI_CHAT_TIMEOUT,
+                )
+                async for chunk in completion:
+                    delta = chunk['choices'][0].get('delta', {}).get('content')
+                    if delta:
+                        deltas.put_nowait(delta)
+    finally:
+        deltas.put_nowait(None)
+
+
+async def stream_ai_recipe(user, payload):
+    """
+    Async generator behind the streaming endpoint. Yields ('section',
+    {name, value}) as each recipe section closes in the streamed
+    completion, then a final ('recipe', AIGeneratedRecipe) once the
+    concurrently generated image is stored.
+    """
+    cache_key = canonical_recipe_key(payload)
+    cached = recipe_cache.get(cache_key)
+    if cached is not None:
+        for name, value in cached['parsed'].items():
+            yield 'section', {'name': name, 'value': value}
+        recipe = await sync_to_async(create_recipe_from_cache)(user, payload, cached)
+        yield 'recipe', recipe
+        return
+
+    prompt = build_recipe_prompt(payload)
+    image_basename = recipe_image_basename(cache_key)
+    image_task = asyncio.ensure_future(
+        asyncio.wait_for(_generate_recipe_image(prompt, image_basename), timeout=settings.AI_IMAGE_TIMEOUT)
+    )
+    parser = IncrementalRecipeParser()
+    deltas = asyncio.Queue()
+    completion_task = asyncio.ensure_future(_read_streamed_completion(prompt, deltas))
+
+    try:
+        while True:
+            delta = await deltas.get()
+            if delta is None:
+                break
+            for name, value in parser.feed(delta):
+                yield 'section', {'name': name, 'value': value}
+        # Re-raises the upstream error, if that is what ended the stream
+        await completion_task
+        for name, value in parser.close():
+            yield 'section', {'name': name, 'value': value}
+    except BaseException:
+        completion_task.cancel()
+        image_task.cancel()
+        image_task.add_done_callback(_discard_stored_image)
+        raise
+
+    image_name = await _image_or_none(image_task)
+
+    parsed = dict(parser.result)
+    recipe = await sync_to_async(save_generated_recipe)(user, payload, parsed, image_name, cache_key)
+    yield 'recipe', recipe
+
+
+def build_pro_tips_prompt(manual_recipe):
+    # Collect all relevant information from the ManualRecipe object
+    prompt = f"Provide pro tips for preparing the dish '{manual_recipe.dish_name}'.\n"
+    prompt += f"Description: {manual_recipe.dish_description}\n"
+    prompt += f"Ingredients: {manual_recipe.ingredients}\n"
+    prompt += f"Directions: {manual_recipe.directions}\n"
+    prompt += f"Menu Type: {manual_recipe.menu_type}\n"
+    prompt += f"Tags: {manual_recipe.tags}\n"
+    prompt += f"Price: {manual_recipe.dish_price}\n"
+    prompt += f"Food Cost: {manual_recipe.food_cost}\n"
+    prompt += f"Cooking Station: {manual_recipe.cooking_station}\n"
+    prompt += f"Instructions: {manual_recipe.text_instructions}\n"
+    prompt += f"Additional Information: {manual_recipe.food_percent_markup}% markup\n"
+    prompt += f"Date to serve: {manual_recipe.date_to_serve}\n"
+    return prompt
+
+
+def pro_tips_content_hash(prompt):
+    """The prompt holds every recipe field the tips depend on, so its hash identifies the content."""
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+async def agenerate_pro_tips(prompt):
+    messages = [{"role": "system", "content": "You are a helpful assistant."},
+                {"role": "user", "content": prompt}]
+
+    if settings.AI_STRUCTURED_OUTPUT:
+        # JSON list of tips, validated in one pass with a bounded repair turn
+        return await astructured_completion(
+            messages,
+            PRO_TIPS_FUNCTION,
+            validate_pro_tips_output,
+            model="gpt-4",
+            max_tokens=300,
+            temperature=0.7,
+            request_timeout=settings.AI_CHAT_TIMEOUT,
+        )
+
+    # Call OpenAI API to generate pro tips using ChatCompletion (gpt-4 or gpt-3.5-turbo)
+    async with ai_scheduler.aslot():
+        async with track_call('chat', 'gpt-4') as call:
+            response = await openai.ChatCompletion.acreate(
+                model="gpt-4",
+                messages=messages,
+                max_tokens=200,
+                temperature=0.7,
+                request_timeout=settings.AI_CHAT_TIMEOUT,
+            )
+            call.usage(response)
+    return response['choices'][0]['message']['content'].strip()
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from accounts.imaging import queue_image_variants
+from subscription.constants import USAGE_AI_RECIPE, USAGE_PRO_TIP
+from subscription.usage import release_usage
+from ManualRecipe.models import ManualRecipe
+from .models import AIGeneratedRecipe, ProTips
+
+
+@receiver(post_save, sender=AIGeneratedRecipe)
+def queue_ai_recipe_image_variants(sender, instance, **kwargs):
+    queue_image_variants(instance)
+
+
+@receiver(post_delete, sender=AIGeneratedRecipe)
+def release_ai_recipe_usage(sender, instance, **kwargs):
+    release_usage(instance.user_id, USAGE_AI_RECIPE)
+
+
+@receiver(post_delete, sender=ProTips)
+def release_pro_tip_usage(sender, instance, **kwargs):
+    # Cascades from a ManualRecipe delete run before the recipe row is removed
+    user_id = ManualRecipe.objects.filter(pk=instance.manual_recipe_id).values_list('user_id', flat=True).first()
+    if user_id:
+        release_usage(user_id, USAGE_PRO_TIP)
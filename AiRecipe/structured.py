@@ -0,0 +1,129 @@
+import json
+import logging
+
+import openai
+from django.conf import settings
+
+from .metrics import track_call
+from .scheduler import ai_scheduler
+
+
+logger = logging.getLogger(__name__)
+
+
+RECIPE_FUNCTION = {
+    "name": "save_recipe",
+    "description": "Save the generated recipe.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "title": {"type": "string", "description": "Recipe name"},
+            "description": {"type": "string", "description": "A short paragraph describing the dish"},
+            "ingredients": {"type": "array", "items": {"type": "string"}, "description": "One ingredient with its quantity per item"},
+            "instructions": {"type": "array", "items": {"type": "string"}, "description": "One step per item, in order"},
+        },
+        "required": ["title", "description", "ingredients", "instructions"],
+    },
+}
+
+PRO_TIPS_FUNCTION = {
+    "name": "save_pro_tips",
+    "description": "Save professional tips for preparing the dish.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "tips": {"type": "array", "items": {"type": "string"}, "description": "One concise tip per item"},
+        },
+        "required": ["tips"],
+    },
+}
+
+
+class StructuredOutputError(ValueError):
+    pass
+
+
+def _load_arguments(arguments):
+    try:
+        data = json.loads(arguments or "")
+    except json.JSONDecodeError as e:
+        raise StructuredOutputError(f"arguments are not valid JSON ({e})")
+    if not isinstance(data, dict):
+        raise StructuredOutputError("arguments must be a JSON object")
+    return data
+
+
+def _check_fields(data, strings=(), string_lists=()):
+    """Collect every problem in one pass so a repair prompt can list them all."""
+    errors = []
+    for field in strings:
+        if not isinstance(data.get(field), str) or not data[field].strip():
+            errors.append(f"'{field}' must be a non-empty string")
+    for field in string_lists:
+        value = data.get(field)
+        if not isinstance(value, list) or not value or not all(isinstance(item, str) and item.strip() for item in value):
+            errors.append(f"'{field}' must be a non-empty list of non-empty strings")
+    if errors:
+        raise StructuredOutputError("; ".join(errors))
+
+
+def validate_recipe_output(arguments):
+    """Validate save_recipe arguments and return them in parse_ai_recipe_response's shape."""
+    data = _load_arguments(arguments)
+    _check_fields(data, strings=("title", "description"), string_lists=("ingredients", "instructions"))
+    return {
+        "title": data["title"].strip(),
+        "description": data["description"].strip(),
+        "ingredients": "\n".join(f"- {item.strip()}" for item in data["ingredients"]),
+        "instructions": "\n".join(f"{number}. {step.strip()}" for number, step in enumerate(data["instructions"], start=1)),
+    }
+
+
+def validate_pro_tips_output(arguments):
+    """Validate save_pro_tips arguments and return the tips as a bulleted text block."""
+    data = _load_arguments(arguments)
+    _check_fields(data, string_lists=("tips",))
+    return "\n".join(f"- {tip.strip()}" for tip in data["tips"])
+
+
+def _function_arguments(response):
+    message = response['choices'][0]['message']
+    function_call = message.get('function_call') or {}
+    return function_call.get('arguments'), message.get('content') or ""
+
+
+async def astructured_completion(messages, function, validator, fallback=None, **kwargs):
+    """
+    Request `function` arguments from the chat model and validate them in a
+    single pass. Invalid output gets up to AI_STRUCTURED_REPAIR_ATTEMPTS
+    repair turns that send back the validation errors instead of
+    regenerating from scratch; StructuredOutputError is raised if it is
+    still invalid. `fallback` (the regex parser for recipes) only handles
+    a model that answered in free text instead of calling the function:
+    applied to function arguments it would yield an empty recipe.
+    """
+    request = dict(kwargs, functions=[function], function_call={"name": function["name"]})
+    conversation = list(messages)
+
+    for attempt in range(settings.AI_STRUCTURED_REPAIR_ATTEMPTS + 1):
+        async with ai_scheduler.aslot():
+            # Repair turns are recorded as retries of the same call
+            async with track_call('chat', request.get('model', ''), retries=attempt) as call:
+                response = await openai.ChatCompletion.acreate(messages=conversation, **request)
+                call.usage(response)
+        arguments, content = _function_arguments(response)
+        if arguments is None and content and fallback is not None:
+            # The model answered in free text; the fallback parser handles that directly
+            return fallback(content)
+        try:
+            return validator(arguments)
+        except StructuredOutputError as e:
+            logger.warning("Structured output for %s invalid (attempt %s): %s", function["name"], attempt + 1, e)
+            conversation = conversation + [
+                {"role": "assistant", "content": None,
+                 "function_call": {"name": function["name"], "arguments": arguments or content}},
+                {"role": "user", "content": f"Those arguments were invalid: {e}. "
+                                            f"Call {function['name']} again with corrected arguments only."},
+            ]
+
+    raise StructuredOutputError(f"{function['name']} returned invalid output after repair")
@@ -1,3 +1,810 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import queue
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import openai
+from asgiref.sync import async_to_sync
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from ManualRecipe.models import ManualRecipe
+from subscription.constants import USAGE_AI_RECIPE, USAGE_PRO_TIP
+from subscription.models import Subscription, UsageCounter
+from subscription.usage import reserve_usage
+from .cache import RecipeResultCache, canonical_recipe_key, recipe_cache
+from .images import ingest_remote_image
+from .jobs import expire_stale_jobs, run_ai_recipe_job
+from .management.commands import fake_openai_server
+from .metrics import AICallMetrics, ai_metrics
+from .models import AICallMetric, AIGeneratedRecipe, AIRecipeJob, ProTips
+from .scheduler import OpenAICallScheduler, SchedulerSaturated
+from .services import (
+    build_pro_tips_prompt, generate_ai_recipe, pro_tips_content_hash, run_generation_calls, stream_ai_recipe,
+)
+from .structured import RECIPE_FUNCTION, StructuredOutputError, astructured_completion, validate_recipe_output
+from .utils import IncrementalRecipeParser, parse_ai_recipe_response
+from .views import BulkProTipsAPIView
+
+
+PARSED_RECIPE = {
+    'title': 'Test Dish',
+    'description': 'Nice.',
+    'ingredients': '- 2 cups rice',
+    'instructions': '1. Cook.',
+}
+RECIPE_TEXT = (
+    "### Recipe Name: Stew\n### Description: Hearty.\n"
+    "#### Ingredients:\n- beef\n- onion\n#### Instructions:\n1. Simmer.\n2. Serve."
+)
+RECIPE_PAYLOAD = {
+    'recipe_type': 'food',
+    'cuisine': 'thai',
+    'main_ingredients': 'rice, chicken',
+    'serving_size': '2',
+    'exclusion': '',
+}
+
+
+def member(email):
+    return User.objects.create(email=email, username=email, role='member')
+
+
+def chat_response(arguments=None, content=None):
+    message = {'role': 'assistant', 'content': content}
+    if arguments is not None:
+        message['function_call'] = {'name': RECIPE_FUNCTION['name'], 'arguments': arguments}
+    return {'choices': [{'message': message}], 'usage': {'prompt_tokens': 1, 'completion_tokens': 1}}
+
+
+@async_to_sync
+async def streamed_text(response):
+    return b''.join([chunk async for chunk in response.streaming_content]).decode()
+
+
+def structured_recipe(messages):
+    return async_to_sync(astructured_completion)(
+        messages, RECIPE_FUNCTION, validate_recipe_output, parse_ai_recipe_response, model='gpt-4-turbo',
+    )
+
+
+class RecipeCacheTests(TestCase):
+    def setUp(self):
+        recipe_cache.clear()
+        self.addCleanup(recipe_cache.clear)
+
+    def test_cache_hit_shares_an_image_named_without_the_first_requester(self):
+        basenames = []
+
+        async def fake_generation(prompt, image_basename):
+            basenames.append(image_basename)
+            return dict(PARSED_RECIPE), f"ai/recipes/images/{image_basename}.png"
+
+        first, second = member('alice@example.com'), member('bob@example.com')
+        with mock.patch('AiRecipe.services.run_generation_calls', side_effect=fake_generation):
+            generate_ai_recipe(first, RECIPE_PAYLOAD)
+            # Same inputs, spelled differently: served from the cache
+            recipe, _ = generate_ai_recipe(second, {**RECIPE_PAYLOAD, 'main_ingredients': 'Chicken,  rice'})
+
+        self.assertEqual(len(basenames), 1)
+        self.assertEqual(recipe.user, second)
+        for value in (basenames[0], recipe.image.name, recipe.image_url):
+            self.assertNotIn('alice', value)
+            self.assertNotIn('example.com', value)
+
+    def test_equivalent_inputs_share_a_key(self):
+        key = canonical_recipe_key(RECIPE_PAYLOAD)
+        spelled_differently = {**RECIPE_PAYLOAD, 'cuisine': ' Thai ', 'main_ingredients': 'Chicken;\nrice, rice'}
+        self.assertEqual(canonical_recipe_key(spelled_differently), key)
+        self.assertNotEqual(canonical_recipe_key({**RECIPE_PAYLOAD, 'exclusion': 'peanuts'}), key)
+
+    def test_least_recently_used_and_expired_entries_are_dropped(self):
+        cache = RecipeResultCache(maxsize=2, ttl=60)
+        with mock.patch('AiRecipe.cache.time.monotonic', return_value=0):
+            cache.set('a', 1)
+            cache.set('b', 2)
+            cache.get('a')
+            cache.set('c', 3)
+            self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+        with mock.patch('AiRecipe.cache.time.monotonic', return_value=60):
+            self.assertIsNone(cache.get('a'))
+        self.assertEqual({key: cache.stats()[key] for key in ('size', 'hits', 'misses', 'evictions')},
+                         {'size': 1, 'hits': 3, 'misses': 2, 'evictions': 1})
+
+
+
+
+class IncrementalParserTests(TestCase):
+    def test_sections_are_emitted_once_they_are_complete(self):
+        parser = IncrementalRecipeParser()
+        self.assertEqual(parser.feed("### Recipe Name: Ste"), [])
+        self.assertEqual(parser.feed("w\n### Description: Hearty.\n"), [('title', 'Stew')])
+        self.assertEqual(parser.feed("#### Ingredients:"), [('description', 'Hearty.')])
+        self.assertEqual(parser.feed("\n- beef\n#### Instructions:\n1. Simmer."), [('ingredients', '- beef')])
+        self.assertEqual(parser.close(), [('instructions', '1. Simmer.')])
+
+    def test_text_fed_in_small_pieces_parses_like_the_whole_text(self):
+        parser = IncrementalRecipeParser()
+        emitted = []
+        for start in range(0, len(RECIPE_TEXT), 3):
+            emitted += parser.feed(RECIPE_TEXT[start:start + 3])
+        emitted += parser.close()
+
+        self.assertEqual(dict(emitted), parse_ai_recipe_response(RECIPE_TEXT))
+        self.assertEqual([name for name, _ in emitted], ['title', 'description', 'ingredients', 'instructions'])
+
+    @override_settings(AI_METRICS_DB_LOG=False)
+    def test_stream_endpoint_sends_each_section_then_the_saved_recipe(self):
+        recipe_cache.clear()
+        self.addCleanup(recipe_cache.clear)
+        user = member('member@example.com')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        async def streamed_completion(**kwargs):
+            async def chunks():
+                for start in range(0, len(RECIPE_TEXT), 7):
+                    yield {'choices': [{'delta': {'content': RECIPE_TEXT[start:start + 7]}}]}
+            return chunks()
+
+        with mock.patch('openai.ChatCompletion.acreate', side_effect=streamed_completion), \
+                mock.patch('openai.Image.acreate', side_effect=RuntimeError("no image")), \
+                self.assertLogs('AiRecipe.services', level='WARNING'):
+            response = client.post('/member/ai-recipes/generate-stream/', RECIPE_PAYLOAD, format='json')
+            events = [
+                (event.split('\n')[0].removeprefix('event: '), json.loads(event.split('\n')[1].removeprefix('data: ')))
+                for event in streamed_text(response).strip().split('\n\n')
+            ]
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual([event for event, _ in events], ['section'] * 4 + ['recipe'])
+        self.assertEqual([data['name'] for _, data in events[:4]], ['title', 'description', 'ingredients', 'instructions'])
+        self.assertEqual(events[-1][1]['title'], 'Stew')
+        self.assertEqual(UsageCounter.objects.get(user=user, resource=USAGE_AI_RECIPE).count, 1)
+
+    @override_settings(AI_METRICS_DB_LOG=False)
+    def test_stream_metric_ends_with_the_upstream_not_the_client(self):
+        recipe_cache.clear()
+        self.addCleanup(recipe_cache.clear)
+        user = member('member@example.com')
+
+        async def streamed_completion(**kwargs):
+            async def chunks():
+                yield {'choices': [{'delta': {'content': RECIPE_TEXT}}]}
+            return chunks()
+
+        @async_to_sync
+        async def read_slowly():
+            events = []
+            async for event, data in stream_ai_recipe(user, RECIPE_PAYLOAD):
+                events.append(event)
+                # A client reading slowly once the upstream stream has ended
+                await asyncio.sleep(0.2)
+            return events
+
+        with mock.patch('openai.ChatCompletion.acreate', side_effect=streamed_completion), \
+                mock.patch('openai.Image.acreate', side_effect=RuntimeError("no image")), \
+                mock.patch.object(ai_metrics, 'record') as record, \
+                self.assertLogs('AiRecipe.services', level='WARNING'):
+            self.assertEqual(read_slowly(), ['section'] * 4 + ['recipe'])
+
+        stream_calls = [call.kwargs for call in record.call_args_list if call.kwargs['call'] == 'chat_stream']
+        self.assertEqual(len(stream_calls), 1)
+        self.assertLess(stream_calls[0]['latency'], 0.2)
+        self.assertEqual(stream_calls[0]['error_class'], '')
+
+    def test_missing_sections_get_defaults(self):
+        parsed = parse_ai_recipe_response("Sorry, I can't help with that.")
+        self.assertEqual(parsed, {'title': 'Untitled Recipe', 'description': '', 'ingredients': '', 'instructions': ''})
+
+
+
+
+@override_settings(AI_STRUCTURED_OUTPUT=True, AI_STRUCTURED_REPAIR_ATTEMPTS=1, AI_METRICS_DB_LOG=False)
+class StructuredOutputTests(TestCase):
+    messages = [{'role': 'user', 'content': 'A recipe please'}]
+
+    def test_invalid_arguments_get_one_repair_turn(self):
+        valid = json.dumps({'title': 'Soup', 'description': 'Warm.', 'ingredients': ['1 l stock'], 'instructions': ['Heat.']})
+        replies = [chat_response(arguments='{"title": ""}'), chat_response(arguments=valid)]
+        with mock.patch('openai.ChatCompletion.acreate', side_effect=replies) as acreate:
+            parsed = structured_recipe(self.messages)
+
+        self.assertEqual(parsed['title'], 'Soup')
+        self.assertEqual(acreate.call_count, 2)
+        repair = acreate.call_args.kwargs['messages'][-1]['content']
+        self.assertIn("'title' must be a non-empty string", repair)
+
+    def test_failed_repair_raises_instead_of_parsing_the_arguments(self):
+        replies = [chat_response(arguments='{"title": ""}'), chat_response(arguments='not json')]
+        with mock.patch('openai.ChatCompletion.acreate', side_effect=replies):
+            with self.assertRaises(StructuredOutputError):
+                structured_recipe(self.messages)
+
+    def test_free_text_answer_uses_the_fallback_parser(self):
+        text = "### Recipe Name: Stew\n### Description: Hearty.\n#### Ingredients:\n- beef\n#### Instructions:\n1. Simmer."
+        with mock.patch('openai.ChatCompletion.acreate', return_value=chat_response(content=text)):
+            self.assertEqual(structured_recipe(self.messages)['title'], 'Stew')
+
+    def test_failed_repair_fails_generation_and_releases_the_quota(self):
+        recipe_cache.clear()
+        user = member('member@example.com')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        async def slow_image(**kwargs):
+            await asyncio.sleep(10)
+
+        invalid = chat_response(arguments='{"title": ""}')
+        with mock.patch('openai.ChatCompletion.acreate', return_value=invalid), \
+                mock.patch('openai.Image.acreate', side_effect=slow_image):
+            response = client.post('/member/ai-recipes/generate/', RECIPE_PAYLOAD, format='json')
+
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(AIGeneratedRecipe.objects.filter(user=user).exists())
+        self.assertEqual(UsageCounter.objects.get(user=user, resource=USAGE_AI_RECIPE).count, 0)
+
+
+
+
+class SchedulerTests(SimpleTestCase):
+    def scheduler(self, **limits):
+        scheduler = OpenAICallScheduler(**{'rate': 100, 'burst': 10, 'max_in_flight': 1, 'max_queue': 1, 'max_wait': 5, **limits})
+        self.addCleanup(scheduler._waiter_pool.shutdown)
+        return scheduler
+
+    def test_cancelled_waiters_hand_back_only_the_slots_they_got(self):
+        scheduler = self.scheduler()
+
+        async def use_slot():
+            async with scheduler.aslot():
+                await asyncio.sleep(0)
+
+        async def scenario():
+            scheduler.acquire()
+            # One waiter blocks in the single pool thread, the other is still queued behind it
+            waiters = [asyncio.ensure_future(use_slot()) for _ in range(2)]
+            await asyncio.sleep(0.05)
+            for waiter in waiters:
+                waiter.cancel()
+            await asyncio.gather(*waiters, return_exceptions=True)
+            scheduler.release()
+            # The running waiter acquires once the slot frees up and immediately gives it back
+            for _ in range(100):
+                if scheduler.stats()['in_flight'] == 0 and scheduler.stats()['queue_depth'] == 0:
+                    break
+                await asyncio.sleep(0.01)
+            await use_slot()
+
+        with self.assertNoLogs('concurrent.futures', level='ERROR'):
+            asyncio.run(scenario())
+        self.assertEqual(scheduler.stats()['in_flight'], 0)
+
+    def test_saturated_queue_rejects(self):
+        scheduler = self.scheduler(max_queue=0)
+        with self.assertRaises(SchedulerSaturated):
+            scheduler.acquire()
+
+
+
+
+@override_settings(AI_STRUCTURED_OUTPUT=False, AI_METRICS_DB_LOG=False)
+class RecipeGenerationTests(TestCase):
+    def test_chat_and_image_calls_run_at_the_same_time(self):
+        image_started = asyncio.Event()
+
+        async def image_call(**kwargs):
+            image_started.set()
+            raise RuntimeError("no image")
+
+        async def chat_call(**kwargs):
+            # Only answers once the image call is in flight
+            await asyncio.wait_for(image_started.wait(), 5)
+            return {'choices': [{'message': {'role': 'assistant', 'content': RECIPE_TEXT}}],
+                    'usage': {'prompt_tokens': 1, 'completion_tokens': 1}}
+
+        with mock.patch('openai.ChatCompletion.acreate', side_effect=chat_call), \
+                mock.patch('openai.Image.acreate', side_effect=image_call), \
+                self.assertLogs('AiRecipe.services', level='WARNING'):
+            recipe, parsed = generate_ai_recipe(member('member@example.com'), {**RECIPE_PAYLOAD, 'cuisine': 'greek'})
+
+        self.assertEqual(parsed['title'], 'Stew')
+        self.assertFalse(recipe.image)
+
+
+
+
+@override_settings(AI_METRICS_DB_LOG=False)
+class ImageIngestTests(SimpleTestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+
+    @staticmethod
+    def download(content_type, image_format):
+        buffer = io.BytesIO()
+        Image.new('RGB', (8, 8), 'orange').save(buffer, image_format)
+        response = mock.MagicMock(headers={'Content-Type': content_type}, content=buffer.getvalue())
+        response.__enter__.return_value = response
+        response.raw = io.BytesIO(buffer.getvalue())
+        response.raw.retries = None
+        return response
+
+    def test_browser_formats_are_stored_as_downloaded_and_others_as_jpeg(self):
+        png, gif = self.download('image/png', 'PNG'), self.download('image/gif', 'GIF')
+        with mock.patch('AiRecipe.images._session.get', side_effect=[png, gif]):
+            png_name = ingest_remote_image('http://images.test/1.png', 'recipes/images/a')
+            gif_name = ingest_remote_image('http://images.test/2.gif', 'recipes/images/b')
+
+        self.assertTrue(png_name.endswith('recipes/images/a.png'))
+        with default_storage.open(png_name) as stored:
+            self.assertEqual(stored.read(), png.content)
+        self.assertTrue(gif_name.endswith('recipes/images/b.jpg'))
+        with default_storage.open(gif_name) as stored:
+            self.assertEqual(Image.open(stored).format, 'JPEG')
+
+
+
+
+class FakeImageResponse:
+    """Streamed image download whose body is released by the test."""
+
+    def __init__(self, release, finished):
+        self.release, self.finished = release, finished
+        self.headers = {'Content-Type': 'image/png'}
+        self.raw = io.BytesIO(b'png bytes')
+        self.raw.retries = None
+
+    def raise_for_status(self):
+        self.release.wait(5)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.finished.set()
+
+
+@override_settings(AI_STRUCTURED_OUTPUT=False, AI_METRICS_DB_LOG=False)
+class ConcurrentGenerationTests(SimpleTestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        self.media_root = media_root.name
+        self.downloading, self.release, self.finished = threading.Event(), threading.Event(), threading.Event()
+
+        def download(*args, **kwargs):
+            self.downloading.set()
+            return FakeImageResponse(self.release, self.finished)
+
+        self.enterContext(mock.patch('AiRecipe.images._session.get', side_effect=download))
+        self.enterContext(mock.patch('openai.Image.acreate', return_value={'data': [{'url': 'http://images.test/1.png'}]}))
+
+    def stored_files(self):
+        return [name for _, _, names in os.walk(self.media_root) for name in names]
+
+    def test_ingest_still_running_when_the_chat_call_fails_deletes_its_file(self):
+        async def failing_chat(**kwargs):
+            await asyncio.to_thread(self.downloading.wait, 5)
+            # The download only completes after the caller has given up on it
+            threading.Timer(0.2, self.release.set).start()
+            raise RuntimeError("chat failed")
+
+        with mock.patch('openai.ChatCompletion.acreate', side_effect=failing_chat):
+            with self.assertRaises(RuntimeError):
+                async_to_sync(run_generation_calls)('prompt', 'recipes/images/test')
+
+        self.assertTrue(self.finished.wait(5))
+        self.assertEqual(self.stored_files(), [])
+
+    def test_completed_generation_keeps_the_image(self):
+        self.release.set()
+        text = "### Recipe Name: Stew\n### Description: Hearty.\n#### Ingredients:\n- beef\n#### Instructions:\n1. Simmer."
+        reply = chat_response(content=text)
+        with mock.patch('openai.ChatCompletion.acreate', return_value=reply):
+            parsed, image_name = async_to_sync(run_generation_calls)('prompt', 'recipes/images/test')
+
+        self.assertEqual(parsed['title'], 'Stew')
+        self.assertTrue(image_name.endswith('recipes/images/test.png'))
+        self.assertEqual(self.stored_files(), ['test.png'])
+
+
+
+
+@override_settings(AI_METRICS_DB_LOG=False)
+class RecipeJobTests(TestCase):
+    def test_submitted_job_runs_in_the_background_and_reports_its_recipe(self):
+        user = member('member@example.com')
+        client = APIClient()
+        client.force_authenticate(user)
+        recipe = AIGeneratedRecipe.objects.create(user=user, recipe_type='food', main_ingredients='rice', serving_size=2)
+
+        # Run the worker on the test thread, which holds the test transaction
+        with mock.patch('AiRecipe.jobs._executor.submit', side_effect=lambda fn, *args: fn(*args)), \
+                mock.patch('AiRecipe.jobs.close_old_connections'), \
+                mock.patch('AiRecipe.jobs.generate_ai_recipe', return_value=(recipe, PARSED_RECIPE)) as generate, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/member/ai-recipes/generate-async/', RECIPE_PAYLOAD, format='json')
+
+        self.assertEqual(response.status_code, 202)
+        generate.assert_called_once()
+        job = client.get(response.data['status_url']).data
+        self.assertEqual((job['status'], job['recipe']['id'], job['parsed_result']), ('done', recipe.pk, PARSED_RECIPE))
+
+        other = APIClient()
+        other.force_authenticate(member('other@example.com'))
+        self.assertEqual(other.get(response.data['status_url']).status_code, 404)
+
+
+
+
+@override_settings(AI_JOB_EXPIRY_MINUTES=30, AI_METRICS_DB_LOG=False)
+class RecipeJobExpiryTests(TestCase):
+    def setUp(self):
+        self.user = member('member@example.com')
+
+    def submit(self, status='pending', idle_minutes=0):
+        reserve_usage(self.user, USAGE_AI_RECIPE)
+        job = AIRecipeJob.objects.create(user=self.user, payload=RECIPE_PAYLOAD, status=status)
+        AIRecipeJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(minutes=idle_minutes))
+        return job
+
+    def used(self):
+        return UsageCounter.objects.get(user=self.user, resource=USAGE_AI_RECIPE).count
+
+    def test_stale_jobs_fail_and_release_their_quota(self):
+        stuck = [self.submit('pending', 45), self.submit('running', 45)]
+        fresh = self.submit('running', 5)
+
+        self.assertEqual(expire_stale_jobs(), 2)
+        self.assertEqual(self.used(), 1)
+        for job in stuck:
+            job.refresh_from_db()
+            self.assertEqual(job.status, 'failed')
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, 'running')
+        # A second sweep finds nothing left to release
+        self.assertEqual(expire_stale_jobs(), 0)
+        self.assertEqual(self.used(), 1)
+
+    def test_expired_job_is_not_run_by_a_worker(self):
+        job = self.submit('pending', 45)
+        expire_stale_jobs()
+        with mock.patch('AiRecipe.jobs.generate_ai_recipe') as generate:
+            run_ai_recipe_job(job.pk)
+        generate.assert_not_called()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+    def test_failed_job_releases_its_quota_once(self):
+        job = self.submit()
+        with mock.patch('AiRecipe.jobs.generate_ai_recipe', side_effect=RuntimeError("chat failed")):
+            run_ai_recipe_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', 'chat failed'))
+        self.assertEqual(self.used(), 0)
+        self.assertEqual(expire_stale_jobs(), 0)
+
+
+
+
+@override_settings(AI_STRUCTURED_OUTPUT=False, AI_METRICS_DB_LOG=False)
+class ProTipsMemoTests(TestCase):
+    def setUp(self):
+        self.user = member('member@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = ManualRecipe.objects.create(
+            user=self.user, dish_name='Bread', menu_type='dinner', dish_description='d',
+            ingredients='2 cups flour', directions='Bake.',
+        )
+        self.acreate = self.enterContext(mock.patch(
+            'openai.ChatCompletion.acreate', side_effect=[chat_response(content=f"Tip {n}") for n in range(1, 4)],
+        ))
+
+    def generate(self):
+        return self.client.post(f'/member/generate-pro-tips/{self.recipe.pk}/')
+
+    def test_unchanged_recipe_reuses_its_tips(self):
+        first, second = self.generate(), self.generate()
+        self.assertEqual((first.status_code, second.status_code), (201, 200))
+        self.assertEqual(second.data['tips'], 'Tip 1')
+        self.assertEqual(self.acreate.call_count, 1)
+
+    def test_edited_recipe_refreshes_its_tips_without_another_use(self):
+        self.generate()
+        self.recipe.directions = 'Bake longer.'
+        self.recipe.save()
+        response = self.generate()
+
+        self.assertEqual((response.status_code, response.data['tips']), (200, 'Tip 2'))
+        self.assertEqual(self.acreate.call_count, 2)
+        self.assertEqual(ProTips.objects.filter(manual_recipe=self.recipe).count(), 1)
+        self.assertEqual(UsageCounter.objects.get(user=self.user, resource=USAGE_PRO_TIP).count, 1)
+
+
+
+
+@override_settings(AI_STRUCTURED_OUTPUT=False, AI_METRICS_DB_LOG=False)
+class BulkProTipsTests(TestCase):
+    def setUp(self):
+        self.user = member('member@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        async def tips_for(**kwargs):
+            dish = kwargs['messages'][-1]['content'].split("'")[1]
+            if dish == 'Fails':
+                raise RuntimeError("upstream error")
+            return chat_response(content=f"Tips for {dish}")
+
+        self.acreate = self.enterContext(mock.patch('openai.ChatCompletion.acreate', side_effect=tips_for))
+
+    def recipe(self, dish_name, user=None):
+        return ManualRecipe.objects.create(
+            user=user or self.user, dish_name=dish_name, menu_type='dinner', dish_description='d',
+            ingredients='2 cups flour', directions='Bake.',
+        )
+
+    def generate(self, recipe_ids):
+        return self.client.post('/member/generate-pro-tips/bulk/', {'recipe_ids': recipe_ids}, format='json')
+
+    def lines(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in streamed_text(response).splitlines()]
+
+    def test_one_line_per_recipe_then_a_summary(self):
+        new, changed, unchanged, failing = (self.recipe(name) for name in ('New', 'Changed', 'Unchanged', 'Fails'))
+        # A subscriber, so the four recipes fit; usage is still counted
+        Subscription.objects.create(user=self.user, stripe_customer_id='cus_1', stripe_subscription_id='sub_1',
+                                    is_active=True, current_period_end=timezone.now() + timedelta(days=30))
+        ProTips.objects.create(manual_recipe=changed, tips='Old tips', content_hash='0' * 64)
+        ProTips.objects.create(manual_recipe=unchanged, tips='Stored tips',
+                               content_hash=pro_tips_content_hash(build_pro_tips_prompt(unchanged)))
+
+        lines = self.lines(self.generate([new.pk, changed.pk, unchanged.pk, failing.pk, new.pk]))
+
+        self.assertEqual(lines[-1], {'done': True, 'created': 1, 'updated': 1, 'unchanged': 1, 'failed': 1})
+        results = {line['recipe_id']: line for line in lines[:-1]}
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[new.pk], {'recipe_id': new.pk, 'status': 'created', 'tips': 'Tips for New'})
+        self.assertEqual(results[changed.pk], {'recipe_id': changed.pk, 'status': 'updated', 'tips': 'Tips for Changed'})
+        self.assertEqual(results[unchanged.pk], {'recipe_id': unchanged.pk, 'status': 'unchanged', 'tips': 'Stored tips'})
+        self.assertEqual(results[failing.pk]['status'], 'failed')
+        # The unchanged recipe is answered without a call, the duplicate id only once
+        self.assertEqual(self.acreate.call_count, 3)
+        self.assertEqual(ProTips.objects.get(manual_recipe=changed).tips, 'Tips for Changed')
+        self.assertFalse(ProTips.objects.filter(manual_recipe=failing).exists())
+        # Both new recipes were reserved up front and the failed one handed back, so the ledger matches the rows
+        self.assertEqual(UsageCounter.objects.get(user=self.user, resource=USAGE_PRO_TIP).count,
+                         ProTips.objects.filter(manual_recipe__user=self.user).count())
+
+    def test_rows_are_written_in_batches(self):
+        recipes = [self.recipe(f'Dish {number}') for number in range(3)]
+        bulk_create = ProTips.objects.bulk_create
+        with mock.patch.object(BulkProTipsAPIView, 'write_batch_size', 2), \
+                mock.patch.object(ProTips.objects, 'bulk_create', side_effect=bulk_create) as writes:
+            self.lines(self.generate([recipe.pk for recipe in recipes]))
+        self.assertEqual([len(call.args[0]) for call in writes.call_args_list], [2, 1])
+        self.assertEqual(ProTips.objects.filter(manual_recipe__in=recipes).count(), 3)
+
+    @override_settings(AI_BULK_PRO_TIPS_MAX=2)
+    def test_invalid_requests_are_rejected_before_any_call(self):
+        mine, theirs = self.recipe('Mine'), self.recipe('Theirs', user=member('other@example.com'))
+        for recipe_ids in ([], [True], ['1'], [mine.pk, theirs.pk, 999]):
+            self.assertEqual(self.generate(recipe_ids).status_code, 400, recipe_ids)
+        missing = self.generate([mine.pk, 999])
+        self.assertEqual((missing.status_code, missing.data['recipe_ids']), (404, [999]))
+        forbidden = self.generate([mine.pk, theirs.pk])
+        self.assertEqual((forbidden.status_code, forbidden.data['recipe_ids']), (403, [theirs.pk]))
+        self.acreate.assert_not_called()
+
+
+
+
+class ProTipsListTests(TestCase):
+    def setUp(self):
+        self.user = member('member@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tips = [
+            ProTips.objects.create(manual_recipe=ManualRecipe.objects.create(
+                user=user, dish_name=f'Dish {number}', menu_type='dinner', dish_description='d',
+                ingredients='2 cups flour', directions='Bake.',
+            ), tips=f'Tip {number}')
+            for number, user in enumerate([self.user, self.user, member('other@example.com')])
+        ]
+
+    def test_members_tips_are_cursor_paginated_newest_first(self):
+        first = self.client.get('/member/pro-tips/', {'page_size': 1}).data
+        self.assertEqual([tip['tips'] for tip in first['results']], ['Tip 1'])
+        second = self.client.get(first['next']).data
+        self.assertEqual([tip['tips'] for tip in second['results']], ['Tip 0'])
+        self.assertIsNone(second['next'])
+
+        summary = self.client.get('/member/pro-tips/', {'summary': 'true'}).data['results'][0]
+        self.assertEqual(summary['manual_recipe']['dish_name'], 'Dish 1')
+        self.assertNotIn('directions', summary['manual_recipe'])
+
+    def test_matching_etag_is_not_modified_until_a_tip_changes(self):
+        response = self.client.get('/member/pro-tips/')
+        etag = response['ETag']
+        self.assertEqual(response.status_code, 200)
+
+        cached = self.client.get('/member/pro-tips/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((cached.status_code, cached['ETag']), (304, etag))
+        # Another page or representation is another resource
+        self.assertEqual(self.client.get('/member/pro-tips/', {'summary': 'true'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        self.tips[0].tips = 'Better tip'
+        self.tips[0].save()
+        changed = self.client.get('/member/pro-tips/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+        # Tips of other members do not affect the tag
+        self.tips[2].tips = 'Not mine'
+        self.tips[2].save()
+        self.assertEqual(self.client.get('/member/pro-tips/', HTTP_IF_NONE_MATCH=changed['ETag']).status_code, 304)
+
+
+
+
+class AIRecipeHistoryTests(TestCase):
+    def setUp(self):
+        self.user = member('member@example.com')
+        self.other = member('other@example.com')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def generated(self, user, title):
+        return AIGeneratedRecipe.objects.create(user=user, recipe_type='food', main_ingredients='rice',
+                                                serving_size=2, title=title)
+
+    def test_members_only_see_their_own_recipes(self):
+        own = [self.generated(self.user, f'Mine {index}') for index in range(3)]
+        theirs = self.generated(self.other, 'Theirs')
+
+        titles, url = [], '/member/ai-recipes/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            titles += [recipe['title'] for recipe in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(titles, [recipe.title for recipe in reversed(own)])
+
+        self.assertEqual(self.client.get(f'/member/ai-recipes/{own[0].pk}/').data['title'], 'Mine 0')
+        self.assertEqual(self.client.get(f'/member/ai-recipes/{theirs.pk}/').status_code, 404)
+
+
+
+
+class AICallMetricsTests(SimpleTestCase):
+    def test_snapshot_reports_percentiles_histogram_and_errors(self):
+        metrics = AICallMetrics(db_log=False, flush_size=100, flush_interval=60)
+        for index in range(100):
+            metrics.record('generate', 'free', 'chat', 'gpt-4', latency=(index + 1) / 100,
+                           prompt_tokens=2, completion_tokens=3, error_class='Timeout' if index < 4 else '')
+        metrics.record('pro_tips', 'subscriber', 'chat', 'gpt-4', latency=3, retries=1)
+
+        generate, pro_tips = metrics.snapshot()['series']
+        self.assertEqual((generate['endpoint'], generate['count'], generate['errors']), ('generate', 100, {'Timeout': 4}))
+        self.assertEqual((generate['latency_seconds_p50'], generate['latency_seconds_p95'], generate['latency_seconds_p99']),
+                         (0.51, 0.96, 1.0))
+        self.assertEqual(generate['latency_seconds_avg'], 0.505)
+        self.assertEqual([generate['latency_histogram'][f'le_{bound}'] for bound in (0.1, 0.25, 0.5, 1, 2.5)], [10, 15, 25, 50, 0])
+        self.assertEqual((generate['prompt_tokens'], generate['completion_tokens']), (200, 300))
+        self.assertEqual((pro_tips['tier'], pro_tips['retries'], pro_tips['latency_histogram']['le_5']), ('subscriber', 1, 1))
+
+
+
+
+class AICallMetricLogTests(TransactionTestCase):
+    def test_flush_writes_the_buffered_samples(self):
+        metrics = AICallMetrics(db_log=True, flush_size=100, flush_interval=3600)
+        metrics.record('generate', 'free', 'chat', 'gpt-4', latency=0.25, prompt_tokens=5, completion_tokens=7)
+        metrics.record('generate', 'free', 'image', 'dall-e-3', latency=1.5, error_class='Timeout')
+        self.assertEqual(metrics.snapshot()['pending_db_writes'], 2)
+        self.assertFalse(AICallMetric.objects.exists())
+
+        metrics.flush()
+        self.assertEqual(metrics.snapshot()['pending_db_writes'], 0)
+        self.assertEqual(
+            list(AICallMetric.objects.order_by('id').values_list('call', 'latency_ms', 'prompt_tokens', 'error_class')),
+            [('chat', 250.0, 5, ''), ('image', 1500.0, 0, 'Timeout')],
+        )
+
+    def test_full_buffer_is_written_without_a_flush(self):
+        metrics = AICallMetrics(db_log=True, flush_size=2, flush_interval=3600)
+        for _ in range(2):
+            metrics.record('generate', 'free', 'chat', 'gpt-4', latency=0.25)
+        metrics._writer.shutdown(wait=True)
+        self.assertEqual(AICallMetric.objects.count(), 2)
+
+    def test_report_summarizes_logged_calls_and_prunes_old_ones(self):
+        for latency_ms in (100, 200, 300, 400, 500):
+            AICallMetric.objects.create(endpoint='generate', tier='free', call='chat', model='gpt-4',
+                                        latency_ms=latency_ms, prompt_tokens=10, completion_tokens=20)
+        old = AICallMetric.objects.create(endpoint='generate', tier='free', call='image', latency_ms=900,
+                                          error_class='Timeout')
+        AICallMetric.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=40))
+
+        out = io.StringIO()
+        call_command('ai_metrics_report', '--prune-days', '30', stdout=out)
+        chat_line = next(line for line in out.getvalue().splitlines() if line.startswith('generate') and ' chat ' in line)
+        # calls, p50, p95, p99, prompt and completion tokens, retries, errors
+        self.assertEqual(chat_line.split()[4:], ['5', '300', '500', '500', '50', '100', '0', '-'])
+        self.assertNotIn('image', out.getvalue().split('Time spent')[0])
+        self.assertIn('Pruned 1 logged calls', out.getvalue())
+        self.assertEqual(AICallMetric.objects.count(), 5)
+
+    def test_admin_view_serves_the_snapshot_to_admins_only(self):
+        admin = User.objects.create(email='admin@example.com', username='admin@example.com', role='admin')
+        client = APIClient()
+        client.force_authenticate(member('member@example.com'))
+        self.assertEqual(client.get('/adminapi/ai-metrics/').status_code, 403)
+
+        client.force_authenticate(admin)
+        with mock.patch.object(ai_metrics, 'snapshot', return_value={'series': [], 'pending_db_writes': 0}):
+            response = client.get('/adminapi/ai-metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'series': [], 'pending_db_writes': 0})
+
+
+
+
+@override_settings(AI_METRICS_DB_LOG=False)
+class FakeOpenAIServerTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        recipe_cache.clear()
+        self.addCleanup(recipe_cache.clear)
+
+    def start_server(self):
+        created = queue.Queue()
+        server_class = fake_openai_server.ThreadingHTTPServer
+
+        def make_server(*args, **kwargs):
+            server = server_class(*args, **kwargs)
+            created.put(server)
+            return server
+
+        with mock.patch.object(fake_openai_server, 'ThreadingHTTPServer', side_effect=make_server):
+            thread = threading.Thread(target=call_command, args=['fake_openai_server'], kwargs={
+                'port': 0, 'chat_latency_ms': 0, 'image_latency_ms': 0, 'download_latency_ms': 0, 'jitter_ms': 0,
+                'image_size': 64, 'stdout': io.StringIO(),
+            })
+            thread.start()
+            # The socket listens as soon as the server exists, before serve_forever starts
+            server = created.get(timeout=5)
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(server.shutdown)
+        return server.server_address[1]
+
+    def test_generation_runs_against_the_fake_server(self):
+        port = self.start_server()
+        user = member('member@example.com')
+
+        with mock.patch.object(openai, 'api_base', f'http://127.0.0.1:{port}/v1'), \
+                mock.patch.object(openai, 'api_key', 'fake-key'):
+            recipe, parsed = generate_ai_recipe(user, RECIPE_PAYLOAD)
+
+        self.assertEqual(parsed['title'], 'Benchmark Fried Rice')
+        self.assertIn('2 eggs', recipe.ingredients)
+        self.assertTrue(recipe.image)
+        with recipe.image.open('rb') as stored:
+            self.assertEqual(stored.read(8), b'\x89PNG\r\n\x1a\n')
@@ -1,14 +1,73 @@
 import re
 
+
+TITLE_PATTERN = re.compile(r"### Recipe Name:\s*(.+)")
+DESCRIPTION_PATTERN = re.compile(r"### Description:\s*(.+?)#### Ingredients:", re.DOTALL)
+INGREDIENTS_PATTERN = re.compile(r"#### Ingredients:\s*(.+?)#### Instructions:", re.DOTALL)
+INSTRUCTIONS_PATTERN = re.compile(r"#### Instructions:\s*(.+)", re.DOTALL)
+
+# A title is only final once its line is complete
+_OPEN_TITLE_PATTERN = re.compile(r"### Recipe Name:\s*(.+)\n")
+
+SECTION_DEFAULTS = {
+    "title": "Untitled Recipe",
+    "description": "",
+    "ingredients": "",
+    "instructions": "",
+}
+
+
+class IncrementalRecipeParser:
+    """
+    Parse a recipe completion as it streams in.
+
+    feed() returns the (section, value) pairs that became final with the
+    new text: the title once its line ends, description and ingredients
+    once the next header arrives. close() flushes the rest (instructions
+    run to the end of the text) and fills defaults for missing sections.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.result = {}
+
+    def _pending(self, closing):
+        patterns = (
+            ("title", TITLE_PATTERN if closing else _OPEN_TITLE_PATTERN),
+            ("description", DESCRIPTION_PATTERN),
+            ("ingredients", INGREDIENTS_PATTERN),
+        )
+        if closing:
+            patterns += (("instructions", INSTRUCTIONS_PATTERN),)
+        return [(name, pattern) for name, pattern in patterns if name not in self.result]
+
+    def _scan(self, closing=False):
+        emitted = []
+        for name, pattern in self._pending(closing):
+            match = pattern.search(self.buffer)
+            if match:
+                self.result[name] = match.group(1).strip()
+                emitted.append((name, self.result[name]))
+        return emitted
+
+    def feed(self, text):
+        self.buffer += text
+        # Sections can only close on a newline or a header colon
+        if "\n" not in text and ":" not in text:
+            return []
+        return self._scan()
+
+    def close(self):
+        emitted = self._scan(closing=True)
+        for name, default in SECTION_DEFAULTS.items():
+            if name not in self.result:
+                self.result[name] = default
+                emitted.append((name, default))
+        return emitted
+
+
 def parse_ai_recipe_response(text):
-    title = re.search(r"### Recipe Name:\s*(.+)", text)
-    description = re.search(r"### Description:\s*(.+?)#### Ingredients:", text, re.DOTALL)
-    ingredients = re.search(r"#### Ingredients:\s*(.+?)#### Instructions:", text, re.DOTALL)
-    instructions = re.search(r"#### Instructions:\s*(.+)", text, re.DOTALL)
-
-    return {
-        "title": title.group(1).strip() if title else "Untitled Recipe",
-        "description": description.group(1).strip() if description else "",
-        "ingredients": ingredients.group(1).strip() if ingredients else "",
-        "instructions": instructions.group(1).strip() if instructions else "",
-    }
\ No newline at end of file
+    parser = IncrementalRecipeParser()
+    parser.feed(text)
+    parser.close()
+    return {name: parser.result[name] for name in SECTION_DEFAULTS}
@@ -2,133 +2,225 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from django.conf import settings
 import openai
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from accounts.permissions import IsMemberRole
-from .models import AIGeneratedRecipe,ProTips
-from .serializers import AIGeneratedRecipeSerializer,ProTipsSerializer
-from .utils import parse_ai_recipe_response
+from accounts.exports import EXPORT_FORMAT_PARAMETER, EXPORT_FORMATS, export_response, requested_export_format
+from accounts.fieldsets import SPARSE_FIELDSET_PARAMETERS, sparse_queryset
+from accounts.permissions import IsMemberRole, IsAdminRole
+from .models import AIGeneratedRecipe,ProTips,AIRecipeJob
+from .serializers import AIGeneratedRecipeSerializer,ProTipsSerializer,ProTipsSummarySerializer,AIRecipeJobSerializer
+from .services import (
+    agenerate_pro_tips, build_pro_tips_prompt, extract_recipe_payload,
+    generate_ai_recipe, pro_tips_content_hash, stream_ai_recipe,
+)
+from .jobs import submit_ai_recipe_job
+from .cache import recipe_cache
+from .pagination import AIRecipeCursorPagination, ProTipsCursorPagination
+from .metrics import ai_endpoint, ai_metrics, call_endpoint
+from .scheduler import SchedulerSaturated, ai_priority, ai_scheduler, call_priority, priority_for_user
 from ManualRecipe.models import ManualRecipe
+from ManualRecipe.serializers import ManualRecipeSummarySerializer
+from subscription.constants import USAGE_AI_RECIPE, USAGE_PRO_TIP
+from subscription.usage import QuotaExceeded, quota_headers, release_usage, reserve_usage
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
+from django.http import StreamingHttpResponse
+from django.db.models import Count, F, Max
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+from asgiref.sync import async_to_sync, sync_to_async
+import asyncio
+import hashlib
+import json
 import logging
-import requests
-from io import BytesIO
-from django.core.files.base import ContentFile
-from PIL import Image
-import tempfile
-from django.conf import settings
-from django.core.files.storage import default_storage
-from urllib.parse import quote
 
 
 openai.api_key = settings.OPENAI_API_KEY
+openai.api_base = settings.OPENAI_API_BASE
 logger = logging.getLogger(__name__)
 
+# Columns of the NDJSON/CSV exports (image becomes an absolute URL)
+AI_RECIPE_EXPORT_FIELDS = (
+    'id', 'recipe_type', 'cuisine', 'main_ingredients', 'serving_size', 'exclusion',
+    'title', 'description', 'ingredients', 'instructions', 'image', 'created_at',
+)
+PRO_TIPS_EXPORT_FIELDS = ('id', 'manual_recipe_id', 'tips', 'created_at', 'updated_at')
+PRO_TIPS_EXPORT_EXPRESSIONS = {'dish_name': F('manual_recipe__dish_name')}
+
 
 
 class AIGeneratedRecipeViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated, IsMemberRole]
 
+    def get_queryset(self):
+        return AIGeneratedRecipe.objects.filter(user=self.request.user)
+
+    @swagger_auto_schema(
+        operation_description="List the member's previously generated AI recipes, newest first (cursor paginated).",
+        tags=['Ai'],
+        manual_parameters=SPARSE_FIELDSET_PARAMETERS,
+        responses={200: AIGeneratedRecipeSerializer(many=True)}
+    )
+    def list(self, request):
+        recipes = sparse_queryset(self.get_queryset(), AIGeneratedRecipeSerializer, request, extra=('created_at',))
+        paginator = AIRecipeCursorPagination()
+        page = paginator.paginate_queryset(recipes, request, view=self)
+        serializer = AIGeneratedRecipeSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+
+    @swagger_auto_schema(
+        operation_description="Retrieve one of the member's generated AI recipes.",
+        tags=['Ai'],
+        manual_parameters=SPARSE_FIELDSET_PARAMETERS,
+        responses={200: AIGeneratedRecipeSerializer}
+    )
+    def retrieve(self, request, pk=None):
+        recipe = get_object_or_404(sparse_queryset(self.get_queryset(), AIGeneratedRecipeSerializer, request), pk=pk)
+        serializer = AIGeneratedRecipeSerializer(recipe, context={'request': request})
+        return Response(serializer.data)
+
+    @swagger_auto_schema(
+        operation_description="Download every generated AI recipe of the member as a streamed NDJSON or CSV file, oldest first.",
+        tags=['Ai'],
+        manual_parameters=[EXPORT_FORMAT_PARAMETER]
+    )
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        export_format = requested_export_format(request)
+        if export_format is None:
+            return Response({"error": f"file_format must be one of: {', '.join(EXPORT_FORMATS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        recipes = self.get_queryset().order_by('id')
+        return export_response(request, recipes, AI_RECIPE_EXPORT_FIELDS, 'ai-recipes', export_format, file_fields=['image'])
+
     @swagger_auto_schema(tags=['Ai'], request_body=AIGeneratedRecipeSerializer)
     @action(detail=False, methods=['post'], url_path='generate')
     def generate(self, request):
         user = request.user
-        data = request.data
-
-        if user.role == 'member':
-            if not user.subscriptions.filter(is_active=True).exists():
-                ai_recipe_count = AIGeneratedRecipe.objects.filter(user=user).count()
-                if ai_recipe_count >= 6:
-                    return Response(
-                        {"error": "You must buy a subscription to create more than 6 AI-generated recipes."},
-                        status=status.HTTP_409_CONFLICT,
-                    )
-
-        recipe_type = data.get('recipe_type')
-        cuisine = data.get('cuisine')
-        main_ingredients = data.get('main_ingredients')
-        serving_size = data.get('serving_size')
-        exclusion = data.get('exclusion', '')
-
-        if not all([recipe_type, cuisine, main_ingredients, serving_size]):
-            return Response({"error": "Missing required fields."}, status=400)
 
-        prompt = (
-            f"Generate a recipe for {recipe_type} with the following details:\n"
-            f"Generate a food image for {recipe_type} with the following details:\n...do not provide any kind of text with the image when showing the output..skip the label part..."
-            f"Cuisine: {cuisine}\n"
-            f"Main Ingredients: {main_ingredients}\n"
-            f"Serving Size: {serving_size}\n"
-        )
-        if exclusion:
-            prompt += f"Exclude ingredients or items: {exclusion}\n"
-        prompt += "\nPlease provide a recipe name, followed by '#### Ingredients:' and '#### Instructions:'"
-
-        prompt += (
-            "\nPlease provide a recipe in the following format:\n"
-            "### Recipe Name: <Name>\n"
-            "### Description: <A short paragraph describing the dish>\n"
-            "#### Ingredients:\n<List of ingredients>\n"
-            "#### Instructions:\n<Step-by-step instructions>"                   
-        )
+        payload = extract_recipe_payload(request.data)
+        if payload is None:
+            return Response({"error": "Missing required fields."}, status=400)
 
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-4-turbo",
-                messages=[{"role": "system", "content": "You are a helpful assistant."},
-                          {"role": "user", "content": prompt}],
-                temperature=0.7,
-            )
-            ai_text = response['choices'][0]['message']['content']
-            parsed = parse_ai_recipe_response(ai_text)
-            logger.info(f"Generating image with prompt: {prompt}")
-
-            # Request image from OpenAI API
-            image_response = openai.Image.create(
-                prompt=prompt,
-                n=1,
-                size="512x512"
-            )
-            image_url = image_response['data'][0]['url']  # URL returned by OpenAI
-
-            # Download the image
-            img_data = requests.get(image_url).content
-            image = Image.open(BytesIO(img_data))
-
-            # Save the image to a temporary file
-            with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmp_file:
-                image.save(tmp_file, format='JPEG')
-                tmp_file.seek(0)
-
-                # Create a Django ContentFile from the temporary file and specify a name
-                filename = f"recipes/images/{user.username}_{recipe_type}_{str(serving_size)}.jpg"
-                content_file = ContentFile(tmp_file.read(), name=filename)  # Set the 'name' attribute here
-                # Save the recipe with the image
-                recipe = AIGeneratedRecipe.objects.create(
-                    user=user,
-                    recipe_type=recipe_type,
-                    main_ingredients=main_ingredients,
-                    serving_size=serving_size,
-                    exclusion=exclusion,
-                    cuisine=cuisine,
-                    image=content_file 
-                )
-                recipe.image_url = recipe.image
-                recipe.save()
-
-                resdata = AIGeneratedRecipeSerializer(recipe,context={'request': request}).data
-                resdata['image_url'] = resdata['image']
-
-            return Response({
-                "recipe": resdata,
-                "parsed_result": parsed
-            }, status=201)
+            remaining = reserve_usage(user, USAGE_AI_RECIPE)
+        except QuotaExceeded as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
 
+        try:
+            with ai_priority(user), ai_endpoint('generate'):
+                recipe, parsed = generate_ai_recipe(user, payload)
+        except SchedulerSaturated as e:
+            release_usage(user, USAGE_AI_RECIPE)
+            return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '10'})
         except Exception as e:
+            release_usage(user, USAGE_AI_RECIPE)
             return Response({"error": str(e)}, status=500)
 
+        resdata = AIGeneratedRecipeSerializer(recipe,context={'request': request}).data
+        return Response({
+            "recipe": resdata,
+            "parsed_result": parsed
+        }, status=201, headers=quota_headers(remaining))
+
+    @swagger_auto_schema(
+        tags=['Ai'],
+        operation_description="Stream an AI recipe as server-sent events: one `section` event per recipe section "
+                              "(title, description, ingredients, instructions) as soon as it is complete, then a "
+                              "final `recipe` event with the saved recipe and its image.",
+        request_body=AIGeneratedRecipeSerializer
+    )
+    @action(detail=False, methods=['post'], url_path='generate-stream')
+    def generate_stream(self, request):
+        user = request.user
+
+        payload = extract_recipe_payload(request.data)
+        if payload is None:
+            return Response({"error": "Missing required fields."}, status=400)
+
+        try:
+            remaining = reserve_usage(user, USAGE_AI_RECIPE)
+        except QuotaExceeded as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+
+        response = StreamingHttpResponse(
+            self._recipe_event_stream(request, user, payload, priority_for_user(user)),
+            content_type='text/event-stream',
+            headers=quota_headers(remaining),
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @staticmethod
+    def _sse(event, data):
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    async def _recipe_event_stream(self, request, user, payload, priority):
+        token = call_priority.set(priority)
+        endpoint_token = call_endpoint.set('generate-stream')
+        saved = False
+        try:
+            async for event, data in stream_ai_recipe(user, payload):
+                if event == 'recipe':
+                    saved = True
+                    data = await sync_to_async(
+                        lambda: AIGeneratedRecipeSerializer(data, context={'request': request}).data
+                    )()
+                yield self._sse(event, data)
+        except SchedulerSaturated as e:
+            yield self._sse('error', {"error": str(e)})
+        except Exception as e:
+            logger.exception("AI recipe stream failed")
+            yield self._sse('error', {"error": str(e)})
+        finally:
+            call_endpoint.reset(endpoint_token)
+            call_priority.reset(token)
+            # Failed or abandoned before the recipe was stored: hand the reserved use back
+            if not saved:
+                await sync_to_async(release_usage)(user, USAGE_AI_RECIPE)
+
+    @swagger_auto_schema(
+        tags=['Ai'],
+        operation_description="Queue an AI recipe generation job. Returns 202 with a job id; poll the job endpoint "
+                              "or listen on the websocket for `ai_recipe_job` updates.",
+        request_body=AIGeneratedRecipeSerializer,
+        responses={202: AIRecipeJobSerializer}
+    )
+    @action(detail=False, methods=['post'], url_path='generate-async')
+    def generate_async(self, request):
+        user = request.user
+
+        payload = extract_recipe_payload(request.data)
+        if payload is None:
+            return Response({"error": "Missing required fields."}, status=400)
+
+        # The use is reserved at submission; the job hands it back if it fails
+        try:
+            remaining = reserve_usage(user, USAGE_AI_RECIPE)
+        except QuotaExceeded as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+
+        job = AIRecipeJob.objects.create(user=user, payload=payload)
+        submit_ai_recipe_job(job)
+
+        return Response({
+            "job_id": str(job.id),
+            "status": job.status,
+            "status_url": reverse('ai-recipes-job-status', kwargs={'job_id': job.id}, request=request),
+        }, status=status.HTTP_202_ACCEPTED, headers=quota_headers(remaining))
+
+    @swagger_auto_schema(tags=['Ai'], responses={200: AIRecipeJobSerializer})
+    @action(detail=False, methods=['get'], url_path=r'jobs/(?P<job_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})')
+    def job_status(self, request, job_id=None):
+        job = get_object_or_404(AIRecipeJob.objects.select_related('recipe'), pk=job_id, user=request.user)
+        serializer = AIRecipeJobSerializer(job, context={'request': request})
+        return Response(serializer.data)
+
 
 
 
@@ -145,80 +237,324 @@ class CreateProTipsAPIView(APIView):
         request_body=None
     )
     def post(self, request, recipe_id):
-        # Get the ManualRecipe object from the database using recipe_id
-        manual_recipe = get_object_or_404(ManualRecipe, id=recipe_id)
+        # Get the ManualRecipe object (and any existing tips) from the database using recipe_id
+        manual_recipe = get_object_or_404(ManualRecipe.objects.select_related('pro_tips'), id=recipe_id)
 
         try:
             # Check if the manual recipe belongs to the current user
             if manual_recipe.user != request.user:
                 return Response({'error': 'You do not have permission to generate pro tips for this recipe.'}, status=status.HTTP_403_FORBIDDEN)
-            
+
+            try:
+                existing = manual_recipe.pro_tips
+            except ProTips.DoesNotExist:
+                existing = None
+
+            prompt = build_pro_tips_prompt(manual_recipe)
+            content_hash = pro_tips_content_hash(prompt)
+
+            # Unchanged recipe: return the stored tips before any outbound call
+            if existing is not None and existing.content_hash == content_hash:
+                serializer = ProTipsSerializer(existing)
+                return Response(serializer.data, status=status.HTTP_200_OK)
 
             user = request.user
-            has_subscription = user.subscriptions.filter(is_active=True).exists()
-
-            if user.role == 'member' and not has_subscription:
-                pro_tips_count = ProTips.objects.filter(manual_recipe=manual_recipe).count()
-                if pro_tips_count >= 3:
-                    return Response(
-                        {"error": "You must buy a subscription to create more than 3 pro tips."},
-                        status=status.HTTP_409_CONFLICT,
-                    )
-
-            # Collect all relevant information from the ManualRecipe object
-            prompt = f"Provide pro tips for preparing the dish '{manual_recipe.dish_name}'.\n"
-            prompt += f"Description: {manual_recipe.dish_description}\n"
-            prompt += f"Ingredients: {manual_recipe.ingredients}\n"
-            prompt += f"Directions: {manual_recipe.directions}\n"
-            prompt += f"Menu Type: {manual_recipe.menu_type}\n"
-            prompt += f"Tags: {manual_recipe.tags}\n"
-            prompt += f"Price: {manual_recipe.dish_price}\n"
-            prompt += f"Food Cost: {manual_recipe.food_cost}\n"
-            prompt += f"Cooking Station: {manual_recipe.cooking_station}\n"
-            prompt += f"Instructions: {manual_recipe.text_instructions}\n"
-            prompt += f"Additional Information: {manual_recipe.food_percent_markup}% markup\n"
-            prompt += f"Date to serve: {manual_recipe.date_to_serve}\n"
-
-            # Call OpenAI API to generate pro tips using ChatCompletion (gpt-4 or gpt-3.5-turbo)
-            response = openai.ChatCompletion.create(
-                model="gpt-4",
-                messages=[{"role": "system", "content": "You are a helpful assistant."},
-                          {"role": "user", "content": prompt}],
-                max_tokens=200,
-                temperature=0.7
-            )
 
-            pro_tips = response['choices'][0]['message']['content'].strip()
+            if existing is not None:
+                # The recipe changed since the tips were generated: refresh the row in place
+                with ai_priority(user), ai_endpoint('pro-tips'):
+                    existing.tips = async_to_sync(agenerate_pro_tips)(prompt)
+                existing.content_hash = content_hash
+                existing.save(update_fields=['tips', 'content_hash', 'updated_at'])
+                serializer = ProTipsSerializer(existing)
+                return Response(serializer.data, status=status.HTTP_200_OK)
+
+            # Only a new ProTips row counts toward the free-tier allowance
+            try:
+                remaining = reserve_usage(user, USAGE_PRO_TIP)
+            except QuotaExceeded as e:
+                return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+
+            try:
+                with ai_priority(user), ai_endpoint('pro-tips'):
+                    pro_tips = async_to_sync(agenerate_pro_tips)(prompt)
+                pro_tips_entry = ProTips.objects.create(manual_recipe=manual_recipe, tips=pro_tips, content_hash=content_hash)
+            except Exception:
+                release_usage(user, USAGE_PRO_TIP)
+                raise
 
-            pro_tips_entry = ProTips.objects.create(manual_recipe=manual_recipe, tips=pro_tips)
             serializer = ProTipsSerializer(pro_tips_entry)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            return Response(serializer.data, status=status.HTTP_201_CREATED, headers=quota_headers(remaining))
 
+        except SchedulerSaturated as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '10'})
         except Exception as e:
             return Response({'error': f'Error generating pro tips: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
 
 
 
 
+class BulkProTipsAPIView(APIView):
+    """
+    Generate pro tips for many recipes in one request. Ownership and the
+    subscription are checked once up front, the OpenAI calls run
+    concurrently (at most AI_BULK_PRO_TIPS_CONCURRENCY at a time) and one
+    NDJSON line is streamed per recipe as soon as its tips are ready.
+    ProTips rows are written with bulk_create/bulk_update in batches.
+    """
+    permission_classes = [IsAuthenticated, IsMemberRole]
+    write_batch_size = 20
+
+    @swagger_auto_schema(
+        operation_description="Generate pro tips for several recipes. Body: {\"recipe_ids\": [1, 2, ...]}. "
+                              "Streams newline-delimited JSON: one line per recipe with `status` created, updated, "
+                              "unchanged or failed, then a final summary line.",
+        tags=["Protips"],
+        request_body=None
+    )
+    def post(self, request):
+        recipe_ids = request.data.get('recipe_ids')
+        # bool is an int subclass, but true/false are not recipe ids
+        if not isinstance(recipe_ids, list) or not recipe_ids or \
+                not all(isinstance(i, int) and not isinstance(i, bool) for i in recipe_ids):
+            return Response({"error": "recipe_ids must be a non-empty list of recipe ids."}, status=status.HTTP_400_BAD_REQUEST)
+
+        recipe_ids = list(dict.fromkeys(recipe_ids))
+        if len(recipe_ids) > settings.AI_BULK_PRO_TIPS_MAX:
+            return Response(
+                {"error": f"At most {settings.AI_BULK_PRO_TIPS_MAX} recipes can be processed per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        user = request.user
+        recipes = {r.id: r for r in ManualRecipe.objects.filter(id__in=recipe_ids).select_related('pro_tips')}
+
+        missing = [i for i in recipe_ids if i not in recipes]
+        if missing:
+            return Response({"error": "Recipes not found.", "recipe_ids": missing}, status=status.HTTP_404_NOT_FOUND)
+        forbidden = [i for i in recipe_ids if recipes[i].user_id != user.id]
+        if forbidden:
+            return Response(
+                {"error": "You do not have permission to generate pro tips for these recipes.", "recipe_ids": forbidden},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        work = []
+        for recipe_id in recipe_ids:
+            manual_recipe = recipes[recipe_id]
+            try:
+                existing = manual_recipe.pro_tips
+            except ProTips.DoesNotExist:
+                existing = None
+            prompt = build_pro_tips_prompt(manual_recipe)
+            work.append((manual_recipe, existing, prompt, pro_tips_content_hash(prompt)))
+
+        # Reserve every new row up front in one ledger update; failures are handed back
+        new_rows = sum(1 for _, existing, _, _ in work if existing is None)
+        remaining = None
+        if new_rows:
+            try:
+                remaining = reserve_usage(user, USAGE_PRO_TIP, amount=new_rows)
+            except QuotaExceeded as e:
+                return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+
+        response = StreamingHttpResponse(
+            self._result_stream(user, work, priority_for_user(user)),
+            content_type='application/x-ndjson',
+            headers=quota_headers(remaining) if new_rows else None,
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @staticmethod
+    def _line(data):
+        return json.dumps(data) + "\n"
+
+    @staticmethod
+    def _write(to_create, to_update):
+        if to_create:
+            ProTips.objects.bulk_create(to_create)
+        if to_update:
+            # bulk_update() skips auto_now, so stamp updated_at explicitly
+            now = timezone.now()
+            for pro_tips in to_update:
+                pro_tips.updated_at = now
+            ProTips.objects.bulk_update(to_update, ['tips', 'content_hash', 'updated_at'])
+
+    async def _result_stream(self, user, work, priority):
+        token = call_priority.set(priority)
+        endpoint_token = call_endpoint.set('pro-tips-bulk')
+        semaphore = asyncio.Semaphore(settings.AI_BULK_PRO_TIPS_CONCURRENCY)
+        to_create, to_update = [], []
+        counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
+
+        async def generate(manual_recipe, existing, prompt, content_hash):
+            async with semaphore:
+                try:
+                    return manual_recipe, existing, content_hash, await agenerate_pro_tips(prompt), None
+                except Exception as e:
+                    return manual_recipe, existing, content_hash, None, e
+
+        tasks = []
+        unused_reservations = sum(1 for _, existing, _, _ in work if existing is None)
+        try:
+            for manual_recipe, existing, prompt, content_hash in work:
+                if existing is not None and existing.content_hash == content_hash:
+                    # Unchanged recipe: stored tips, no outbound call
+                    counts['unchanged'] += 1
+                    yield self._line({"recipe_id": manual_recipe.id, "status": "unchanged", "tips": existing.tips})
+                else:
+                    tasks.append(asyncio.create_task(generate(manual_recipe, existing, prompt, content_hash)))
+
+            for next_done in asyncio.as_completed(tasks):
+                manual_recipe, existing, content_hash, tips, error = await next_done
+                if error is not None:
+                    counts['failed'] += 1
+                    yield self._line({"recipe_id": manual_recipe.id, "status": "failed",
+                                      "error": f"Error generating pro tips: {error}"})
+                    continue
+
+                if existing is not None:
+                    existing.tips, existing.content_hash = tips, content_hash
+                    to_update.append(existing)
+                    result = 'updated'
+                else:
+                    to_create.append(ProTips(manual_recipe=manual_recipe, tips=tips, content_hash=content_hash))
+                    unused_reservations -= 1
+                    result = 'created'
+                counts[result] += 1
+
+                if len(to_create) + len(to_update) >= self.write_batch_size:
+                    await sync_to_async(self._write)(to_create, to_update)
+                    to_create, to_update = [], []
+                yield self._line({"recipe_id": manual_recipe.id, "status": result, "tips": tips})
+
+            yield self._line({"done": True, **counts})
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Keep whatever was generated even if the client went away mid-stream
+            if to_create or to_update:
+                await sync_to_async(self._write)(to_create, to_update)
+            if unused_reservations:
+                await sync_to_async(release_usage)(user, USAGE_PRO_TIP, unused_reservations)
+            call_endpoint.reset(endpoint_token)
+            call_priority.reset(token)
+
+
+
+
 class ProTipsListAPIView(APIView):
     permission_classes = [IsAuthenticated, IsMemberRole]
     @swagger_auto_schema(
-        operation_description="List all pro tips, ordered by creation date",
+        operation_description="List the member's pro tips, newest first, with cursor pagination. "
+                              "`summary=true` nests a lightweight recipe summary instead of the full recipe. "
+                              "Send the returned ETag as If-None-Match to get 304 when nothing changed.",
         tags=["Protips"],
+        manual_parameters=[
+            openapi.Parameter('summary', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN, required=False),
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, required=False),
+        ],
         responses={
             200: ProTipsSerializer(many=True),
+            304: "Not modified",
             400: "Error fetching pro tips"
         }
     )
     def get(self, request):
-        # Fetch all ProTips objects ordered by created_at
-        # pro_tips = ProTips.objects.filter(user=request.user).order_by('-created_at')
-        pro_tips = ProTips.objects.filter(manual_recipe__user=request.user).order_by('-created_at')
+        pro_tips = ProTips.objects.filter(manual_recipe__user=request.user)
+
+        # Conditional GET: the tag changes whenever a tip or its recipe is added, edited or removed
+        etag = self._etag(request, pro_tips)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        summary = request.query_params.get('summary', '').lower() in ('1', 'true', 'yes')
+        # One joined query per page instead of one recipe query per tip
+        pro_tips = pro_tips.select_related('manual_recipe')
+        if summary:
+            recipe_fields = [f'manual_recipe__{name}' for name in ManualRecipeSummarySerializer.Meta.fields]
+            pro_tips = pro_tips.only('id', 'tips', 'created_at', 'updated_at', 'manual_recipe', *recipe_fields)
+        serializer_class = ProTipsSummarySerializer if summary else ProTipsSerializer
+
+        paginator = ProTipsCursorPagination()
+        page = paginator.paginate_queryset(pro_tips, request, view=self)
+        serializer = serializer_class(page, many=True, context={'request': request})
+        response = paginator.get_paginated_response(serializer.data)
+        response['ETag'] = etag
+        return response
+
+    @staticmethod
+    def _etag(request, pro_tips):
+        state = pro_tips.aggregate(
+            count=Count('id'),
+            tips_updated=Max('updated_at'),
+            recipes_updated=Max('manual_recipe__updated_at'),
+        )
+        # The query string selects the page, page size and representation
+        raw = f"{state['count']}:{state['tips_updated']}:{state['recipes_updated']}:{request.get_full_path()}"
+        return quote_etag(hashlib.md5(raw.encode('utf-8')).hexdigest())
+
+
+
+
+class ProTipsExportAPIView(APIView):
+    permission_classes = [IsAuthenticated, IsMemberRole]
+
+    @swagger_auto_schema(
+        operation_description="Download all of the member's pro tips (with the recipe id and dish name) "
+                              "as a streamed NDJSON or CSV file, oldest first.",
+        tags=["Protips"],
+        manual_parameters=[EXPORT_FORMAT_PARAMETER]
+    )
+    def get(self, request):
+        export_format = requested_export_format(request)
+        if export_format is None:
+            return Response({"error": f"file_format must be one of: {', '.join(EXPORT_FORMATS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        pro_tips = ProTips.objects.filter(manual_recipe__user=request.user).order_by('id')
+        return export_response(request, pro_tips, PRO_TIPS_EXPORT_FIELDS, 'pro-tips', export_format,
+                               expressions=PRO_TIPS_EXPORT_EXPRESSIONS)
+
+
+
+
+class AISchedulerStatsView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminRole]
+
+    @swagger_auto_schema(
+        operation_description="Queue depth, in-flight calls, rejections and wait times of the OpenAI call scheduler (per server process).",
+        tags=['admin']
+    )
+    def get(self, request):
+        return Response(ai_scheduler.stats())
 
 
-        # Serialize the response
-        serializer = ProTipsSerializer(pro_tips, many=True,context = {'request':request})
-        return Response(serializer.data)
-    
 
 
+class AIMetricsView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminRole]
+
+    @swagger_auto_schema(
+        operation_description="Latency histograms, token usage, errors and retries of outbound AI calls by endpoint, "
+                              "tier, call type and model (per server process, since start). "
+                              "`manage.py ai_metrics_report` covers all processes from the database log.",
+        tags=['admin']
+    )
+    def get(self, request):
+        return Response(ai_metrics.snapshot())
+
+
+
+
+class AIRecipeCacheStatsView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminRole]
+
+    @swagger_auto_schema(
+        operation_description="Hit/miss counters and occupancy of the AI recipe result cache (per server process).",
+        tags=['admin']
+    )
+    def get(self, request):
+        return Response(recipe_cache.stats())
@@ -1,8 +1,33 @@
 from django.contrib import admin
-from .models import ManualRecipe
+from .models import ManualRecipe, MenuType, RecipeIngredient, Tag
 
 @admin.register(ManualRecipe)
 class ManualRecipeAdmin(admin.ModelAdmin):
     list_display = ('dish_name', 'user', 'dish_price', 'date_to_serve', 'created_at', 'updated_at')
     search_fields = ('dish_name', 'user__username', 'menu_type', 'tags')
-    list_filter = ('date_to_serve', 'created_at')
\ No newline at end of file
+    list_filter = ('date_to_serve', 'created_at')
+
+
+
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name',)
+    search_fields = ('name',)
+
+
+
+
+@admin.register(MenuType)
+class MenuTypeAdmin(admin.ModelAdmin):
+    list_display = ('name',)
+    search_fields = ('name',)
+
+
+
+
+@admin.register(RecipeIngredient)
+class RecipeIngredientAdmin(admin.ModelAdmin):
+    list_display = ('name', 'quantity', 'unit', 'recipe', 'raw_text')
+    search_fields = ('name', 'raw_text')
+    list_filter = ('unit',)
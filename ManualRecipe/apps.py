@@ -1,6 +1,22 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+
+def repair_search_index(sender, using, **kwargs):
+    # SQLite rebuilds tables on some schema changes, which drops the FTS
+    # triggers; put them back once the search index has been installed
+    from .search import FTS_TABLE, install_search_index
+
+    connection = connections[using]
+    if connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+        install_search_index(connection)
 
 
 class ManualrecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ManualRecipe'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        post_migrate.connect(repair_search_index, sender=self)
@@ -0,0 +1,226 @@
+import numpy as np
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+
+
+COSTING_GROUPS = ('menu_type', 'cooking_station')
+MENU_CLASSES = ('star', 'plowhorse', 'puzzle', 'dog')
+# Kasavana & Smith: a dish is popular once its share of the mix reaches 70% of an even share
+POPULARITY_THRESHOLD = 0.7
+
+_GROUP_COLUMNS = {
+    'menu_type': F('menu_type_links__name'),
+    'cooking_station': F('cooking_station'),
+}
+_COSTING_COLUMNS = {
+    'costing_price': Cast('dish_price', FloatField()),
+    'costing_cost': Cast('food_cost', FloatField()),
+    'costing_markup': Cast('food_percent_markup', FloatField()),
+}
+
+
+def parse_sales(data):
+    """Turn {recipe id: units sold} from JSON or CSV (string keys and values allowed) into {int: float}; ValueError when malformed."""
+    if not isinstance(data, dict):
+        raise ValueError("sales must be an object mapping recipe ids to units sold.")
+    sales = {}
+    for pk, sold in data.items():
+        try:
+            pk, sold = int(pk), float(sold)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid sales entry {pk!r}: {sold!r}")
+        if sold < 0 or not np.isfinite(sold):
+            raise ValueError(f"Units sold of recipe {pk} must be a non-negative number.")
+        sales[pk] = sold
+    return sales
+
+
+def _factorize(values):
+    """Sorted distinct labels of `values` (trimmed, lower-cased) and the label index of every value."""
+    raw_codes = {}
+    codes = np.fromiter((raw_codes.setdefault(value, len(raw_codes)) for value in values), dtype=np.int64, count=len(values))
+    # Normalize each distinct raw value once rather than once per row
+    normalized = [(value or '').strip().lower() for value in raw_codes]
+    labels = sorted(set(normalized))
+    positions = {label: index for index, label in enumerate(labels)}
+    return labels, np.array([positions[label] for label in normalized], dtype=np.int64)[codes]
+
+
+def load_costing_columns(queryset, group_by=None, with_names=False):
+    """
+    Read the costing columns of `queryset` in one values_list query into
+    NumPy arrays (NULL becomes NaN). Prices are cast to floats by the
+    database so no Decimal is built per row. Grouping by menu_type yields
+    one row per (recipe, menu type): a dish on both the lunch and the
+    dinner menu is analysed within each. The group column comes back as
+    (labels, index into labels per row).
+    """
+    fields = ['id', *_COSTING_COLUMNS]
+    expressions = dict(_COSTING_COLUMNS)
+    if with_names:
+        fields.append('dish_name')
+    if group_by:
+        expressions['costing_group'] = _GROUP_COLUMNS[group_by]
+        fields.append('costing_group')
+    query = queryset.order_by().annotate(**expressions).values_list(*fields)
+    # Every column is a float, int or text, so the rows are read straight from the
+    # cursor: Django's per-row converters would cost more than the query itself
+    try:
+        sql, params = query.query.sql_with_params()
+    except EmptyResultSet:
+        rows = []
+    else:
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+
+    values = list(zip(*rows)) or [()] * len(fields)
+    columns = {
+        'id': np.array(values[0], dtype=np.int64),
+        'price': np.array(values[1], dtype=float),
+        'cost': np.array(values[2], dtype=float),
+        'markup': np.array(values[3], dtype=float),
+    }
+    if with_names:
+        columns['dish_name'] = values[4]
+    if group_by:
+        columns['group'] = _factorize(values[-1])
+    return columns
+
+
+def fill_from_markup(price, cost, markup):
+    """Complete a missing price or food cost from the other and the markup (price = cost * (1 + markup / 100))."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = 1 + markup / 100
+        growth = np.where(growth > 0, growth, np.nan)
+        cost = np.where(np.isnan(cost), price / growth, cost)
+        price = np.where(np.isnan(price), cost * growth, price)
+    return price, cost
+
+
+def costing_metrics(price, cost):
+    """Food cost %, contribution margin and actual markup % per dish; NaN where price or cost is unknown."""
+    costed = (price > 0) & ~np.isnan(cost)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return costed, {
+            'food_cost_percent': np.where(costed, cost / price * 100, np.nan),
+            'contribution_margin': np.where(costed, price - cost, np.nan),
+            'markup_percent': np.where(costed & (cost > 0), (price - cost) / cost * 100, np.nan),
+        }
+
+
+def _per_group(inverse, group_count, values):
+    return np.bincount(inverse, weights=values, minlength=group_count)
+
+
+def classify_menu(inverse, group_count, costed, margin, sold):
+    """
+    Menu-engineering class index (into MENU_CLASSES) of every costed dish
+    against the rest of its group, -1 for dishes without a price or cost.
+    Margin is high at or above the group's sales-weighted average
+    contribution margin; popularity is high when the dish's share of the
+    group's sales reaches POPULARITY_THRESHOLD of an even share.
+    """
+    sold = np.where(costed, sold, 0.0)
+    group_sold = _per_group(inverse, group_count, sold)
+    group_items = _per_group(inverse, group_count, costed.astype(float))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        group_margin = _per_group(inverse, group_count, np.where(costed, margin * sold, 0.0)) / group_sold
+        share = sold / group_sold[inverse]
+        popular = share >= POPULARITY_THRESHOLD / group_items[inverse]
+    profitable = margin >= group_margin[inverse]
+    classes = np.where(popular, np.where(profitable, 0, 1), np.where(profitable, 2, 3))
+    return np.where(costed, classes, -1), group_margin
+
+
+def _summaries(inverse, group_count, price, cost, costed, sold, classes, group_margin):
+    sold = np.where(costed, sold, 0.0)
+    revenue = _per_group(inverse, group_count, np.where(costed, price * sold, 0.0))
+    food_cost = _per_group(inverse, group_count, np.where(costed, cost * sold, 0.0))
+    group_sold = _per_group(inverse, group_count, sold)
+    class_counts = np.bincount(
+        inverse[costed] * len(MENU_CLASSES) + classes[costed], minlength=group_count * len(MENU_CLASSES)
+    ).reshape(group_count, len(MENU_CLASSES))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        summary = {
+            'recipes': np.bincount(inverse, minlength=group_count),
+            'costed': _per_group(inverse, group_count, costed.astype(float)).astype(np.int64),
+            'sold': group_sold,
+            'food_cost_percent': _rounded(food_cost / revenue * 100),
+            'average_price': _rounded(revenue / group_sold),
+            'average_contribution_margin': _rounded(group_margin),
+        }
+    return [
+        {
+            **{key: (values[index] if isinstance(values, list) else values[index].item()) for key, values in summary.items()},
+            'classes': dict(zip(MENU_CLASSES, class_counts[index].tolist())),
+        }
+        for index in range(group_count)
+    ]
+
+
+def _rounded(values):
+    return np.where(np.isfinite(values), np.round(values, 2), None).tolist()
+
+
+def analyze_menu(queryset, group_by=None, sales=None, with_items=False):
+    """
+    Food cost %, contribution margin and menu-engineering classes (star,
+    plowhorse, puzzle, dog) for the recipes of `queryset`, overall and per
+    `group_by` (menu_type or cooking_station), computed with array
+    operations over a single query.
+
+    Plateprep records no sales, so `sales` ({recipe id: units sold}) is
+    optional: without it every dish gets an even share of the mix and is
+    popular by definition, leaving margin to split stars from plowhorses.
+    """
+    columns = load_costing_columns(queryset, group_by, with_names=with_items)
+    price, cost = fill_from_markup(columns['price'], columns['cost'], columns['markup'])
+    costed, metrics = costing_metrics(price, cost)
+    ids = columns['id']
+    if sales is None:
+        sold = np.ones(len(ids))
+    else:
+        sold = np.fromiter((sales.get(pk, 0) for pk in ids.tolist()), dtype=float, count=len(ids))
+
+    # Overall figures count each recipe once, however many menus it is on
+    _, first = np.unique(ids, return_index=True)
+    single = np.zeros(len(first), dtype=np.int64)
+    overall_classes, overall_margin = classify_menu(single, 1, costed[first], metrics['contribution_margin'][first], sold[first])
+    result = {
+        'group_by': group_by,
+        'sales_mix': 'even' if sales is None else 'reported',
+        'overall': _summaries(single, 1, price[first], cost[first], costed[first], sold[first],
+                              overall_classes, overall_margin)[0],
+    }
+
+    classes = np.full(len(ids), -1)
+    classes[first] = overall_classes
+    if group_by:
+        labels, inverse = columns['group']
+        classes, group_margin = classify_menu(inverse, len(labels), costed, metrics['contribution_margin'], sold)
+        result['groups'] = [
+            {'group': label or None, **summary}
+            for label, summary in zip(labels, _summaries(inverse, len(labels), price, cost, costed, sold, classes, group_margin))
+        ]
+
+    if with_items:
+        rows = range(len(ids)) if group_by else first.tolist()
+        item_columns = {
+            'price': _rounded(price), 'food_cost': _rounded(cost),
+            **{name: _rounded(values) for name, values in metrics.items()},
+        }
+        result['items'] = [
+            {
+                'id': int(ids[row]),
+                'dish_name': columns['dish_name'][row],
+                **({'group': labels[inverse[row]] or None} if group_by else {}),
+                **{name: values[row] for name, values in item_columns.items()},
+                'sold': sold[row].item(),
+                'class': MENU_CLASSES[classes[row]] if classes[row] >= 0 else None,
+            }
+            for row in rows
+        ]
+    return result
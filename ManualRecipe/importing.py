@@ -0,0 +1,156 @@
+import csv
+import io
+import json
+
+from django.db import transaction
+
+from subscription.constants import USAGE_RECIPE_IMAGE_URL
+from subscription.usage import QuotaExceeded, reserve_usage, usage_remaining
+from .ingredients import reindex_ingredients_bulk
+from .models import ManualRecipe
+from .serializers import ManualRecipeSerializer
+from .tagging import sync_recipe_labels_bulk
+
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+# Files cannot travel inside a row; recipes are imported with image_url only
+IMPORT_IGNORED_FIELDS = {'id', 'user', 'image', 'image_variants', 'created_at', 'updated_at'}
+
+
+def detect_import_format(filename='', content_type=''):
+    """Guess csv/ndjson from the upload's name or content type; None when unknown."""
+    filename, content_type = (filename or '').lower(), (content_type or '').lower()
+    if filename.endswith('.csv') or 'csv' in content_type:
+        return 'csv'
+    if filename.endswith(('.ndjson', '.jsonl')) or 'ndjson' in content_type or 'jsonl' in content_type:
+        return 'ndjson'
+    return None
+
+
+def _read_csv_rows(text):
+    reader = csv.DictReader(text)
+    number = 0
+    while True:
+        number += 1
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except (csv.Error, UnicodeDecodeError) as e:
+            yield number, None, f"Invalid CSV: {e}"
+            continue
+        yield number, {key.strip(): value for key, value in row.items() if key and value not in (None, '')}, None
+
+
+def _read_ndjson_rows(text):
+    number = 0
+    while True:
+        number += 1
+        try:
+            line = text.readline()
+        except UnicodeDecodeError as e:
+            yield number, None, f"Invalid UTF-8: {e}"
+            return
+        if not line:
+            return
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(data, dict):
+            yield number, None, "Each line must be a JSON object."
+            continue
+        yield number, data, None
+
+
+def read_import_rows(stream, import_format):
+    """
+    Lazily yield (row_number, data, error) from a binary file object, one
+    row at a time so memory stays flat however large the file is. Rows are
+    numbered from 1 after the CSV header, or by line for NDJSON. `data` is
+    None when the row itself could not be read.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    return _read_csv_rows(text) if import_format == 'csv' else _read_ndjson_rows(text)
+
+
+def _validate(user, number, data):
+    serializer = ManualRecipeSerializer(data={key: value for key, value in data.items() if key not in IMPORT_IGNORED_FIELDS})
+    if not serializer.is_valid():
+        return None, {"row": number, "status": "failed", "errors": serializer.errors}
+    return ManualRecipe(user=user, **serializer.validated_data), None
+
+
+def _reserve_image_urls(user, recipes):
+    """
+    Count image_url rows against the quota in one ledger update for the
+    whole batch. When the batch does not fit, as many rows as the
+    allowance covers are kept; the rest are returned as rejected.
+    """
+    metered = [(number, recipe) for number, recipe in recipes if recipe.image_url]
+    if not metered:
+        return recipes, [], None
+    try:
+        reserve_usage(user, USAGE_RECIPE_IMAGE_URL, amount=len(metered))
+        return recipes, [], None
+    except QuotaExceeded as e:
+        error = str(e)
+
+    allowed = usage_remaining(user, USAGE_RECIPE_IMAGE_URL) or 0
+    if allowed:
+        try:
+            reserve_usage(user, USAGE_RECIPE_IMAGE_URL, amount=allowed)
+        except QuotaExceeded:
+            allowed = 0
+    rejected = {number for number, _ in metered[allowed:]}
+    return [(number, recipe) for number, recipe in recipes if number not in rejected], sorted(rejected), error
+
+
+def import_recipe_batch(user, rows):
+    """
+    Validate one batch of (row_number, data, error) rows and insert the
+    valid ones with a single bulk_create. bulk_create sends no post_save,
+    so tag links and the ingredient index are rebuilt here in bulk (the
+    full-text index is maintained by the database). Returns one result
+    dict per row, in row order.
+    """
+    results, recipes = [], []
+    for number, data, error in rows:
+        if error is not None:
+            results.append({"row": number, "status": "failed", "errors": {"non_field_errors": [error]}})
+            continue
+        recipe, failure = _validate(user, number, data)
+        if failure is not None:
+            results.append(failure)
+        else:
+            recipes.append((number, recipe))
+
+    if recipes:
+        with transaction.atomic():
+            # The quota reservation rolls back with the insert if it fails
+            recipes, rejected, quota_error = _reserve_image_urls(user, recipes)
+            created = ManualRecipe.objects.bulk_create([recipe for _, recipe in recipes])
+            sync_recipe_labels_bulk(created)
+            reindex_ingredients_bulk(created)
+
+        results.extend({"row": number, "status": "created", "id": recipe.pk, "dish_name": recipe.dish_name}
+                       for number, recipe in recipes)
+        results.extend({"row": number, "status": "failed", "errors": {"image_url": [quota_error]}}
+                       for number in rejected)
+
+    return sorted(results, key=lambda result: result["row"])
+
+
+def import_recipe_batches(user, rows, batch_size):
+    """Group rows into batches of `batch_size` and yield each batch's results."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield import_recipe_batch(user, batch)
+            batch = []
+    if batch:
+        yield import_recipe_batch(user, batch)
@@ -0,0 +1,204 @@
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Count
+
+from .models import RecipeIngredient
+
+
+# Canonical unit for every spelling we accept (matched case-insensitively,
+# except the single-letter T/t spoon abbreviations)
+UNIT_ALIASES = {
+    'cup': 'cup', 'cups': 'cup', 'c': 'cup',
+    'tablespoon': 'tbsp', 'tablespoons': 'tbsp', 'tbsp': 'tbsp', 'tbsps': 'tbsp', 'tbs': 'tbsp', 'tbl': 'tbsp',
+    'teaspoon': 'tsp', 'teaspoons': 'tsp', 'tsp': 'tsp', 'tsps': 'tsp',
+    'g': 'g', 'gr': 'g', 'gram': 'g', 'grams': 'g',
+    'kg': 'kg', 'kilogram': 'kg', 'kilograms': 'kg',
+    'mg': 'mg', 'milligram': 'mg', 'milligrams': 'mg',
+    'ml': 'ml', 'milliliter': 'ml', 'milliliters': 'ml', 'millilitre': 'ml', 'millilitres': 'ml',
+    'l': 'l', 'liter': 'l', 'liters': 'l', 'litre': 'l', 'litres': 'l',
+    'oz': 'oz', 'ounce': 'oz', 'ounces': 'oz',
+    'fl oz': 'fl oz',
+    'lb': 'lb', 'lbs': 'lb', 'pound': 'lb', 'pounds': 'lb',
+    'pint': 'pint', 'pints': 'pint', 'pt': 'pint',
+    'quart': 'quart', 'quarts': 'quart', 'qt': 'quart',
+    'gallon': 'gallon', 'gallons': 'gallon', 'gal': 'gallon',
+    'pinch': 'pinch', 'pinches': 'pinch', 'dash': 'dash', 'dashes': 'dash',
+    'clove': 'clove', 'cloves': 'clove',
+    'can': 'can', 'cans': 'can', 'jar': 'jar', 'jars': 'jar',
+    'package': 'package', 'packages': 'package', 'pkg': 'package',
+    'slice': 'slice', 'slices': 'slice', 'piece': 'piece', 'pieces': 'piece',
+    'bunch': 'bunch', 'bunches': 'bunch', 'sprig': 'sprig', 'sprigs': 'sprig',
+    'stick': 'stick', 'sticks': 'stick', 'head': 'head', 'heads': 'head',
+    'handful': 'handful', 'handfuls': 'handful',
+}
+CASE_SENSITIVE_UNITS = {'T': 'tbsp', 't': 'tsp'}
+
+# Size and preparation words that do not change which ingredient it is
+DESCRIPTORS = {
+    'fresh', 'freshly', 'large', 'small', 'medium', 'big', 'whole', 'chopped', 'minced', 'diced',
+    'sliced', 'finely', 'roughly', 'coarsely', 'thinly', 'grated', 'shredded', 'peeled', 'crushed',
+    'softened', 'melted', 'cooked', 'uncooked', 'raw', 'ripe', 'optional', 'about', 'approximately',
+}
+# Words ending in "s" that are not plurals
+SINGULAR_S = {'asparagus', 'couscous', 'hummus', 'molasses', 'swiss', 'citrus', 'watercress', 'lemongrass', 'octopus'}
+
+UNICODE_FRACTIONS = {
+    '½': '1/2', '⅓': '1/3', '⅔': '2/3', '¼': '1/4', '¾': '3/4',
+    '⅕': '1/5', '⅖': '2/5', '⅗': '3/5', '⅘': '4/5', '⅙': '1/6', '⅚': '5/6', '⅛': '1/8', '⅜': '3/8', '⅝': '5/8', '⅞': '7/8',
+}
+
+_BULLET = re.compile(r'^\s*(?:[-*•·]+|\d+[.)])\s+')
+# "1", "1.5", "1/2", "1 1/2", optionally a range "2-3" / "2 to 3" (the lower bound is kept)
+_QUANTITY = re.compile(
+    r'^(?P<quantity>\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?)'
+    r'(?:\s*(?:-|–|to)\s*(?:\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?))?\s*'
+)
+_PARENTHESES = re.compile(r'\([^)]*\)')
+_TRAILING_NOTE = re.compile(r'\s+(?:to taste|as needed|for (?:garnish|serving|frying|dusting))\b.*$')
+_NON_WORD = re.compile(r"[^\w\s'-]")
+_WHITESPACE = re.compile(r'\s+')
+
+# Quantities must fit RecipeIngredient.quantity; larger ones are stored as unknown
+_QUANTITY_FIELD = RecipeIngredient._meta.get_field('quantity')
+_QUANTITY_STEP = Decimal(1).scaleb(-_QUANTITY_FIELD.decimal_places)
+_QUANTITY_LIMIT = Decimal(10) ** (_QUANTITY_FIELD.max_digits - _QUANTITY_FIELD.decimal_places)
+
+
+def split_ingredient_lines(text):
+    """ManualRecipe.ingredients is line separated, or comma separated when it is a single line."""
+    text = (text or '').strip()
+    if not text:
+        return []
+    parts = text.splitlines() if '\n' in text else text.split(',')
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _parse_quantity(value):
+    value = value.strip()
+    try:
+        if ' ' in value:
+            whole, fraction = value.split(None, 1)
+            return Decimal(whole) + _parse_quantity(fraction)
+        if '/' in value:
+            numerator, denominator = value.split('/')
+            return Decimal(numerator) / Decimal(denominator)
+        return Decimal(value)
+    except (InvalidOperation, ZeroDivisionError, TypeError):
+        return None
+
+
+def _storable_quantity(quantity):
+    """Round to RecipeIngredient.quantity's precision, or None when the value does not fit the column."""
+    if quantity is None or abs(quantity) >= _QUANTITY_LIMIT:
+        return None
+    quantity = quantity.quantize(_QUANTITY_STEP)
+    return quantity if abs(quantity) < _QUANTITY_LIMIT else None
+
+
+def _singular(word):
+    if word in SINGULAR_S or len(word) <= 3:
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(('oes', 'ches', 'shes', 'xes')):
+        return word[:-2]
+    if word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def normalize_ingredient_name(name):
+    """Lower-case, drop notes and descriptors, singularize the head noun: "Fresh Shallots, minced" -> "shallot"."""
+    name = _TRAILING_NOTE.sub('', _PARENTHESES.sub(' ', name.lower()).split(',')[0])
+    words = [word for word in _WHITESPACE.split(_NON_WORD.sub(' ', name)) if word and word not in DESCRIPTORS]
+    if words and words[0] == 'of':
+        words = words[1:]
+    if not words:
+        return ''
+    words[-1] = _singular(words[-1])
+    return ' '.join(words)
+
+
+def parse_ingredient_line(line):
+    """
+    Parse one ingredient line into {'raw_text', 'name', 'quantity', 'unit'}.
+    Quantity is a Decimal or None, unit a canonical unit or ''.
+    """
+    raw_text = line.strip()
+    text = _BULLET.sub('', raw_text)
+    for symbol, fraction in UNICODE_FRACTIONS.items():
+        text = re.sub(rf'(\d)\s*{symbol}', rf'\1 {fraction}', text).replace(symbol, fraction)
+
+    quantity = None
+    match = _QUANTITY.match(text)
+    if match:
+        quantity = _storable_quantity(_parse_quantity(match.group('quantity')))
+        text = text[match.end():]
+
+    unit = ''
+    words = text.split()
+    if len(words) > 1 and f"{words[0]} {words[1]}".lower().rstrip('.') == 'fl oz':
+        unit, words = 'fl oz', words[2:]
+    elif words:
+        token = words[0].rstrip('.')
+        if token in CASE_SENSITIVE_UNITS:
+            unit, words = CASE_SENSITIVE_UNITS[token], words[1:]
+        # A single letter is only a unit after a number ("2 c flour", but "c" alone is not)
+        elif token.lower() in UNIT_ALIASES and (len(token) > 1 or match):
+            unit, words = UNIT_ALIASES[token.lower()], words[1:]
+
+    return {
+        'raw_text': raw_text[:255],
+        'name': normalize_ingredient_name(' '.join(words))[:100],
+        'quantity': quantity,
+        'unit': unit,
+    }
+
+
+def parse_ingredients(text):
+    return [parsed for parsed in map(parse_ingredient_line, split_ingredient_lines(text)) if parsed['name']]
+
+
+def reindex_recipe_ingredients(recipe):
+    reindex_ingredients_bulk([recipe])
+
+
+def reindex_ingredients_bulk(recipes):
+    """Replace the RecipeIngredient rows of many recipes with one delete and one insert."""
+    recipes = [recipe for recipe in recipes if recipe.pk]
+    if not recipes:
+        return 0
+
+    rows = [
+        RecipeIngredient(recipe_id=recipe.pk, position=position, **parsed)
+        for recipe in recipes
+        for position, parsed in enumerate(parse_ingredients(recipe.ingredients))
+    ]
+    RecipeIngredient.objects.filter(recipe_id__in=[recipe.pk for recipe in recipes]).delete()
+    RecipeIngredient.objects.bulk_create(rows)
+    return len(rows)
+
+
+def filter_by_ingredients(queryset, any_of=(), all_of=(), none_of=()):
+    """
+    Narrow a ManualRecipe queryset by normalized ingredient names using the
+    (name, recipe) index: any_of keeps recipes using at least one, all_of
+    those using every one, none_of drops recipes using any of them.
+    """
+    any_of, all_of, none_of = ({normalize_ingredient_name(n) for n in names} - {''} for names in (any_of, all_of, none_of))
+
+    if any_of:
+        queryset = queryset.filter(pk__in=RecipeIngredient.objects.filter(name__in=any_of).values('recipe_id'))
+    if all_of:
+        matching = (
+            RecipeIngredient.objects.filter(name__in=all_of)
+            .values('recipe_id')
+            .annotate(matched=Count('name', distinct=True))
+            .filter(matched=len(all_of))
+            .values('recipe_id')
+        )
+        queryset = queryset.filter(pk__in=matching)
+    if none_of:
+        queryset = queryset.exclude(pk__in=RecipeIngredient.objects.filter(name__in=none_of).values('recipe_id'))
+    return queryset
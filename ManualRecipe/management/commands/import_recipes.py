@@ -0,0 +1,40 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from ManualRecipe.importing import IMPORT_FORMATS, detect_import_format, import_recipe_batches, read_import_rows
+
+
+class Command(BaseCommand):
+    help = "Bulk import manual recipes for a user from a CSV or NDJSON file, printing one JSON result per row."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help="Id or email of the owning user.")
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=settings.MANUAL_RECIPE_IMPORT_BATCH_SIZE)
+        parser.add_argument('--quiet', action='store_true', help="Only print failed rows and the summary.")
+
+    def handle(self, *args, **options):
+        lookup = {'id': options['user']} if options['user'].isdigit() else {'email': options['user']}
+        try:
+            user = User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} not found")
+
+        import_format = options['format'] or detect_import_format(options['path'])
+        if import_format is None:
+            raise CommandError("Cannot tell the file format from its name; pass --format")
+
+        counts = {'created': 0, 'failed': 0}
+        with open(options['path'], 'rb') as stream:
+            for results in import_recipe_batches(user, read_import_rows(stream, import_format), options['batch_size']):
+                for result in results:
+                    counts[result['status']] += 1
+                    if not options['quiet'] or result['status'] == 'failed':
+                        self.stdout.write(json.dumps(result))
+
+        style = self.style.SUCCESS if not counts['failed'] else self.style.WARNING
+        self.stdout.write(style(f"Imported {counts['created']} recipes, {counts['failed']} rows failed."))
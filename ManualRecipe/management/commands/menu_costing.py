@@ -0,0 +1,38 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from ManualRecipe.costing import COSTING_GROUPS, analyze_menu, parse_sales
+from ManualRecipe.models import ManualRecipe
+
+
+class Command(BaseCommand):
+    help = "Print food cost %, contribution margin and menu-engineering classes of manual recipes as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Id or email of the user whose recipes to analyse (default: every recipe).")
+        parser.add_argument('--group-by', choices=COSTING_GROUPS)
+        parser.add_argument('--sales', help="CSV file with recipe_id and sold columns; without it the sales mix is even.")
+        parser.add_argument('--items', action='store_true', help="Include per-recipe metrics and class.")
+
+    def handle(self, *args, **options):
+        recipes = ManualRecipe.objects.all()
+        if options['user']:
+            lookup = {'id': options['user']} if options['user'].isdigit() else {'email': options['user']}
+            try:
+                recipes = recipes.filter(user=User.objects.get(**lookup))
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user']} not found")
+
+        sales = None
+        if options['sales']:
+            try:
+                with open(options['sales'], newline='', encoding='utf-8-sig') as source:
+                    sales = parse_sales({row['recipe_id']: row['sold'] for row in csv.DictReader(source)})
+            except (OSError, KeyError, ValueError) as e:
+                raise CommandError(f"Cannot read sales from {options['sales']}: {e}")
+
+        result = analyze_menu(recipes, group_by=options['group_by'], sales=sales, with_items=options['items'])
+        self.stdout.write(json.dumps(result, indent=2))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ManualRecipe.ingredients import reindex_ingredients_bulk
+from ManualRecipe.models import ManualRecipe
+
+
+class Command(BaseCommand):
+    help = "Re-parse ManualRecipe.ingredients into RecipeIngredient rows (after parser changes or for existing recipes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="Only reindex this user's recipes.")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        recipes = ManualRecipe.objects.only('id', 'ingredients').order_by('id')
+        if options['user']:
+            recipes = recipes.filter(user_id=options['user'])
+
+        batch, recipe_count, row_count = [], 0, 0
+        for recipe in recipes.iterator(chunk_size=options['batch_size']):
+            batch.append(recipe)
+            if len(batch) >= options['batch_size']:
+                row_count += self._flush(batch)
+                recipe_count += len(batch)
+                batch = []
+        if batch:
+            row_count += self._flush(batch)
+            recipe_count += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Reindexed {recipe_count} recipes into {row_count} ingredient rows."))
+
+    @staticmethod
+    def _flush(batch):
+        with transaction.atomic():
+            return reindex_ingredients_bulk(batch)
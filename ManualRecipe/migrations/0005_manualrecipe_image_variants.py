@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ManualRecipe', '0004_manualrecipe_image_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='manualrecipe',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Resized WebP/JPEG derivatives of image'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+from django.db import migrations
+
+
+# The DDL is frozen as of this migration; ManualRecipe.search keeps the live
+# copy that repairs the SQLite triggers after later migrations
+WEIGHTED_VECTOR = " || ".join(
+    f"setweight(to_tsvector('english'::regconfig, coalesce({column}, '')), '{weight}')"
+    for column, weight in (
+        ('dish_name', 'A'), ('tags', 'B'), ('ingredients', 'B'), ('dish_description', 'C'), ('directions', 'D'),
+    )
+)
+FTS_COLUMNS = "dish_name, tags, ingredients, dish_description, directions"
+FTS_NEW = "new.id, new.dish_name, new.tags, new.ingredients, new.dish_description, new.directions"
+FTS_OLD = "old.id, old.dish_name, old.tags, old.ingredients, old.dish_description, old.directions"
+
+INSTALL = {
+    'postgresql': [
+        'ALTER TABLE "ManualRecipe_manualrecipe" ADD COLUMN IF NOT EXISTS search_vector tsvector '
+        f'GENERATED ALWAYS AS ({WEIGHTED_VECTOR}) STORED',
+        'CREATE INDEX IF NOT EXISTS manualrecipe_search_idx ON "ManualRecipe_manualrecipe" USING GIN (search_vector)',
+    ],
+    'sqlite': [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS manualrecipe_fts USING fts5({FTS_COLUMNS}, "
+        "content='ManualRecipe_manualrecipe', content_rowid='id', tokenize='porter unicode61')",
+        'CREATE TRIGGER IF NOT EXISTS manualrecipe_fts_ai AFTER INSERT ON "ManualRecipe_manualrecipe" BEGIN '
+        f"INSERT INTO manualrecipe_fts(rowid, {FTS_COLUMNS}) VALUES ({FTS_NEW}); END",
+        'CREATE TRIGGER IF NOT EXISTS manualrecipe_fts_ad AFTER DELETE ON "ManualRecipe_manualrecipe" BEGIN '
+        f"INSERT INTO manualrecipe_fts(manualrecipe_fts, rowid, {FTS_COLUMNS}) VALUES ('delete', {FTS_OLD}); END",
+        'CREATE TRIGGER IF NOT EXISTS manualrecipe_fts_au AFTER UPDATE ON "ManualRecipe_manualrecipe" BEGIN '
+        f"INSERT INTO manualrecipe_fts(manualrecipe_fts, rowid, {FTS_COLUMNS}) VALUES ('delete', {FTS_OLD}); "
+        f"INSERT INTO manualrecipe_fts(rowid, {FTS_COLUMNS}) VALUES ({FTS_NEW}); END",
+        # Index the recipes that already exist
+        "INSERT INTO manualrecipe_fts(manualrecipe_fts) VALUES ('rebuild')",
+    ],
+}
+
+DROP = {
+    'postgresql': [
+        'DROP INDEX IF EXISTS manualrecipe_search_idx',
+        'ALTER TABLE "ManualRecipe_manualrecipe" DROP COLUMN IF EXISTS search_vector',
+    ],
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS manualrecipe_fts_ai',
+        'DROP TRIGGER IF EXISTS manualrecipe_fts_ad',
+        'DROP TRIGGER IF EXISTS manualrecipe_fts_au',
+        'DROP TABLE IF EXISTS manualrecipe_fts',
+    ],
+}
+
+
+def _execute(statements):
+    def run(apps, schema_editor):
+        connection = schema_editor.connection
+        with connection.cursor() as cursor:
+            for sql in statements.get(connection.vendor, ()):
+                cursor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ManualRecipe', '0005_manualrecipe_image_variants'),
+    ]
+
+    operations = [
+        # tsvector column + GIN index on PostgreSQL, FTS5 table + triggers on SQLite
+        migrations.RunPython(_execute(INSTALL), _execute(DROP)),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ManualRecipe', '0006_manualrecipe_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuType',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='manualrecipe',
+            name='menu_type_links',
+            field=models.ManyToManyField(blank=True, related_name='recipes', to='ManualRecipe.menutype'),
+        ),
+        migrations.AddField(
+            model_name='manualrecipe',
+            name='tag_links',
+            field=models.ManyToManyField(blank=True, related_name='recipes', to='ManualRecipe.tag'),
+        ),
+    ]
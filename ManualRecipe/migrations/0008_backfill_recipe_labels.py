@@ -0,0 +1,45 @@
+from django.db import migrations
+
+
+BATCH_SIZE = 500
+
+
+def backfill_recipe_labels(apps, schema_editor):
+    from ManualRecipe.tagging import split_labels
+
+    ManualRecipe = apps.get_model('ManualRecipe', 'ManualRecipe')
+    Tag = apps.get_model('ManualRecipe', 'Tag')
+    MenuType = apps.get_model('ManualRecipe', 'MenuType')
+
+    for model, field, link_field, target_column in (
+        (Tag, 'tags', 'tag_links', 'tag_id'),
+        (MenuType, 'menu_type', 'menu_type_links', 'menutype_id'),
+    ):
+        rows = list(ManualRecipe.objects.values_list('pk', field))
+        labels_by_recipe = {pk: split_labels(value) for pk, value in rows}
+
+        names = sorted({name for labels in labels_by_recipe.values() for name in labels})
+        model.objects.bulk_create([model(name=name) for name in names], batch_size=BATCH_SIZE, ignore_conflicts=True)
+        ids = dict(model.objects.values_list('name', 'pk'))
+
+        through = getattr(ManualRecipe, link_field).through
+        through.objects.bulk_create(
+            [
+                through(manualrecipe_id=pk, **{target_column: ids[name]})
+                for pk, labels in labels_by_recipe.items()
+                for name in labels
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ManualRecipe', '0007_tags_and_menu_types'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_recipe_labels, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ManualRecipe', '0009_recipeingredient'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='manualrecipe',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='manualrecipe_user_created_idx'),
+        ),
+    ]
@@ -2,6 +2,26 @@ from django.db import models
 from accounts.models import User
 
 
+class Tag(models.Model):
+    """Normalized (lower-case, trimmed) tag parsed from ManualRecipe.tags."""
+    name = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+
+
+class MenuType(models.Model):
+    """Normalized menu type parsed from ManualRecipe.menu_type."""
+    name = models.CharField(max_length=100, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+
+
 class ManualRecipe(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='manual_recipes')
     dish_name = models.CharField(max_length=255)
@@ -9,6 +29,10 @@ class ManualRecipe(models.Model):
     menu_type = models.CharField(max_length=255, help_text="Comma-separated menu types (e.g. breakfast, lunch, dinner)")
     tags = models.CharField(max_length=255, help_text="Comma-separated tags (e.g. vegan, spicy, gluten-free)", null=True, blank=True)
 
+    # Kept in sync from menu_type/tags on save (see ManualRecipe.tagging)
+    menu_type_links = models.ManyToManyField(MenuType, related_name='recipes', blank=True)
+    tag_links = models.ManyToManyField(Tag, related_name='recipes', blank=True)
+
     dish_price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
     food_cost = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
     food_percent_markup = models.DecimalField(max_digits=5, decimal_places=2, help_text="e.g., 25.00 for 25% markup", null=True, blank=True)
@@ -24,9 +48,36 @@ class ManualRecipe(models.Model):
 
     image = models.ImageField(upload_to='media/recipes_images/', null=True, blank=True)
     image_url = models.URLField(max_length=1024,null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, help_text="Resized WebP/JPEG derivatives of image")
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='manualrecipe_user_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.dish_name} by {self.user.username}"
+
+
+
+
+class RecipeIngredient(models.Model):
+    """One parsed line of ManualRecipe.ingredients, rebuilt whenever the recipe's ingredients change."""
+    recipe = models.ForeignKey(ManualRecipe, on_delete=models.CASCADE, related_name='ingredient_rows')
+    position = models.PositiveSmallIntegerField()
+    raw_text = models.CharField(max_length=255)
+    name = models.CharField(max_length=100, help_text="Normalized ingredient name, e.g. 'shallot'")
+    quantity = models.DecimalField(max_digits=10, decimal_places=3, null=True, blank=True)
+    unit = models.CharField(max_length=20, blank=True)
+
+    class Meta:
+        ordering = ['recipe', 'position']
+        indexes = [
+            models.Index(fields=['name', 'recipe'], name='recipeingredient_name_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.recipe_id})"
@@ -0,0 +1,154 @@
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import ManualRecipe
+
+
+# Searched columns and their weight (PostgreSQL A-D labels / SQLite bm25 multipliers)
+SEARCH_FIELDS = (
+    ('dish_name', 'A', 10.0),
+    ('tags', 'B', 4.0),
+    ('ingredients', 'B', 4.0),
+    ('dish_description', 'C', 2.0),
+    ('directions', 'D', 1.0),
+)
+
+TABLE = ManualRecipe._meta.db_table
+FTS_TABLE = 'manualrecipe_fts'
+SEARCH_CONFIG = 'english'
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def _postgres_install_sql():
+    vector = ' || '.join(
+        f"setweight(to_tsvector('{SEARCH_CONFIG}'::regconfig, coalesce({column}, '')), '{weight}')"
+        for column, weight, _ in SEARCH_FIELDS
+    )
+    return [
+        # Generated column: PostgreSQL keeps it current on every insert/update
+        f'ALTER TABLE "{TABLE}" ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({vector}) STORED',
+        f'CREATE INDEX IF NOT EXISTS manualrecipe_search_idx ON "{TABLE}" USING GIN (search_vector)',
+    ]
+
+
+def _sqlite_install_sql():
+    columns = ', '.join(column for column, _, _ in SEARCH_FIELDS)
+    new_values = ', '.join(f'new.{column}' for column, _, _ in SEARCH_FIELDS)
+    old_values = ', '.join(f'old.{column}' for column, _, _ in SEARCH_FIELDS)
+    return [
+        # External-content FTS5 table over the recipe rows, kept in sync by triggers
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{columns}, content='{TABLE}', content_rowid='id', tokenize='porter unicode61')",
+        f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON "{TABLE}" BEGIN '
+        f'INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END',
+        f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON "{TABLE}" BEGIN '
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END",
+        f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON "{TABLE}" BEGIN '
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+        f'INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END',
+    ]
+
+
+def _sqlite_triggers_present(cursor):
+    cursor.execute(
+        "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s AND name LIKE %s",
+        [TABLE, f'{FTS_TABLE}_%'],
+    )
+    return cursor.fetchone()[0] == 3
+
+
+def install_search_index(using_connection=None):
+    """
+    Create (or repair) the full-text index for the connection's backend.
+    Idempotent: runs after every migrate, because SQLite table rebuilds
+    during later migrations drop the FTS triggers. Migration 0006 keeps its
+    own frozen copy of this DDL.
+    """
+    conn = using_connection or connection
+    with conn.cursor() as cursor:
+        if conn.vendor == 'postgresql':
+            for sql in _postgres_install_sql():
+                cursor.execute(sql)
+        elif conn.vendor == 'sqlite':
+            if _sqlite_triggers_present(cursor):
+                return
+            for sql in _sqlite_install_sql():
+                cursor.execute(sql)
+            # Re-index everything written while the triggers were missing
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_search_index(using_connection=None):
+    conn = using_connection or connection
+    with conn.cursor() as cursor:
+        if conn.vendor == 'postgresql':
+            cursor.execute('DROP INDEX IF EXISTS manualrecipe_search_idx')
+            cursor.execute(f'ALTER TABLE "{TABLE}" DROP COLUMN IF EXISTS search_vector')
+        elif conn.vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def _fts5_query(terms):
+    # Quote every word so user input can never be read as FTS5 syntax; the
+    # last word also matches as a prefix for search-as-you-type
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _tsquery(terms):
+    # The same rules for to_tsquery: words joined with AND, never read as
+    # operators (they are \w+ only), the last one also a prefix
+    return ' & '.join([*terms[:-1], f'{terms[-1]}:*'])
+
+
+def search_recipes(queryset, query):
+    """
+    Filter `queryset` to recipes matching `query` and order them by
+    relevance (best first, newest first on ties). Every word must match
+    in at least one searched field and the last word also matches as a
+    prefix, on every backend; operators in `query` are read as words.
+    Adds a `search_rank` annotation.
+    """
+    terms = _WORD.findall(query)
+    if not terms:
+        return queryset.none()
+
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        tsquery = "to_tsquery(%s::regconfig, %s)"
+        params = (SEARCH_CONFIG, _tsquery(terms))
+        queryset = queryset.annotate(
+            search_match=RawSQL(f'"{TABLE}".search_vector @@ {tsquery}', params, output_field=BooleanField()),
+            search_rank=RawSQL(f'ts_rank_cd("{TABLE}".search_vector, {tsquery})', params, output_field=FloatField()),
+        ).filter(search_match=True)
+
+    elif vendor == 'sqlite':
+        match = _fts5_query(terms)
+        weights = ', '.join(str(weight) for _, _, weight in SEARCH_FIELDS)
+        # bm25() is lower-is-better, so negate it to rank like ts_rank
+        queryset = queryset.annotate(
+            search_rank=RawSQL(
+                f'SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = "{TABLE}".id',
+                (match,),
+                output_field=FloatField(),
+            ),
+        ).filter(search_rank__isnull=False)
+
+    else:
+        # No full-text support: every word must appear in some field, unranked
+        for term in terms:
+            matches_term = Q()
+            for column, _, _ in SEARCH_FIELDS:
+                matches_term |= Q(**{f'{column}__icontains': term})
+            queryset = queryset.filter(matches_term)
+        queryset = queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    return queryset.order_by('-search_rank', '-created_at', '-id')
@@ -1,13 +1,21 @@
 from rest_framework import serializers
 from .models import ManualRecipe
 from accounts.models import User,Profile
+from accounts.fieldsets import SparseFieldsetMixin
+from accounts.serializers import ImageVariantsField
+from accounts.uploads import UploadTokenField, UploadTokenMixin
 
 
 
-class ManualRecipeSerializer(serializers.ModelSerializer):
+class ManualRecipeSerializer(SparseFieldsetMixin, UploadTokenMixin, serializers.ModelSerializer):
+    image_upload = UploadTokenField()
+    image_variants = ImageVariantsField()
+    upload_token_fields = {'image_upload': 'image'}
+
     class Meta:
         model = ManualRecipe
-        fields = '__all__'
+        # The label links mirror menu_type/tags and are maintained on save
+        exclude = ['menu_type_links', 'tag_links']
         read_only_fields = ['user', 'created_at', 'updated_at']
 
     def __init__(self, *args, **kwargs):
@@ -27,11 +35,24 @@ class ManualRecipeSerializer(serializers.ModelSerializer):
 
 
 
+class ManualRecipeSummarySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Lightweight read-only recipe card without the long text fields."""
+    image_variants = ImageVariantsField()
+
+    class Meta:
+        model = ManualRecipe
+        fields = ['id', 'dish_name', 'menu_type', 'tags', 'dish_price', 'image', 'image_url', 'image_variants', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+
+
+
 class UserRecipeSummarySerializer(serializers.ModelSerializer):
     fullname = serializers.CharField(source='profile.fullname')
     image = serializers.ImageField(source='profile.image')
+    image_variants = ImageVariantsField(source='profile.image_variants')
     recipe_count = serializers.IntegerField()
 
     class Meta:
         model = User
-        fields = ['id', 'fullname', 'image', 'recipe_count']
\ No newline at end of file
+        fields = ['id', 'fullname', 'image', 'image_variants', 'recipe_count']
\ No newline at end of file
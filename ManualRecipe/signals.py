@@ -0,0 +1,34 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from accounts.imaging import queue_image_variants
+from subscription.usage import recipe_image_resource, release_usage
+from .models import ManualRecipe
+from .ingredients import reindex_recipe_ingredients
+from .tagging import sync_recipe_labels
+
+
+@receiver(post_save, sender=ManualRecipe)
+def queue_recipe_image_variants(sender, instance, **kwargs):
+    queue_image_variants(instance)
+
+
+@receiver(post_save, sender=ManualRecipe)
+def sync_recipe_tag_links(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not {'tags', 'menu_type'} & set(update_fields):
+        return
+    sync_recipe_labels(instance)
+
+
+@receiver(post_save, sender=ManualRecipe)
+def reindex_recipe_ingredient_rows(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'ingredients' not in update_fields:
+        return
+    reindex_recipe_ingredients(instance)
+
+
+@receiver(post_delete, sender=ManualRecipe)
+def release_recipe_image_usage(sender, instance, **kwargs):
+    # Create and update keep only one picture, so this is the resource the recipe holds in the ledger
+    resource = recipe_image_resource(instance.image, instance.image_url)
+    if resource:
+        release_usage(instance.user_id, resource)
@@ -0,0 +1,71 @@
+import re
+
+from .models import ManualRecipe, MenuType, Tag
+
+
+MAX_LABEL_LENGTH = 100
+
+_SEPARATORS = re.compile(r'[,;\n]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def split_labels(value):
+    """
+    Split a comma-separated tags/menu_type value into normalized labels:
+    trimmed, lower-cased, inner whitespace collapsed, duplicates dropped
+    (first occurrence wins).
+    """
+    labels = []
+    for part in _SEPARATORS.split(value or ''):
+        label = _WHITESPACE.sub(' ', part).strip().lower()[:MAX_LABEL_LENGTH]
+        if label and label not in labels:
+            labels.append(label)
+    return labels
+
+
+def _resolve(model, names):
+    """Map each name to its row, creating missing ones in a single insert."""
+    if not names:
+        return {}
+    existing = dict(model.objects.filter(name__in=names).values_list('name', 'pk'))
+    missing = [name for name in names if name not in existing]
+    if missing:
+        # ignore_conflicts: a concurrent request may create the same label first
+        model.objects.bulk_create([model(name=name) for name in missing], ignore_conflicts=True)
+        existing.update(model.objects.filter(name__in=missing).values_list('name', 'pk'))
+    return existing
+
+
+def sync_recipe_labels(recipe):
+    """Point the recipe's tag/menu-type links at the labels in its text fields."""
+    sync_recipe_labels_bulk([recipe])
+
+
+def sync_recipe_labels_bulk(recipes):
+    """
+    Rebuild the tag and menu-type links of many recipes at once: one insert
+    per label table for new labels and one delete/insert pair per link
+    table, however many recipes there are. Used by post_save, the backfill
+    and bulk imports (bulk_create does not send post_save).
+    """
+    recipes = [recipe for recipe in recipes if recipe.pk]
+    if not recipes:
+        return
+
+    for model, field, link_field in (
+        (Tag, 'tags', 'tag_links'),
+        (MenuType, 'menu_type', 'menu_type_links'),
+    ):
+        labels_by_recipe = {recipe.pk: split_labels(getattr(recipe, field)) for recipe in recipes}
+        all_names = sorted({name for names in labels_by_recipe.values() for name in names})
+        ids = _resolve(model, all_names)
+
+        through = getattr(ManualRecipe, link_field).through
+        target_column = f'{model._meta.model_name}_id'
+        through.objects.filter(manualrecipe_id__in=labels_by_recipe).delete()
+        through.objects.bulk_create([
+            through(manualrecipe_id=recipe_id, **{target_column: ids[name]})
+            for recipe_id, names in labels_by_recipe.items()
+            for name in names
+            if name in ids
+        ])
@@ -1,3 +1,399 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+from decimal import Decimal
+from urllib.parse import urlencode
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from subscription.constants import USAGE_RECIPE_IMAGE, USAGE_RECIPE_IMAGE_URL
+from subscription.models import UsageCounter
+from .ingredients import parse_ingredient_line
+from .models import ManualRecipe, RecipeIngredient
+from .search import _fts5_query, _tsquery
+
+
+def member(email='member@example.com'):
+    return User.objects.create(email=email, username=email, role='member')
+
+
+def make_recipe(user, **fields):
+    defaults = {
+        'dish_name': 'Bread', 'menu_type': 'dinner', 'dish_description': 'd',
+        'ingredients': '2 cups flour', 'directions': 'Bake.',
+    }
+    return ManualRecipe.objects.create(user=user, **{**defaults, **fields})
+
+
+def member_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@async_to_sync
+async def streamed_content(response):
+    return b''.join([chunk async for chunk in response.streaming_content])
+
+
+def ndjson_lines(response):
+    content = streamed_content(response) if response.streaming else response.content
+    return [json.loads(line) for line in content.decode().splitlines()]
+
+
+class IngredientParserTests(TestCase):
+    def test_parses_quantity_unit_and_name(self):
+        parsed = parse_ingredient_line('1 1/2 cups Fresh Shallots, minced')
+        self.assertEqual(parsed['quantity'], Decimal('1.500'))
+        self.assertEqual(parsed['unit'], 'cup')
+        self.assertEqual(parsed['name'], 'shallot')
+
+    def test_quantity_too_large_for_the_column_is_unknown(self):
+        parsed = parse_ingredient_line('100000000 g flour')
+        self.assertIsNone(parsed['quantity'])
+        self.assertEqual((parsed['unit'], parsed['name']), ('g', 'flour'))
+
+    def test_quantity_is_rounded_to_the_column_precision(self):
+        self.assertEqual(parse_ingredient_line('1/3 cup sugar')['quantity'], Decimal('0.333'))
+        self.assertEqual(parse_ingredient_line('0.00001 g saffron')['quantity'], Decimal('0.000'))
+
+    def test_recipes_are_found_by_ingredient(self):
+        user = member()
+        make_recipe(user, dish_name='Salsa', ingredients='2 large Tomatoes, diced\n1 red onion')
+        make_recipe(user, dish_name='Soup', ingredients='3 tomatoes\n1 l stock')
+        make_recipe(member('other@example.com'), dish_name='Salad', ingredients='1 tomato')
+        client = member_client(user)
+
+        def names(**params):
+            response = client.get('/member/manual-recipes/by-ingredients/', params)
+            return sorted(recipe['dish_name'] for recipe in response.data['results'])
+
+        self.assertEqual(names(any='tomato'), ['Salsa', 'Soup'])
+        self.assertEqual(names(all='Tomatoes, red onion'), ['Salsa'])
+        self.assertEqual(names(any='tomato', none='stock'), ['Salsa'])
+        self.assertEqual(client.get('/member/manual-recipes/by-ingredients/').status_code, 400)
+
+    def test_saving_a_recipe_with_an_oversized_quantity_indexes_it(self):
+        recipe = make_recipe(member(), ingredients='100000000 g flour\n2 eggs')
+        rows = list(RecipeIngredient.objects.filter(recipe=recipe).values_list('name', 'quantity'))
+        self.assertEqual(rows, [('flour', None), ('egg', Decimal('2.000'))])
+
+
+
+
+CSV_HEADER = "dish_name,menu_type,dish_description,ingredients,directions,tags\n"
+
+
+@override_settings(MANUAL_RECIPE_IMPORT_BATCH_SIZE=2)
+class RecipeImportTests(TestCase):
+    def setUp(self):
+        self.user = member()
+        self.client = member_client(self.user)
+
+    def import_file(self, name, content):
+        upload = SimpleUploadedFile(name, content.encode())
+        return self.client.post('/member/manual-recipes/import/', {'file': upload}, format='multipart')
+
+    def test_rows_after_failed_batches_are_created_and_streamed(self):
+        response = self.import_file('recipes.csv', CSV_HEADER
+                                    + ",lunch,d,x,y,\n" * 2
+                                    + 'Soup,"Lunch, Dinner",d,1 l stock,Heat.,Vegan\n')
+
+        self.assertEqual(response.status_code, 200)
+        lines = ndjson_lines(response)
+        self.assertEqual([line.get('status') for line in lines], ['failed', 'failed', 'created', None])
+        self.assertEqual(lines[-1], {'done': True, 'created': 1, 'failed': 2})
+        recipe = ManualRecipe.objects.get(user=self.user)
+        self.assertEqual(sorted(recipe.menu_type_links.values_list('name', flat=True)), ['dinner', 'lunch'])
+        self.assertEqual(list(recipe.tag_links.values_list('name', flat=True)), ['vegan'])
+        self.assertEqual(list(recipe.ingredient_rows.values_list('name', flat=True)), ['stock'])
+
+    def test_file_where_every_row_fails_is_unprocessable(self):
+        response = self.import_file('recipes.csv', CSV_HEADER + ",lunch,d,x,y,\n" * 5)
+
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(response.streaming)
+        lines = ndjson_lines(response)
+        self.assertEqual(len(lines), 6)
+        self.assertEqual(lines[-1], {'done': True, 'created': 0, 'failed': 5})
+        self.assertIn('dish_name', lines[0]['errors'])
+
+    def test_unreadable_ndjson_lines_fail_on_their_own(self):
+        recipe = {'dish_name': 'Soup', 'menu_type': 'lunch', 'dish_description': 'd',
+                  'ingredients': '1 l stock', 'directions': 'Heat.', 'id': 999}
+        response = self.import_file('recipes.ndjson', f"{json.dumps(recipe)}\nnot json\n[1]\n")
+
+        lines = ndjson_lines(response)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([line.get('status') for line in lines], ['created', 'failed', 'failed', None])
+        # Ids in the file are ignored
+        self.assertNotEqual(lines[0]['id'], 999)
+
+
+
+
+class RecipeSearchTests(TestCase):
+    def setUp(self):
+        self.user = member()
+        self.client = member_client(self.user)
+
+    def search(self, query):
+        response = self.client.get('/member/manual-recipes/search/', {'q': query})
+        self.assertEqual(response.status_code, 200, response.data)
+        return [recipe['dish_name'] for recipe in response.data['results']]
+
+    def test_matches_in_the_dish_name_rank_first(self):
+        make_recipe(self.user, dish_name='Bread', directions='Serve with tomato soup.')
+        make_recipe(self.user, dish_name='Tomato Soup')
+        make_recipe(member('other@example.com'), dish_name='Tomato Salad')
+
+        self.assertEqual(self.search('tomato'), ['Tomato Soup', 'Bread'])
+        # Every word must match, the last one also as a prefix
+        self.assertEqual(self.search('soup tom'), ['Tomato Soup', 'Bread'])
+        self.assertEqual(self.search('tomatoes salad'), [])
+
+    def test_words_match_their_stem_and_the_last_one_a_prefix(self):
+        make_recipe(self.user, dish_name='Roasted Tomatoes')
+        self.assertEqual(self.search('tomato roa'), ['Roasted Tomatoes'])
+        self.assertEqual(self.search('roa tomato'), [])
+
+    def test_backend_queries_require_every_word_and_a_prefix_on_the_last(self):
+        self.assertEqual(_tsquery(['fish', 'or', 'chi']), 'fish & or & chi:*')
+        self.assertEqual(_fts5_query(['fish', 'or', 'chi']), '"fish" "or" "chi"*')
+
+    def test_index_follows_updates_and_deletes(self):
+        recipe = make_recipe(self.user, dish_name='Tomato Soup')
+        recipe.dish_name = 'Pumpkin Soup'
+        recipe.save()
+        self.assertEqual(self.search('tomato'), [])
+        self.assertEqual(self.search('pumpkin'), ['Pumpkin Soup'])
+        recipe.delete()
+        self.assertEqual(self.search('pumpkin'), [])
+
+    def test_query_syntax_is_treated_as_words(self):
+        make_recipe(self.user, dish_name='Fish and Chips')
+        make_recipe(self.user, dish_name='Fish Pie')
+        self.assertEqual(self.search('fish AND "chips'), ['Fish and Chips'])
+        self.assertEqual(self.search('pie or chips'), [])
+        self.assertEqual(self.search('fish -chips'), ['Fish and Chips'])
+        self.assertEqual(self.client.get('/member/manual-recipes/search/', {'q': ' '}).status_code, 400)
+        self.assertEqual(self.client.get('/member/manual-recipes/search/', {'q': '***'}).data['results'], [])
+
+
+
+
+class RecipeLabelTests(TestCase):
+    def setUp(self):
+        self.user = member()
+        self.client = member_client(self.user)
+        make_recipe(self.user, dish_name='Curry', menu_type='Lunch, Dinner', tags='Vegan; Spicy')
+        make_recipe(self.user, dish_name='Steak', menu_type='dinner', tags='spicy')
+        make_recipe(member('other@example.com'), dish_name='Tofu', menu_type='dinner', tags='vegan')
+
+    def names(self, **params):
+        response = self.client.get('/member/manual-recipes/', params)
+        return sorted(recipe['dish_name'] for recipe in response.data['results'])
+
+    def test_filters_match_normalized_labels(self):
+        self.assertEqual(self.names(menu_type='DINNER'), ['Curry', 'Steak'])
+        self.assertEqual(self.names(tag=['spicy', 'vegan']), ['Curry'])
+        self.assertEqual(self.names(tag='vegan', menu_type='lunch'), ['Curry'])
+
+    def test_links_follow_edits_of_the_text_fields(self):
+        recipe = ManualRecipe.objects.get(dish_name='Steak')
+        recipe.tags = 'grill'
+        recipe.save()
+        self.assertEqual(self.names(tag='spicy'), ['Curry'])
+        self.assertEqual(self.names(tag='grill'), ['Steak'])
+
+    def test_facets_count_the_members_labels(self):
+        facets = self.client.get('/member/manual-recipes/facets/', {'menu_type': 'dinner'}).data
+        self.assertEqual(facets['tags'], [{'name': 'spicy', 'count': 2}, {'name': 'vegan', 'count': 1}])
+        self.assertEqual(facets['menu_types'], [{'name': 'dinner', 'count': 2}, {'name': 'lunch', 'count': 1}])
+
+
+
+
+class RecipeListTests(TestCase):
+    def setUp(self):
+        self.user = member()
+        self.client = member_client(self.user)
+
+    def test_cursor_pages_are_stable_when_recipes_are_added(self):
+        for number in range(5):
+            make_recipe(self.user, dish_name=f'Dish {number}')
+
+        first = self.client.get('/member/manual-recipes/', {'page_size': 2}).data
+        self.assertEqual([recipe['dish_name'] for recipe in first['results']], ['Dish 4', 'Dish 3'])
+        # A recipe created meanwhile does not shift the next page
+        make_recipe(self.user, dish_name='Dish 5')
+        second = self.client.get(first['next']).data
+        self.assertEqual([recipe['dish_name'] for recipe in second['results']], ['Dish 2', 'Dish 1'])
+
+    def test_list_returns_summaries_unless_full_detail_is_asked_for(self):
+        make_recipe(self.user)
+        summary = self.client.get('/member/manual-recipes/').data['results'][0]
+        self.assertNotIn('directions', summary)
+        self.assertIn('menu_type', summary)
+        full = self.client.get('/member/manual-recipes/', {'detail': 'full'}).data['results'][0]
+        self.assertEqual(full['directions'], 'Bake.')
+
+
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class RecipeExportTests(TestCase):
+    def setUp(self):
+        self.user = member()
+        self.client = member_client(self.user)
+        for number in range(3):
+            make_recipe(self.user, dish_name=f'Dish {number}', tags='vegan' if number else None, dish_price='12.50')
+        make_recipe(member('other@example.com'), dish_name='Not mine')
+
+    def test_ndjson_export_streams_the_members_recipes_oldest_first(self):
+        response = self.client.get('/member/manual-recipes/export/')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="recipes.ndjson"')
+        rows = ndjson_lines(response)
+        self.assertEqual([row['dish_name'] for row in rows], ['Dish 0', 'Dish 1', 'Dish 2'])
+        self.assertEqual(rows[0]['dish_price'], '12.50')
+
+        filtered = ndjson_lines(self.client.get('/member/manual-recipes/export/', {'tag': 'vegan'}))
+        self.assertEqual([row['dish_name'] for row in filtered], ['Dish 1', 'Dish 2'])
+
+    def test_csv_export_can_be_imported_again(self):
+        exported = streamed_content(self.client.get('/member/manual-recipes/export/', {'file_format': 'csv'}))
+        self.assertTrue(exported.startswith(b'id,dish_name,menu_type,tags,'))
+
+        other = member('copy@example.com')
+        upload = SimpleUploadedFile('recipes.csv', exported)
+        response = member_client(other).post('/member/manual-recipes/import/', {'file': upload}, format='multipart')
+        self.assertEqual(ndjson_lines(response)[-1], {'done': True, 'created': 3, 'failed': 0})
+        self.assertEqual(
+            list(ManualRecipe.objects.filter(user=other).order_by('id').values_list('dish_name', 'tags', 'dish_price')),
+            [('Dish 0', None, Decimal('12.50')), ('Dish 1', 'vegan', Decimal('12.50')), ('Dish 2', 'vegan', Decimal('12.50'))],
+        )
+
+    def test_unknown_format_is_rejected(self):
+        self.assertEqual(self.client.get('/member/manual-recipes/export/', {'file_format': 'xml'}).status_code, 400)
+
+
+
+
+class MenuCostingTests(TestCase):
+    def setUp(self):
+        self.user = member()
+        self.client = member_client(self.user)
+        self.star = make_recipe(self.user, dish_name='Star', menu_type='lunch, dinner', dish_price='10', food_cost='3')
+        self.thin = make_recipe(self.user, dish_name='Thin', menu_type='dinner', dish_price='10', food_cost='6')
+        # Price derived from the cost and a 100% markup
+        self.marked_up = make_recipe(self.user, dish_name='Marked up', menu_type='lunch', food_cost='5',
+                                     food_percent_markup='100')
+        make_recipe(self.user, dish_name='Uncosted', menu_type='dinner')
+
+    def costing(self, sales=None, **params):
+        if sales is None:
+            response = self.client.get('/member/manual-recipes/costing/', params)
+        else:
+            response = self.client.post(f'/member/manual-recipes/costing/?{urlencode(params)}', {'sales': sales}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_even_mix_classifies_by_margin(self):
+        result = self.costing(items='true')
+        overall = result['overall']
+        self.assertEqual((overall['recipes'], overall['costed']), (4, 3))
+        self.assertEqual(overall['food_cost_percent'], 46.67)
+        self.assertEqual(overall['average_price'], 10.0)
+        self.assertEqual(overall['average_contribution_margin'], 5.33)
+        self.assertEqual(overall['classes'], {'star': 1, 'plowhorse': 2, 'puzzle': 0, 'dog': 0})
+
+        items = {item['dish_name']: item for item in result['items']}
+        self.assertEqual(items['Marked up']['price'], 10.0)
+        self.assertEqual(items['Star']['food_cost_percent'], 30.0)
+        self.assertEqual(items['Star']['class'], 'star')
+        self.assertIsNone(items['Uncosted']['class'])
+
+    def test_reported_sales_classify_by_popularity_too(self):
+        sales = {str(self.star.pk): 10, str(self.thin.pk): 50}
+        result = self.costing(sales=sales, items='true')
+        self.assertEqual(result['sales_mix'], 'reported')
+        self.assertEqual(result['overall']['average_contribution_margin'], 4.5)
+        classes = {item['dish_name']: item['class'] for item in result['items']}
+        self.assertEqual(classes, {'Star': 'puzzle', 'Thin': 'plowhorse', 'Marked up': 'puzzle', 'Uncosted': None})
+
+    def test_each_menu_type_is_analysed_as_its_own_menu(self):
+        groups = {group['group']: group for group in self.costing(group_by='menu_type')['groups']}
+        self.assertEqual(groups['dinner']['recipes'], 3)
+        self.assertEqual(groups['dinner']['average_contribution_margin'], 5.5)
+        self.assertEqual(groups['lunch']['classes'], {'star': 1, 'plowhorse': 1, 'puzzle': 0, 'dog': 0})
+
+    def test_no_matching_recipes_and_bad_input(self):
+        self.assertEqual(self.costing(tag='missing')['overall']['recipes'], 0)
+        self.assertEqual(self.client.get('/member/manual-recipes/costing/', {'group_by': 'chef'}).status_code, 400)
+        response = self.client.post('/member/manual-recipes/costing/', {'sales': {'1': -2}}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+
+
+def png_upload(name='dish.png'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), 'orange').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class RecipeImageUsageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        self.user = member()
+        self.client = member_client(self.user)
+
+    def create(self, **fields):
+        recipe = {'dish_name': 'Soup', 'menu_type': 'dinner', 'dish_description': 'd',
+                  'ingredients': '1 l stock', 'directions': 'Heat.', **fields}
+        response = self.client.post('/member/manual-recipes/', recipe)
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id']
+
+    def used(self, resource):
+        return UsageCounter.objects.filter(user=self.user, resource=resource).values_list('count', flat=True).get()
+
+    def test_switching_picture_kind_moves_usage_and_delete_releases_it(self):
+        recipe_id = self.create(image_url='https://example.com/soup.jpg')
+        self.assertEqual(self.used(USAGE_RECIPE_IMAGE_URL), 1)
+
+        response = self.client.patch(f'/member/manual-recipes/{recipe_id}/', {'image': png_upload()})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertIsNone(response.data['image_url'])
+        self.assertEqual((self.used(USAGE_RECIPE_IMAGE), self.used(USAGE_RECIPE_IMAGE_URL)), (1, 0))
+
+        self.assertEqual(self.client.delete(f'/member/manual-recipes/{recipe_id}/').status_code, 204)
+        self.assertEqual((self.used(USAGE_RECIPE_IMAGE), self.used(USAGE_RECIPE_IMAGE_URL)), (0, 0))
+
+    def test_clearing_the_picture_releases_it_once(self):
+        kept = self.create(image_url='https://example.com/kept.jpg')
+        cleared = self.create(image_url='https://example.com/cleared.jpg')
+
+        response = self.client.patch(f'/member/manual-recipes/{cleared}/', {'image_url': ''})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.used(USAGE_RECIPE_IMAGE_URL), 1)
+        self.client.delete(f'/member/manual-recipes/{cleared}/')
+        self.assertEqual(self.used(USAGE_RECIPE_IMAGE_URL), 1)
+        self.assertTrue(ManualRecipe.objects.filter(pk=kept).exists())
+
+    def test_update_over_the_free_allowance_is_rejected_unchanged(self):
+        for index in range(3):
+            self.create(image=png_upload(f'dish{index}.png'))
+        recipe_id = self.create(image_url='https://example.com/soup.jpg')
+
+        response = self.client.patch(f'/member/manual-recipes/{recipe_id}/', {'image': png_upload()})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(ManualRecipe.objects.get(pk=recipe_id).image_url, 'https://example.com/soup.jpg')
+        self.assertEqual((self.used(USAGE_RECIPE_IMAGE), self.used(USAGE_RECIPE_IMAGE_URL)), (3, 1))
@@ -1,7 +1,14 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
 from rest_framework import viewsets, permissions, status
 from .models import ManualRecipe
-from .serializers import ManualRecipeSerializer,UserRecipeSummarySerializer
+from .serializers import ManualRecipeSerializer,ManualRecipeSummarySerializer,UserRecipeSummarySerializer
+from accounts.exports import EXPORT_FORMAT_PARAMETER, EXPORT_FORMATS, export_response, requested_export_format
+from accounts.fieldsets import SPARSE_FIELDSET_PARAMETERS, SparseFieldsetViewMixin, sparse_queryset
 from accounts.permissions import IsMemberRole
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
@@ -9,14 +16,55 @@ from accounts.permissions import IsAdminRole
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from accounts.models import User
-from django.db.models import Count
-from .pagination import StandardResultsSetPagination
+from django.db import transaction
+from django.db.models import Count, F
+from .pagination import ManualRecipeCursorPagination, StandardResultsSetPagination
+from .costing import COSTING_GROUPS, analyze_menu, parse_sales
+from .importing import IMPORT_FORMATS, detect_import_format, import_recipe_batches, read_import_rows
+from .ingredients import filter_by_ingredients
+from .search import search_recipes
+from .tagging import split_labels
+from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.parsers import MultiPartParser
+from subscription.usage import QuotaExceeded, quota_headers, recipe_image_resource, release_usage, reserve_usage
 
 # Create your views here.
 
 
-class ManualRecipeViewSet(viewsets.ModelViewSet):
+LABEL_FILTER_PARAMETERS = [
+    openapi.Parameter('tag', openapi.IN_QUERY, description="Only recipes with this tag (repeatable)",
+                      type=openapi.TYPE_ARRAY, items=openapi.Items(type=openapi.TYPE_STRING), collection_format='multi'),
+    openapi.Parameter('menu_type', openapi.IN_QUERY, description="Only recipes with this menu type (repeatable)",
+                      type=openapi.TYPE_ARRAY, items=openapi.Items(type=openapi.TYPE_STRING), collection_format='multi'),
+]
+
+# Columns of the NDJSON/CSV recipe export (image becomes an absolute URL)
+MANUAL_RECIPE_EXPORT_FIELDS = (
+    'id', 'dish_name', 'menu_type', 'tags', 'dish_price', 'food_cost', 'food_percent_markup',
+    'date_to_serve', 'cooking_station', 'dish_description', 'ingredients', 'directions',
+    'text_instructions', 'image', 'image_url', 'created_at', 'updated_at',
+)
+
+MENU_COSTING_PARAMETERS = [
+    openapi.Parameter('group_by', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=[*COSTING_GROUPS],
+                      description="Also analyse each menu type or cooking station as its own menu"),
+    openapi.Parameter('items', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
+                      description="Include per-recipe metrics and class"),
+]
+
+
+def menu_costing_response(request, recipes, sales=None):
+    """Run analyze_menu() on `recipes` with the request's ?group_by= and ?items= options."""
+    group_by = request.query_params.get('group_by') or None
+    if group_by is not None and group_by not in COSTING_GROUPS:
+        return Response({"error": f"group_by must be one of: {', '.join(COSTING_GROUPS)}."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    with_items = request.query_params.get('items', '').lower() in ('1', 'true', 'yes')
+    return Response(analyze_menu(recipes, group_by=group_by, sales=sales, with_items=with_items))
+
+
+class ManualRecipeViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     """
     ViewSet for members to manage their manual recipes.
     Only allows authenticated users with 'member' role to access.
@@ -29,16 +77,76 @@ class ManualRecipeViewSet(viewsets.ModelViewSet):
         """Return only recipes that belong to the current user."""
         return ManualRecipe.objects.filter(user=self.request.user)
 
+    def filter_by_labels(self, queryset):
+        """
+        Apply ?tag= and ?menu_type= filters (repeat a parameter to require
+        several labels). Each label is an indexed join on the link tables.
+        """
+        for name in split_labels(','.join(self.request.query_params.getlist('tag'))):
+            queryset = queryset.filter(tag_links__name=name)
+        for name in split_labels(','.join(self.request.query_params.getlist('menu_type'))):
+            queryset = queryset.filter(menu_type_links__name=name)
+        return queryset
+
     def perform_create(self, serializer):
         """Attach current user to the recipe."""
         serializer.save(user=self.request.user)
 
     @swagger_auto_schema(
-        operation_description="List all manual recipes created by the logged-in member.",
-        tags=["Manual Recipes"]
+        operation_description="List the logged-in member's manual recipes, newest first (cursor paginated). "
+                              "Items are summaries without ingredients, directions and other long text; pass "
+                              "`detail=full` for complete recipes. Filter with `tag` and `menu_type` (repeat "
+                              "to require several, e.g. ?tag=vegan&menu_type=dinner).",
+        tags=["Manual Recipes"],
+        manual_parameters=[
+            openapi.Parameter('detail', openapi.IN_QUERY, description="'full' to include every recipe field",
+                              type=openapi.TYPE_STRING, enum=['summary', 'full']),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description="Cursor from the previous page's next/previous link",
+                              type=openapi.TYPE_STRING),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="Results per page (max 100)", type=openapi.TYPE_INTEGER),
+            *LABEL_FILTER_PARAMETERS,
+            *SPARSE_FIELDSET_PARAMETERS,
+        ],
+        responses={200: ManualRecipeSummarySerializer(many=True)}
     )
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        queryset = self.filter_by_labels(self.get_queryset())
+        if request.query_params.get('detail') == 'full':
+            serializer_class = ManualRecipeSerializer
+        else:
+            serializer_class = ManualRecipeSummarySerializer
+            queryset = queryset.only(*ManualRecipeSummarySerializer.Meta.fields)
+        queryset = sparse_queryset(queryset, serializer_class, request, extra=('created_at',))
+
+        paginator = ManualRecipeCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = serializer_class(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+    @swagger_auto_schema(
+        operation_description="Tag and menu type counts over the member's recipes, narrowed by any "
+                              "`tag`/`menu_type` filters, most used first.",
+        tags=["Manual Recipes"],
+        manual_parameters=LABEL_FILTER_PARAMETERS
+    )
+    @action(detail=False, methods=['get'], url_path='facets')
+    def facets(self, request):
+        recipes = self.filter_by_labels(self.get_queryset()).values('pk')
+
+        def counts(link_field, label_field):
+            through = getattr(ManualRecipe, link_field).through
+            rows = (
+                through.objects.filter(manualrecipe__in=recipes)
+                .values(name=F(f'{label_field}__name'))
+                .annotate(count=Count('id'))
+                .order_by('-count', 'name')
+            )
+            return list(rows)
+
+        return Response({
+            'tags': counts('tag_links', 'tag'),
+            'menu_types': counts('menu_type_links', 'menutype'),
+        })
 
     @swagger_auto_schema(
         operation_description="Create a new manual recipe (with optional image upload).",
@@ -61,6 +169,8 @@ class ManualRecipeViewSet(viewsets.ModelViewSet):
                 'ingredients': openapi.Schema(type=openapi.TYPE_STRING),
                 'directions': openapi.Schema(type=openapi.TYPE_STRING),
                 'image': openapi.Schema(type=openapi.TYPE_FILE),
+                'image_upload': openapi.Schema(type=openapi.TYPE_STRING, format='uuid',
+                                               description="Token of a finalized chunked upload, instead of image"),
                 'image_url': openapi.Schema(type=openapi.TYPE_STRING),
             }
         )
@@ -70,42 +180,221 @@ class ManualRecipeViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        image = serializer.validated_data.get("image")
-        image_url = serializer.validated_data.get("image_url")
+        resource = self.keep_one_image(serializer.validated_data)
 
-        if user.role == "member":
-            if not user.subscriptions.filter(is_active=True).exists():
-                # Limit for free members
-                image_count = ManualRecipe.objects.filter(user=user, image__isnull=False).count()
-                image_url_count = ManualRecipe.objects.filter(user=user, image_url__isnull=False).count()
+        try:
+            # The ledger update rolls back with the insert if saving fails
+            with transaction.atomic():
+                remaining = reserve_usage(user, resource) if resource else None
+                # ✅ Fix here — just pass serializer
+                self.perform_create(serializer)
+        except QuotaExceeded as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
 
-                if image and image_count >= 3:
-                    return Response(
-                        {"error": "You can only create up to 3 recipes with an image without an active subscription."},
-                        status=status.HTTP_409_CONFLICT,
-                    )
+        headers = self.get_success_headers(serializer.data)
+        if resource:
+            headers.update(quota_headers(remaining))
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
-                if image_url and image_url_count >= 3:
-                    return Response(
-                        {"error": "You can only create up to 3 recipes with an image URL without an active subscription."},
-                        status=status.HTTP_409_CONFLICT,
-                    )
+    @swagger_auto_schema(
+        operation_description="Bulk import recipes from an uploaded CSV (header row of recipe field names) or "
+                              "NDJSON file (one recipe object per line). Rows are validated and inserted in "
+                              "batches; images are imported by `image_url` only. Streams newline-delimited JSON: "
+                              "one line per row with `status` created or failed (with `errors`), then a summary line. "
+                              "When no row could be created the same lines come back unstreamed with status 422.",
+        tags=["Manual Recipes"],
+        manual_parameters=[
+            openapi.Parameter('file', openapi.IN_FORM, type=openapi.TYPE_FILE, required=True),
+            openapi.Parameter('format', openapi.IN_FORM, type=openapi.TYPE_STRING, enum=[*IMPORT_FORMATS],
+                              description="Defaults to the file extension"),
+        ],
+        request_body=None
+    )
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_recipes(self, request):
+        """
+        Import format: a CSV file whose header row names recipe fields, or
+        NDJSON with one recipe object per line, using the same field names.
+
+        Required columns: dish_name, menu_type, dish_description,
+        ingredients, directions. Optional: tags, dish_price, food_cost,
+        food_percent_markup, date_to_serve (YYYY-MM-DD), cooking_station,
+        text_instructions, image_url. id, user, image, image_variants,
+        created_at and updated_at are ignored; empty CSV cells are omitted.
+
+        menu_type (like tags) is free text, not a fixed list: one or more
+        comma-separated menu types such as "breakfast, lunch, dinner",
+        stored lower-cased and trimmed, at most 100 characters each.
+
+        The response is held back until a batch creates a recipe, so a file
+        in which every row fails is answered with 422 and the failed rows
+        instead of a streamed 200.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "Upload the recipes as a `file` form field."}, status=status.HTTP_400_BAD_REQUEST)
+
+        import_format = request.data.get('format') or detect_import_format(upload.name, upload.content_type)
+        if import_format not in IMPORT_FORMATS:
+            return Response({"error": f"format must be one of: {', '.join(IMPORT_FORMATS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        batches = import_recipe_batches(
+            request.user, read_import_rows(upload, import_format), settings.MANUAL_RECIPE_IMPORT_BATCH_SIZE
+        )
+        # Only the failed rows ahead of the first created recipe are held in memory
+        pending = []
+        for results in batches:
+            pending.append(results)
+            if any(result['status'] == 'created' for result in results):
+                break
+        else:
+            counts = {'created': 0, 'failed': 0}
+            body = ''.join(self._import_lines(results, counts) for results in pending)
+            body += json.dumps({"done": True, **counts}) + "\n"
+            return HttpResponse(body, status=status.HTTP_422_UNPROCESSABLE_ENTITY, content_type='application/x-ndjson')
+
+        response = StreamingHttpResponse(self._import_stream(pending, batches), content_type='application/x-ndjson')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @staticmethod
+    def _import_lines(results, counts):
+        for result in results:
+            counts[result['status']] += 1
+        return ''.join(json.dumps(result) + "\n" for result in results)
+
+    @classmethod
+    async def _import_stream(cls, pending, batches):
+        counts = {'created': 0, 'failed': 0}
+        for results in pending:
+            yield cls._import_lines(results, counts)
+        while True:
+            # Each batch is parsed and written on the request's sync thread
+            results = await sync_to_async(next, thread_sensitive=True)(batches, None)
+            if results is None:
+                break
+            yield cls._import_lines(results, counts)
+        yield json.dumps({"done": True, **counts}) + "\n"
 
-        # Ensure only one of image / image_url is stored
-        if image:
-            serializer.validated_data["image_url"] = None
-        elif image_url:
-            serializer.validated_data["image"] = None
+    @swagger_auto_schema(
+        operation_description="Download every recipe of the member (narrowed by any `tag`/`menu_type` filters) "
+                              "as a streamed NDJSON or CSV file, oldest first.",
+        tags=["Manual Recipes"],
+        manual_parameters=[EXPORT_FORMAT_PARAMETER, *LABEL_FILTER_PARAMETERS]
+    )
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        export_format = requested_export_format(request)
+        if export_format is None:
+            return Response({"error": f"file_format must be one of: {', '.join(EXPORT_FORMATS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-        # ✅ Fix here — just pass serializer
-        self.perform_create(serializer)
+        recipes = self.filter_by_labels(self.get_queryset()).order_by('id')
+        return export_response(request, recipes, MANUAL_RECIPE_EXPORT_FIELDS, 'recipes', export_format, file_fields=['image'])
 
-        headers = self.get_success_headers(serializer.data)
-        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Menu costing of the member's recipes: food cost %, contribution margin and "
+                              "menu-engineering class (star, plowhorse, puzzle, dog), overall and optionally per "
+                              "menu type or cooking station. A missing price or food cost is derived from the "
+                              "other and `food_percent_markup`. Without sales figures every dish gets an even "
+                              "share of the mix, so classes reflect margin only; POST them to classify by "
+                              "popularity too.",
+        tags=["Manual Recipes"],
+        manual_parameters=[*MENU_COSTING_PARAMETERS, *LABEL_FILTER_PARAMETERS]
+    )
+    @swagger_auto_schema(
+        method='post',
+        operation_description="Menu costing with the units sold of each recipe over a period; recipes left out "
+                              "count as not sold.",
+        tags=["Manual Recipes"],
+        manual_parameters=[*MENU_COSTING_PARAMETERS, *LABEL_FILTER_PARAMETERS],
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['sales'],
+            properties={
+                'sales': openapi.Schema(type=openapi.TYPE_OBJECT, additional_properties=openapi.Schema(type=openapi.TYPE_NUMBER),
+                                        description="Units sold by recipe id, e.g. {\"12\": 40, \"15\": 9}"),
+            }
+        )
+    )
+    @action(detail=False, methods=['get', 'post'], url_path='costing')
+    def costing(self, request):
+        sales = None
+        if request.method == 'POST':
+            try:
+                sales = parse_sales(request.data.get('sales'))
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return menu_costing_response(request, self.filter_by_labels(self.get_queryset()), sales)
+
+    @swagger_auto_schema(
+        operation_description="Full-text search over the member's recipes (dish name, description, ingredients, "
+                              "tags and directions), best matches first. Every word must match; the last word "
+                              "also matches as a prefix.",
+        tags=["Manual Recipes"],
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, description="Search text", type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('page', openapi.IN_QUERY, description="Page number", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="Results per page", type=openapi.TYPE_INTEGER),
+            *LABEL_FILTER_PARAMETERS,
+            *SPARSE_FIELDSET_PARAMETERS,
+        ],
+        responses={200: ManualRecipeSerializer(many=True)}
+    )
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"error": "q query parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        recipes = search_recipes(self.filter_queryset(self.filter_by_labels(self.get_queryset())), query)
+
+        paginator = StandardResultsSetPagination()
+        page = paginator.paginate_queryset(recipes, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @swagger_auto_schema(
+        operation_description="Find the member's recipes by ingredient. Names are matched after normalization "
+                              "(case, plurals and words like 'fresh' or 'chopped' are ignored), so 'Tomatoes' "
+                              "finds '2 large tomatoes, diced'. Each parameter takes comma separated names and "
+                              "can be repeated; at least one is required.",
+        tags=["Manual Recipes"],
+        manual_parameters=[
+            openapi.Parameter('any', openapi.IN_QUERY, description="Recipes using at least one of these", type=openapi.TYPE_STRING),
+            openapi.Parameter('all', openapi.IN_QUERY, description="Recipes using every one of these", type=openapi.TYPE_STRING),
+            openapi.Parameter('none', openapi.IN_QUERY, description="Exclude recipes using any of these", type=openapi.TYPE_STRING),
+            openapi.Parameter('page', openapi.IN_QUERY, description="Page number", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="Results per page", type=openapi.TYPE_INTEGER),
+            *LABEL_FILTER_PARAMETERS,
+            *SPARSE_FIELDSET_PARAMETERS,
+        ],
+        responses={200: ManualRecipeSerializer(many=True)}
+    )
+    @action(detail=False, methods=['get'], url_path='by-ingredients')
+    def by_ingredients(self, request):
+        any_of, all_of, none_of = (
+            [name for value in request.query_params.getlist(param) for name in split_labels(value)]
+            for param in ('any', 'all', 'none')
+        )
+        if not (any_of or all_of or none_of):
+            return Response({"error": "Provide at least one of the any, all or none query parameters."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        recipes = filter_by_ingredients(self.filter_queryset(self.filter_by_labels(self.get_queryset())), any_of, all_of, none_of)
+
+        paginator = StandardResultsSetPagination()
+        page = paginator.paginate_queryset(recipes.order_by('-created_at', '-id'), request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     @swagger_auto_schema(
         operation_description="Retrieve a specific manual recipe owned by the logged-in member.",
-        tags=["Manual Recipes"]
+        tags=["Manual Recipes"],
+        manual_parameters=SPARSE_FIELDSET_PARAMETERS
     )
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
@@ -115,7 +404,36 @@ class ManualRecipeViewSet(viewsets.ModelViewSet):
         tags=["Manual Recipes"]
     )
     def update(self, request, *args, **kwargs):
-        return super().update(request, *args, **kwargs)
+        try:
+            return super().update(request, *args, **kwargs)
+        except QuotaExceeded as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+
+    def perform_update(self, serializer):
+        recipe = serializer.instance
+        previous = recipe_image_resource(recipe.image, recipe.image_url)
+        data = serializer.validated_data
+        if "image" in data or "image_url" in data:
+            self.keep_one_image(data)
+        current = recipe_image_resource(data.get("image", recipe.image), data.get("image_url", recipe.image_url))
+
+        # Move the ledger entry when the picture changes kind, so deleting the recipe later releases the right one
+        with transaction.atomic():
+            if current != previous:
+                if current:
+                    reserve_usage(self.request.user, current)
+                if previous:
+                    release_usage(self.request.user, previous)
+            serializer.save()
+
+    @staticmethod
+    def keep_one_image(validated_data):
+        """Ensure only one of image / image_url is stored; returns the resource the picture counts against."""
+        if validated_data.get("image"):
+            validated_data["image_url"] = None
+        elif validated_data.get("image_url"):
+            validated_data["image"] = None
+        return recipe_image_resource(validated_data.get("image"), validated_data.get("image_url"))
 
     @swagger_auto_schema(
         operation_description="Partially update a manual recipe.",
@@ -203,6 +521,7 @@ class AdminUserRecipeListView(APIView):
                 description="Results per page",
                 type=openapi.TYPE_INTEGER
             ),
+            *SPARSE_FIELDSET_PARAMETERS,
         ],
         responses={200: ManualRecipeSerializer(many=True)},
         tags=["admin"]
@@ -217,8 +536,33 @@ class AdminUserRecipeListView(APIView):
         except User.DoesNotExist:
             return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        recipes = ManualRecipe.objects.filter(user=user).order_by('-created_at')
+        recipes = sparse_queryset(ManualRecipe.objects.filter(user=user).order_by('-created_at'), ManualRecipeSerializer, request)
         serializer = ManualRecipeSerializer(recipes, many=True, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
     
-    
\ No newline at end of file
+    
+
+
+
+class AdminMenuCostingView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdminRole]
+
+    @swagger_auto_schema(
+        operation_description="Menu costing across the platform, or of one user's recipes with `user_id`: food "
+                              "cost %, contribution margin and menu-engineering class counts, overall and "
+                              "optionally per menu type or cooking station. Sales are not recorded, so every "
+                              "dish gets an even share of the mix and classes reflect margin only.",
+        manual_parameters=[
+            openapi.Parameter('user_id', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description="Only this user's recipes"),
+            *MENU_COSTING_PARAMETERS,
+        ],
+        tags=["admin"]
+    )
+    def get(self, request):
+        recipes = ManualRecipe.objects.all()
+        user_id = request.query_params.get('user_id')
+        if user_id:
+            if not User.objects.filter(id=user_id).exists():
+                return Response({"error": "User not found."}, status=status.HTTP_404_NOT_FOUND)
+            recipes = recipes.filter(user_id=user_id)
+        return menu_costing_response(request, recipes)
@@ -274,4 +274,78 @@ DATABASES = {
 
 STRIPE_WEBHOOK_SECRET=os.getenv('STRIPE_WEBHOOK_SECRET')
 
-OPENAI_API_KEY=os.getenv('OPENAI_API_KEY')
\ No newline at end of file
+OPENAI_API_KEY=os.getenv('OPENAI_API_KEY')
+# Point at `manage.py fake_openai_server` (e.g. http://127.0.0.1:8765/v1) for offline load tests
+OPENAI_API_BASE=os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
+
+# Background workers that run queued AI recipe generation jobs
+AI_JOB_WORKERS=int(os.getenv('AI_JOB_WORKERS', 4))
+# Pending/running jobs idle this long were lost with their process (restart or crash);
+# `manage.py expire_ai_recipe_jobs` fails them and releases their quota
+AI_JOB_EXPIRY_MINUTES=int(os.getenv('AI_JOB_EXPIRY_MINUTES', 30))
+
+# Per-call timeouts (seconds) for the concurrent recipe text / image calls
+AI_CHAT_TIMEOUT=float(os.getenv('AI_CHAT_TIMEOUT', 60))
+AI_IMAGE_TIMEOUT=float(os.getenv('AI_IMAGE_TIMEOUT', 45))
+
+# In-process LRU cache of generated AI recipes, keyed on normalized inputs
+AI_RECIPE_CACHE_SIZE=int(os.getenv('AI_RECIPE_CACHE_SIZE', 512))
+AI_RECIPE_CACHE_TTL=int(os.getenv('AI_RECIPE_CACHE_TTL', 60 * 60 * 24))
+
+# Background workers that render thumbnail/medium/full image derivatives
+IMAGE_VARIANT_WORKERS=int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
+
+# Ask the chat model for function-call JSON instead of parsing free text,
+# with a bounded number of repair turns for malformed output
+AI_STRUCTURED_OUTPUT=os.getenv('AI_STRUCTURED_OUTPUT', 'true').lower() in ('1', 'true', 'yes')
+AI_STRUCTURED_REPAIR_ATTEMPTS=int(os.getenv('AI_STRUCTURED_REPAIR_ATTEMPTS', 1))
+
+# Outbound OpenAI call scheduler (per process): token bucket rate/burst,
+# concurrent call cap, bounded wait queue and maximum queueing time
+AI_SCHEDULER_RATE=float(os.getenv('AI_SCHEDULER_RATE', 5))
+AI_SCHEDULER_BURST=int(os.getenv('AI_SCHEDULER_BURST', 10))
+AI_SCHEDULER_MAX_IN_FLIGHT=int(os.getenv('AI_SCHEDULER_MAX_IN_FLIGHT', 16))
+AI_SCHEDULER_MAX_QUEUE=int(os.getenv('AI_SCHEDULER_MAX_QUEUE', 64))
+AI_SCHEDULER_MAX_WAIT=float(os.getenv('AI_SCHEDULER_MAX_WAIT', 30))
+
+# Bulk pro tips: concurrent OpenAI calls per request and recipes per request
+AI_BULK_PRO_TIPS_CONCURRENCY=int(os.getenv('AI_BULK_PRO_TIPS_CONCURRENCY', 4))
+AI_BULK_PRO_TIPS_MAX=int(os.getenv('AI_BULK_PRO_TIPS_MAX', 50))
+
+# Cache shared by every worker process, e.g. redis://localhost:6379/1 (needs the
+# redis package). Without it Django falls back to a per-process LocMem cache
+CACHE_URL=os.getenv('CACHE_URL', '')
+if CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        }
+    }
+
+# Seconds a user's resolved subscription entitlement is cached between requests.
+# Only safe with CACHE_URL: a per-process cache would keep serving a cancelled
+# subscription in every worker but the one that handled the change, so without
+# it entitlements are resolved once per request instead
+ENTITLEMENT_CACHE_TTL=int(os.getenv('ENTITLEMENT_CACHE_TTL', 300 if CACHE_URL else 0))
+
+# Outbound AI call metrics: also log each call to AICallMetric, written in
+# batches of AI_METRICS_FLUSH_SIZE or every AI_METRICS_FLUSH_INTERVAL seconds
+AI_METRICS_DB_LOG=os.getenv('AI_METRICS_DB_LOG', 'true').lower() in ('1', 'true', 'yes')
+AI_METRICS_FLUSH_SIZE=int(os.getenv('AI_METRICS_FLUSH_SIZE', 50))
+AI_METRICS_FLUSH_INTERVAL=float(os.getenv('AI_METRICS_FLUSH_INTERVAL', 10))
+
+# Manual recipe bulk import: rows validated, quota-checked and inserted per batch
+MANUAL_RECIPE_IMPORT_BATCH_SIZE=int(os.getenv('MANUAL_RECIPE_IMPORT_BATCH_SIZE', 200))
+
+# Rows fetched per database round trip (and per streamed chunk) by NDJSON/CSV exports
+EXPORT_CHUNK_SIZE=int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+
+# Resumable chunked image uploads: working directory for chunks, default and
+# maximum chunk size, maximum file size and hours before unfinished or unused
+# uploads are purged (manage.py purge_chunked_uploads)
+CHUNKED_UPLOAD_DIR=os.getenv('CHUNKED_UPLOAD_DIR', os.path.join(BASE_DIR, 'chunked_uploads'))
+CHUNKED_UPLOAD_CHUNK_SIZE=int(os.getenv('CHUNKED_UPLOAD_CHUNK_SIZE', 1024 * 1024))
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE=int(os.getenv('CHUNKED_UPLOAD_MAX_CHUNK_SIZE', 8 * 1024 * 1024))
+CHUNKED_UPLOAD_MAX_SIZE=int(os.getenv('CHUNKED_UPLOAD_MAX_SIZE', 25 * 1024 * 1024))
+CHUNKED_UPLOAD_EXPIRY_HOURS=int(os.getenv('CHUNKED_UPLOAD_EXPIRY_HOURS', 24))
@@ -37,6 +37,15 @@ class TaskConsumer(AsyncWebsocketConsumer):
             "status": event["status"]
         }))
 
+    async def ai_recipe_job_update(self, event):
+        await self.send(text_data=json.dumps({
+            "type": "ai_recipe_job",
+            "job_id": event["job_id"],
+            "status": event["status"],
+            "recipe_id": event["recipe_id"],
+            "error": event["error"]
+        }))
+
     @database_sync_to_async
     def get_user_by_email(self, email):
         return User.objects.get(email=email)
\ No newline at end of file
@@ -1,9 +1,10 @@
 from rest_framework import serializers
 from .models import Task
+from accounts.fieldsets import SparseFieldsetMixin
 from accounts.models import User
 
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     email = serializers.EmailField(write_only=True, help_text="Email of the user to assign the task to")
     
 
@@ -26,7 +27,7 @@ class TaskSerializer(serializers.ModelSerializer):
 
 
 
-class AdminTaskListSerializer(serializers.ModelSerializer):
+class AdminTaskListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     assigned_by_email = serializers.EmailField(source='assigned_by.email', read_only=True)
     assigned_to_email = serializers.EmailField(source='assigned_to.email', read_only=True)
     assigned_to_fullname = serializers.CharField(source='assigned_to.profile.fullname', read_only=True)
@@ -5,6 +5,7 @@ from .models import Task
 from .serializers import TaskSerializer,AdminTaskListSerializer
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from accounts.fieldsets import SPARSE_FIELDSET_PARAMETERS, SparseFieldsetViewMixin
 from accounts.permissions import IsAdminOrChef,IsAdminRole
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
@@ -15,7 +16,7 @@ from rest_framework.generics import ListAPIView
 
 
 
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated, IsAdminOrChef]
     http_method_names = ['get', 'post', 'patch']
@@ -60,14 +61,14 @@ class TaskViewSet(viewsets.ModelViewSet):
         except Exception as e:
             print("WebSocket task assignment failed:", str(e))
 
-    @swagger_auto_schema(tags=["Tasks"])
+    @swagger_auto_schema(tags=["Tasks"], manual_parameters=SPARSE_FIELDSET_PARAMETERS)
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
     
 
 
 
-    @swagger_auto_schema(tags=["Tasks"])
+    @swagger_auto_schema(tags=["Tasks"], manual_parameters=SPARSE_FIELDSET_PARAMETERS)
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
     
@@ -98,7 +99,7 @@ class TaskViewSet(viewsets.ModelViewSet):
 
 
 
-    @swagger_auto_schema(tags=["Tasks"])
+    @swagger_auto_schema(tags=["Tasks"], manual_parameters=SPARSE_FIELDSET_PARAMETERS)
     @action(detail=False, methods=['get'], url_path='assigned-to-me')
     def assigned_to_me(self, request):
         tasks = Task.objects.filter(assigned_to=request.user)
@@ -113,7 +114,7 @@ class TaskViewSet(viewsets.ModelViewSet):
             except ValueError:
                 return Response({"error": "Invalid date format. Use YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = self.get_serializer(tasks, many=True)
+        serializer = self.get_serializer(self.filter_queryset(tasks), many=True)
         return Response(serializer.data)
 
     
@@ -121,11 +122,11 @@ class TaskViewSet(viewsets.ModelViewSet):
 
 
 
-    @swagger_auto_schema(tags=["Tasks"])
+    @swagger_auto_schema(tags=["Tasks"], manual_parameters=SPARSE_FIELDSET_PARAMETERS)
     @action(detail=False, methods=['get'], url_path='i-assigned')
     def i_assigned(self, request):
         tasks = Task.objects.filter(assigned_by=request.user)
-        serializer = self.get_serializer(tasks, many=True)
+        serializer = self.get_serializer(self.filter_queryset(tasks), many=True)
         return Response(serializer.data)
     
 
@@ -164,7 +165,7 @@ class TaskViewSet(viewsets.ModelViewSet):
 
 
 
-class AdminAllTasksListView(ListAPIView):
+class AdminAllTasksListView(SparseFieldsetViewMixin, ListAPIView):
     queryset = Task.objects.select_related('assigned_by', 'assigned_to__profile').order_by('-created_at')
     serializer_class = AdminTaskListSerializer
     permission_classes = [permissions.IsAuthenticated, IsAdminRole]
@@ -175,6 +176,7 @@ class AdminAllTasksListView(ListAPIView):
         manual_parameters=[
             openapi.Parameter('page', openapi.IN_QUERY, description="Page number", type=openapi.TYPE_INTEGER),
             openapi.Parameter('page_size', openapi.IN_QUERY, description="Items per page", type=openapi.TYPE_INTEGER),
+            *SPARSE_FIELDSET_PARAMETERS,
         ],
         tags=["admin"],
         responses={200: AdminTaskListSerializer(many=True)}
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Profile,PasswordResetOTP,EmailVerificationOTP
+from .models import User, Profile,PasswordResetOTP,EmailVerificationOTP,ChunkedUpload
 
 # Customizing how User appears in admin
 class UserAdmin(BaseUserAdmin):
@@ -40,3 +40,12 @@ admin.site.register(User, UserAdmin)
 admin.site.register(Profile, ProfileAdmin)
 admin.site.register(PasswordResetOTP)
 admin.site.register(EmailVerificationOTP)
+
+
+
+
+@admin.register(ChunkedUpload)
+class ChunkedUploadAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'filename', 'size', 'status', 'created_at', 'completed_at')
+    list_filter = ('status',)
+    search_fields = ('user__email', 'filename')
@@ -10,4 +10,12 @@ ROLE_CHOICES=(
 GENDER=(
     ('male','Male'),
     ('female','Female'),
+)
+
+
+
+
+UPLOAD_STATUS_CHOICES=(
+    ('uploading', 'Uploading'),
+    ('complete', 'Complete'),
 )
\ No newline at end of file
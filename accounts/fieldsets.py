@@ -0,0 +1,153 @@
+from django.core.exceptions import FieldDoesNotExist
+from drf_yasg import openapi
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+SPARSE_FIELDSET_PARAMETERS = [
+    openapi.Parameter('fields', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description="Comma separated fields to return, e.g. id,dish_name,image "
+                                  "(dotted names reach nested objects: profile.fullname)"),
+    openapi.Parameter('omit', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description="Comma separated fields to leave out, e.g. directions,ingredients"),
+]
+
+
+def requested_fieldset(request):
+    """Return the (fields, omit) name lists of a read request, both empty when no sparse fieldset is asked for."""
+    if request is None or request.method not in SAFE_METHODS:
+        return [], []
+    params = getattr(request, 'query_params', request.GET)
+    return tuple(
+        [name.strip() for value in params.getlist(param) for name in value.split(',') if name.strip()]
+        for param in ('fields', 'omit')
+    )
+
+
+def _split(names):
+    top, nested = set(), {}
+    for name in names:
+        head, _, rest = name.partition('.')
+        if rest:
+            nested.setdefault(head, []).append(rest)
+        else:
+            top.add(head)
+    return top, nested
+
+
+def _narrow(serializer, fields, omit):
+    keep, keep_nested = _split(fields)
+    drop, drop_nested = _split(omit)
+
+    for name in list(serializer.fields):
+        if (fields and name not in keep and name not in keep_nested) or name in drop:
+            serializer.fields.pop(name)
+
+    for name in set(keep_nested) | set(drop_nested):
+        child = serializer.fields.get(name)
+        child = getattr(child, 'child', child)
+        if isinstance(child, BaseSerializer):
+            # "profile" on its own keeps the whole nested object
+            _narrow(child, [] if name in keep else keep_nested.get(name, []), drop_nested.get(name, []))
+
+
+def _columns(serializer, model, prefix=''):
+    """
+    Map the serializer's remaining fields to .only() paths and the
+    select_related() paths they traverse. None when some field is not a
+    plain column chain (method fields, properties, to-many relations).
+    """
+    only, related = set(), set()
+    sources = [
+        (field, field.source) for field in serializer.fields.values() if not field.write_only
+    ] + [
+        (None, source)
+        for name, extra in getattr(serializer, 'sparse_field_sources', {}).items() if name in serializer.fields
+        for source in extra
+    ]
+
+    for field, source in sources:
+        if source == '*':
+            return None
+        current, path = model, prefix
+        attrs = source.split('.')
+        for position, attr in enumerate(attrs):
+            try:
+                model_field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                return None
+            if model_field.many_to_many or model_field.one_to_many:
+                return None
+            path = f'{path}__{attr}' if path else attr
+            traverses = position < len(attrs) - 1 or isinstance(field, BaseSerializer)
+            if model_field.is_relation and traverses:
+                related.add(path)
+                if model_field.concrete:
+                    only.add(path)
+                current = model_field.related_model
+            elif model_field.concrete:
+                only.add(path)
+            else:
+                return None
+
+        if isinstance(field, BaseSerializer):
+            if isinstance(field, ListSerializer):
+                return None
+            nested = _columns(field, current, path)
+            if nested is None:
+                return None
+            only |= nested[0]
+            related |= nested[1]
+
+    return only, related
+
+
+def sparse_queryset(queryset, serializer_class, request, extra=()):
+    """
+    Load only the columns `serializer_class` renders for the request's
+    ?fields=/?omit= selection (plus `extra`, e.g. the pagination ordering).
+    The queryset is returned unchanged when no sparse fieldset is asked for
+    or the remaining fields cannot be mapped to columns.
+    """
+    fields, omit = requested_fieldset(request)
+    if not (fields or omit):
+        return queryset
+
+    resolved = _columns(serializer_class(context={'request': request}), queryset.model)
+    if resolved is None:
+        return queryset
+    only, related = resolved
+
+    # Earlier select_related() joins would clash with the deferred columns
+    queryset = queryset.select_related(None)
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*only, *extra)
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin for sparse fieldsets: on read requests, ?fields=a,b
+    keeps only those fields and ?omit=c drops fields. Dotted names
+    (?fields=email,profile.fullname) reach into nested serializers.
+    Unknown names are ignored.
+
+    `sparse_field_sources` maps a field to extra model columns it reads
+    outside its own source, so sparse_queryset() still loads them.
+    """
+    sparse_field_sources = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, omit = requested_fieldset(self.context.get('request'))
+        if fields or omit:
+            _narrow(self, fields, omit)
+
+
+
+
+class SparseFieldsetViewMixin:
+    """Generic view mixin: narrow the queryset of read requests to the serializer's sparse fieldset."""
+
+    def filter_queryset(self, queryset):
+        return sparse_queryset(super().filter_queryset(queryset), self.get_serializer_class(), self.request)
@@ -0,0 +1,104 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+# Longest edge in pixels for each derivative; images are never upscaled
+IMAGE_VARIANTS = {
+    'thumb': 160,
+    'medium': 640,
+    'full': 1600,
+}
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_VARIANT_WORKERS,
+    thread_name_prefix='image-variants',
+)
+
+
+def variant_name(source_name, variant, extension):
+    directory, filename = posixpath.split(source_name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'variants', f"{stem}_{variant}.{extension}")
+
+
+def _is_stored_file(name):
+    # Profiles created through Google login store the remote photo URL as the name
+    return bool(name) and not name.startswith(('http://', 'https://'))
+
+
+def build_image_variants(source_name):
+    """
+    Render every size/format derivative of a stored image and return the
+    map saved in `image_variants`. Derivatives that already exist (e.g. for
+    AI recipes sharing a cached image) are reused rather than re-rendered.
+    """
+    variants = {}
+    with default_storage.open(source_name, 'rb') as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+
+    for variant, max_edge in IMAGE_VARIANTS.items():
+        resized = original.copy()
+        resized.thumbnail((max_edge, max_edge))
+        entry = {'width': resized.width, 'height': resized.height}
+
+        for extension, (image_format, options) in VARIANT_FORMATS.items():
+            name = variant_name(source_name, variant, extension)
+            if not default_storage.exists(name):
+                image = resized.convert('RGB') if image_format == 'JPEG' else resized
+                buffer = BytesIO()
+                image.save(buffer, format=image_format, **options)
+                name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            entry[extension] = name
+
+        variants[variant] = entry
+
+    return {'source': source_name, 'variants': variants}
+
+
+def _render_variants(model, pk, field_name, source_name):
+    close_old_connections()
+    try:
+        image_variants = build_image_variants(source_name)
+        # Only store the result if the image was not replaced in the meantime;
+        # update() also avoids re-triggering post_save.
+        model.objects.filter(pk=pk, **{field_name: source_name}).update(image_variants=image_variants)
+    except Exception:
+        logger.exception("Building image variants for %s %s failed", model.__name__, pk)
+    finally:
+        close_old_connections()
+
+
+def queue_image_variants(instance, field_name='image'):
+    """
+    post_save hook: render derivatives off the request path whenever the
+    instance's image changes, or clear them when the image is removed.
+    """
+    source_name = getattr(instance, field_name).name
+    current = instance.image_variants or {}
+
+    if not _is_stored_file(source_name):
+        if current:
+            type(instance).objects.filter(pk=instance.pk).update(image_variants={})
+            instance.image_variants = {}
+        return
+
+    if current.get('source') == source_name:
+        return
+
+    model, pk = type(instance), instance.pk
+    transaction.on_commit(lambda: _executor.submit(_render_variants, model, pk, field_name, source_name))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from accounts.imaging import build_image_variants
+from accounts.models import Profile
+from AiRecipe.models import AIGeneratedRecipe
+from ManualRecipe.models import ManualRecipe
+
+
+class Command(BaseCommand):
+    help = "Render missing thumbnail/medium/full derivatives for recipe and profile images."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Re-check rows whose variants are already recorded as up to date.")
+
+    def handle(self, *args, **options):
+        for model in (ManualRecipe, AIGeneratedRecipe, Profile):
+            built = failed = 0
+            rows = model.objects.exclude(image='').exclude(image__isnull=True).values_list('pk', 'image', 'image_variants')
+
+            for pk, image, image_variants in rows.iterator(chunk_size=500):
+                if image.startswith(('http://', 'https://')):
+                    continue
+                if not options['force'] and (image_variants or {}).get('source') == image:
+                    continue
+                try:
+                    model.objects.filter(pk=pk).update(image_variants=build_image_variants(image))
+                    built += 1
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"{model.__name__} {pk}: {e}")
+
+            self.stdout.write(self.style.SUCCESS(f"{model.__name__}: built {built}, failed {failed}"))
@@ -0,0 +1,31 @@
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.models import ChunkedUpload
+from accounts.uploads import discard_upload, expired_uploads
+
+
+class Command(BaseCommand):
+    help = "Delete chunked uploads older than CHUNKED_UPLOAD_EXPIRY_HOURS that were never finalized or never used."
+
+    def handle(self, *args, **options):
+        purged = 0
+        for upload in expired_uploads().iterator():
+            discard_upload(upload)
+            purged += 1
+
+        # Chunk directories left behind without an upload row (e.g. a crash between delete and rmtree)
+        orphaned = 0
+        cutoff = time.time() - settings.CHUNKED_UPLOAD_EXPIRY_HOURS * 3600
+        if os.path.isdir(settings.CHUNKED_UPLOAD_DIR):
+            live = {str(pk) for pk in ChunkedUpload.objects.values_list('pk', flat=True)}
+            for entry in os.scandir(settings.CHUNKED_UPLOAD_DIR):
+                if entry.is_dir() and entry.name not in live and entry.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    orphaned += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} expired uploads and {orphaned} orphaned chunk directories"))
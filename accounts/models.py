@@ -1,9 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
-from .constants import ROLE_CHOICES,GENDER
+from .constants import ROLE_CHOICES,GENDER,UPLOAD_STATUS_CHOICES
 from django.utils import timezone
 from datetime import timedelta
 import random
+import uuid
 # Create your models here.
 
 
@@ -21,6 +22,7 @@ class User(AbstractUser):
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     image = models.ImageField(upload_to='media/user_images/', null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, help_text="Resized WebP/JPEG derivatives of image")
     fullname = models.CharField(max_length=200, null=True, blank=True)
     phone_number = models.CharField(max_length=20, null=True, blank=True)
     gender = models.CharField(max_length=15, choices=GENDER, null=True, blank=True)
@@ -90,9 +92,42 @@ class PasswordResetOTP(models.Model):
         super().save(*args, **kwargs)
     
     def __str__(self):
-       return f"{self.user.email} - {self.otp}"   
-    
+       return f"{self.user.email} - {self.otp}"
+
+
+
+
+class ChunkedUpload(models.Model):
+    """
+    A resumable image upload. Chunks are written to CHUNKED_UPLOAD_DIR as
+    they arrive; finalize assembles and verifies them and stores the file.
+    The id of a complete upload is the token recipe and profile endpoints
+    accept instead of the file itself.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chunked_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(help_text="Total size in bytes")
+    chunk_size = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64, help_text="Hex SHA-256 of the whole file, checked on finalize")
+    status = models.CharField(max_length=20, choices=UPLOAD_STATUS_CHOICES, default='uploading')
+    file = models.CharField(max_length=255, blank=True, help_text="Storage name of the assembled file")
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='chunkedupload_status_idx'),
+        ]
 
+    @property
+    def total_chunks(self):
+        return max(1, -(-self.size // self.chunk_size))
 
+    def expected_chunk_size(self, index):
+        if index < self.total_chunks - 1:
+            return self.chunk_size
+        return self.size - self.chunk_size * (self.total_chunks - 1)
 
+    def __str__(self):
+        return f"{self.filename} ({self.status}) by {self.user.email}"
@@ -1,7 +1,10 @@
 from rest_framework import serializers
-from .models import User,Profile,EmailVerificationOTP
+from .models import User,Profile,EmailVerificationOTP,ChunkedUpload
+from .fieldsets import SparseFieldsetMixin
+from .uploads import IMAGE_EXTENSIONS, UploadTokenField, UploadTokenMixin
 from django.conf import settings
 from django.core.mail import send_mail
+from django.core.files.storage import default_storage
 # jwt
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
@@ -173,8 +176,34 @@ class ExtendedFileField(serializers.FileField):
 
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    Render a model's `image_variants` map as absolute URLs, e.g.
+    {"thumb": {"width": 160, "height": 120, "webp": url, "jpeg": url}, "medium": {...}, "full": {...}}.
+    Empty until the background derivative job has run.
+    """
+    def to_representation(self, value):
+        variants = (value or {}).get('variants', {})
+        request = self.context.get('request')
+        representation = {}
+        for variant, entry in variants.items():
+            representation[variant] = {}
+            for key, item in entry.items():
+                if key in ('width', 'height'):
+                    representation[variant][key] = item
+                    continue
+                url = default_storage.url(item)
+                representation[variant][key] = request.build_absolute_uri(url) if request is not None else url
+        return representation
+
+
+
+
+class ProfileSerializer(UploadTokenMixin, serializers.ModelSerializer):
     image = ExtendedFileField(required=False)
+    image_upload = UploadTokenField()
+    image_variants = ImageVariantsField()
+    upload_token_fields = {'image_upload': 'image'}
     
     class Meta:
         model = Profile
@@ -185,6 +214,8 @@ class ProfileSerializer(serializers.ModelSerializer):
             'gender', 
             'date_of_birth', 
             'image',
+            'image_upload',
+            'image_variants',
             'bio',            
             'instagram',     
             'facebook',        
@@ -197,11 +228,42 @@ class ProfileSerializer(serializers.ModelSerializer):
 
 
 
-class UserWithProfileSerializer(serializers.ModelSerializer):
+class UserWithProfileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     profile = ProfileSerializer()
 
     class Meta:
         model = User
         fields = ['email', 'role', 'profile']
 
-        
\ No newline at end of file
+
+
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    chunk_size = serializers.IntegerField(required=False, min_value=64 * 1024,
+                                          help_text="Bytes per chunk (all but the last); defaults to CHUNKED_UPLOAD_CHUNK_SIZE")
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$', help_text="Hex SHA-256 of the whole file")
+
+    class Meta:
+        model = ChunkedUpload
+        fields = ['id', 'filename', 'size', 'chunk_size', 'sha256', 'status', 'created_at', 'completed_at']
+        read_only_fields = ['id', 'status', 'created_at', 'completed_at']
+
+    def validate_filename(self, value):
+        if not value.lower().endswith(IMAGE_EXTENSIONS):
+            raise serializers.ValidationError(f"Only images can be uploaded ({', '.join(IMAGE_EXTENSIONS)}).")
+        return value.replace('/', '_').replace('\\', '_')
+
+    def validate_size(self, value):
+        if not 0 < value <= settings.CHUNKED_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Size must be between 1 and {settings.CHUNKED_UPLOAD_MAX_SIZE} bytes.")
+        return value
+
+    def validate_chunk_size(self, value):
+        if value > settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+            raise serializers.ValidationError(f"Chunks can be at most {settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE} bytes.")
+        return value
+
+    def validate(self, attrs):
+        attrs.setdefault('chunk_size', settings.CHUNKED_UPLOAD_CHUNK_SIZE)
+        attrs['sha256'] = attrs['sha256'].lower()
+        return attrs
@@ -0,0 +1,9 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .imaging import queue_image_variants
+from .models import Profile
+
+
+@receiver(post_save, sender=Profile)
+def queue_profile_image_variants(sender, instance, **kwargs):
+    queue_image_variants(instance)
@@ -1,3 +1,229 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from ManualRecipe.models import ManualRecipe
+from . import imaging
+from .fieldsets import sparse_queryset
+from .imaging import IMAGE_VARIANTS, VARIANT_FORMATS
+from .models import ChunkedUpload, Profile, User
+from .serializers import UserWithProfileSerializer
+from .uploads import received_chunks, upload_dir, write_chunk
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+def member(email='member@example.com'):
+    return User.objects.create(email=email, username=email, role='member')
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    # Noise does not compress, so the file spans several chunks
+    Image.frombytes('RGB', (160, 160), os.urandom(160 * 160 * 3)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class BarrierStream:
+    """Request body that stops halfway until every concurrent request has started writing."""
+
+    def __init__(self, data, barrier):
+        self.parts = [data[:len(data) // 2], data[len(data) // 2:]]
+        self.barrier = barrier
+
+    def read(self, size):
+        if not self.parts:
+            return b''
+        if len(self.parts) == 1:
+            self.barrier.wait(5)
+        return self.parts.pop(0)
+
+
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        for setting in ('CHUNKED_UPLOAD_DIR', 'MEDIA_ROOT'):
+            directory = tempfile.TemporaryDirectory()
+            self.addCleanup(directory.cleanup)
+            self.enterContext(override_settings(**{setting: directory.name}))
+        self.user = member()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.data = png_bytes()
+
+    def start(self, client=None, **fields):
+        body = {'filename': 'dish.png', 'size': len(self.data), 'chunk_size': CHUNK_SIZE,
+                'sha256': hashlib.sha256(self.data).hexdigest(), **fields}
+        response = (client or self.client).post('/uploads/', body, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def put_chunk(self, upload_id, index, client=None):
+        return (client or self.client).put(
+            f'/uploads/{upload_id}/chunks/{index}/', self.data[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE],
+            content_type='application/octet-stream',
+        )
+
+    def upload(self, client=None):
+        started = self.start(client)
+        for index in range(started['total_chunks']):
+            self.assertEqual(self.put_chunk(started['id'], index, client).status_code, 200)
+        response = (client or self.client).post(f"/uploads/{started['id']}/finalize/")
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_upload_resumes_from_the_missing_chunks(self):
+        started = self.start()
+        self.assertGreater(started['total_chunks'], 1)
+        self.put_chunk(started['id'], 0)
+
+        status = self.client.get(f"/uploads/{started['id']}/").data
+        self.assertEqual(status['received_chunks'], [0])
+        self.assertEqual(status['missing_chunks'], list(range(1, started['total_chunks'])))
+        self.assertEqual(self.client.post(f"/uploads/{started['id']}/finalize/").status_code, 400)
+
+        for index in status['missing_chunks']:
+            self.put_chunk(started['id'], index)
+        finalized = self.client.post(f"/uploads/{started['id']}/finalize/").data
+        self.assertEqual(finalized['status'], 'complete')
+        # Finalizing again reports the stored upload instead of assembling it twice
+        self.assertEqual(self.client.post(f"/uploads/{started['id']}/finalize/").data, finalized)
+
+    def test_checksum_mismatch_is_rejected(self):
+        started = self.start(sha256='0' * 64)
+        for index in range(started['total_chunks']):
+            self.put_chunk(started['id'], index)
+        response = self.client.post(f"/uploads/{started['id']}/finalize/")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Checksum mismatch', response.data['error'])
+
+    def test_concurrent_retries_of_one_chunk_do_not_collide(self):
+        upload = ChunkedUpload.objects.get(pk=self.start()['id'])
+        chunk = self.data[:CHUNK_SIZE]
+        barrier = threading.Barrier(3)
+        errors = []
+
+        def retry():
+            try:
+                write_chunk(upload, 0, BarrierStream(chunk, barrier))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=retry) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(received_chunks(upload), [0])
+        with open(os.path.join(upload_dir(upload), '0.part'), 'rb') as stored:
+            self.assertEqual(stored.read(), chunk)
+        self.assertEqual(sorted(os.listdir(upload_dir(upload))), ['0.part'])
+
+    def test_finalized_upload_is_used_as_a_recipe_image_by_its_owner_only(self):
+        token = self.upload()['upload_token']
+        recipe = {'dish_name': 'Soup', 'menu_type': 'dinner', 'dish_description': 'd',
+                  'ingredients': '1 l stock', 'directions': 'Heat.', 'image_upload': token}
+
+        other = APIClient()
+        other.force_authenticate(member('other@example.com'))
+        self.assertEqual(other.post('/member/manual-recipes/', recipe, format='json').status_code, 400)
+
+        response = self.client.post('/member/manual-recipes/', recipe, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertIn(f'uploads/{token}.png', response.data['image'])
+        self.assertFalse(ChunkedUpload.objects.filter(pk=token).exists())
+
+
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        user = member()
+        Profile.objects.update_or_create(user=user, defaults={'fullname': 'Ann Member', 'bio': 'Cooks.'})
+
+    def render(self, method='get', **params):
+        request = getattr(RequestFactory(), method)(f'/?{urlencode(params)}')
+        users = sparse_queryset(User.objects.select_related('profile'), UserWithProfileSerializer, request)
+        with self.assertNumQueries(1):
+            return users, UserWithProfileSerializer(list(users), many=True, context={'request': request}).data
+
+    def test_fields_keep_nested_fields_and_load_only_their_columns(self):
+        users, data = self.render(fields='email,profile.fullname')
+        self.assertEqual(data, [{'email': 'member@example.com', 'profile': {'fullname': 'Ann Member'}}])
+        self.assertIn('role', users[0].get_deferred_fields())
+        self.assertIn('bio', users[0].profile.get_deferred_fields())
+
+    def test_omit_drops_a_relation_and_its_join(self):
+        users, data = self.render(omit='profile')
+        self.assertEqual(data, [{'email': 'member@example.com', 'role': 'member'}])
+        self.assertNotIn('JOIN', str(users.query))
+
+    def test_write_requests_get_every_field(self):
+        _, data = self.render(method='post', fields='email')
+        self.assertEqual(set(data[0]), {'email', 'role', 'profile'})
+
+
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        # Render on the test thread, which holds the test transaction
+        self.enterContext(mock.patch.object(imaging._executor, 'submit', side_effect=lambda fn, *args: fn(*args)))
+        self.enterContext(mock.patch('accounts.imaging.close_old_connections'))
+        self.client = APIClient()
+        self.client.force_authenticate(member())
+
+    def create_recipe(self, **fields):
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 400), 'orange').save(buffer, 'PNG')
+        recipe = {'dish_name': 'Soup', 'menu_type': 'dinner', 'dish_description': 'd', 'ingredients': '1 l stock',
+                  'directions': 'Heat.', 'image': SimpleUploadedFile('dish.png', buffer.getvalue()), **fields}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/member/manual-recipes/', recipe)
+        self.assertEqual(response.status_code, 201, response.data)
+        return ManualRecipe.objects.get(pk=response.data['id'])
+
+    def test_saved_image_gets_every_variant_and_they_are_serialized(self):
+        recipe = self.create_recipe()
+
+        variants = recipe.image_variants['variants']
+        self.assertEqual(recipe.image_variants['source'], recipe.image.name)
+        self.assertEqual({name: (entry['width'], entry['height']) for name, entry in variants.items()},
+                         {'thumb': (160, 80), 'medium': (640, 320), 'full': (800, 400)})
+        for entry in variants.values():
+            for extension in VARIANT_FORMATS:
+                self.assertTrue(default_storage.exists(entry[extension]))
+        with default_storage.open(variants['thumb']['webp']) as stored:
+            self.assertEqual(Image.open(stored).format, 'WEBP')
+
+        data = self.client.get(f'/member/manual-recipes/{recipe.pk}/').data['image_variants']
+        self.assertEqual(set(data), set(IMAGE_VARIANTS))
+        self.assertEqual(data['thumb']['width'], 160)
+        self.assertTrue(data['thumb']['jpeg'].endswith(variants['thumb']['jpeg']))
+
+    def test_removing_the_image_clears_its_variants(self):
+        recipe = self.create_recipe()
+        recipe.image = None
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.save()
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants, {})
+        self.assertEqual(self.client.get(f'/member/manual-recipes/{recipe.pk}/').data['image_variants'], {})
@@ -0,0 +1,182 @@
+import hashlib
+import os
+import posixpath
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image
+from rest_framework import serializers
+
+from .models import ChunkedUpload
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+UPLOAD_STORAGE_DIR = 'media/uploads'
+
+_COPY_BUFFER = 64 * 1024
+
+
+class ChunkError(ValueError):
+    pass
+
+
+def upload_dir(upload):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, str(upload.pk))
+
+
+def _chunk_path(upload, index):
+    return os.path.join(upload_dir(upload), f"{index}.part")
+
+
+def received_chunks(upload):
+    """Indexes of the chunks already on disk, read from the directory so concurrent chunk requests never race."""
+    try:
+        names = os.listdir(upload_dir(upload))
+    except FileNotFoundError:
+        return []
+    return sorted(int(name[:-5]) for name in names if name.endswith('.part') and name[:-5].isdigit())
+
+
+def write_chunk(upload, index, stream):
+    """
+    Copy one chunk from the request body straight to disk. The chunk is
+    written to a temporary name and renamed into place, so a dropped
+    connection never leaves a partial chunk and a retried chunk simply
+    replaces the previous attempt.
+    """
+    if not 0 <= index < upload.total_chunks:
+        raise ChunkError(f"Chunk index must be between 0 and {upload.total_chunks - 1}.")
+    expected = upload.expected_chunk_size(index)
+
+    os.makedirs(upload_dir(upload), exist_ok=True)
+    path = _chunk_path(upload, index)
+    # A unique temporary name per request, so concurrent retries of a chunk never share a file
+    target = tempfile.NamedTemporaryFile(dir=upload_dir(upload), prefix=f"{index}.", suffix='.tmp', delete=False)
+    partial = target.name
+    written = 0
+    try:
+        with target:
+            while stream is not None:
+                data = stream.read(_COPY_BUFFER)
+                if not data:
+                    break
+                written += len(data)
+                if written > expected:
+                    raise ChunkError(f"Chunk {index} must be {expected} bytes.")
+                target.write(data)
+        if written != expected:
+            raise ChunkError(f"Chunk {index} must be {expected} bytes, received {written}.")
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+def finalize_upload(upload):
+    """
+    Assemble the chunks in order while hashing them, check the SHA-256 and
+    that the result is an image, then move it into storage. Raises
+    ChunkError (leaving the chunks in place for a retry) on any mismatch.
+    """
+    missing = sorted(set(range(upload.total_chunks)) - set(received_chunks(upload)))
+    if missing:
+        raise ChunkError(f"Missing chunks: {missing}")
+
+    assembled = os.path.join(upload_dir(upload), 'assembled')
+    digest = hashlib.sha256()
+    with open(assembled, 'wb') as target:
+        for index in range(upload.total_chunks):
+            with open(_chunk_path(upload, index), 'rb') as chunk:
+                while data := chunk.read(_COPY_BUFFER):
+                    digest.update(data)
+                    target.write(data)
+
+    if digest.hexdigest() != upload.sha256.lower():
+        os.remove(assembled)
+        raise ChunkError("Checksum mismatch: the assembled file's SHA-256 differs from the one sent at initiate.")
+    try:
+        with Image.open(assembled) as image:
+            image.verify()
+    except Exception:
+        os.remove(assembled)
+        raise ChunkError("The uploaded file is not a valid image.")
+
+    extension = os.path.splitext(upload.filename)[1].lower()
+    with open(assembled, 'rb') as source:
+        name = default_storage.save(posixpath.join(UPLOAD_STORAGE_DIR, f"{upload.pk}{extension}"), File(source))
+    shutil.rmtree(upload_dir(upload), ignore_errors=True)
+
+    upload.status, upload.file, upload.completed_at = 'complete', name, timezone.now()
+    upload.save(update_fields=['status', 'file', 'completed_at'])
+    return upload
+
+
+def discard_upload(upload):
+    """Delete an upload with its chunks, and its stored file unless a recipe or profile took it over."""
+    shutil.rmtree(upload_dir(upload), ignore_errors=True)
+    if upload.file:
+        default_storage.delete(upload.file)
+    upload.delete()
+
+
+def expired_uploads():
+    cutoff = timezone.now() - timedelta(hours=settings.CHUNKED_UPLOAD_EXPIRY_HOURS)
+    return ChunkedUpload.objects.filter(created_at__lt=cutoff)
+
+
+
+
+class UploadTokenField(serializers.UUIDField):
+    """Write-only token of the requesting user's finalized chunked upload."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('write_only', True)
+        kwargs.setdefault('required', False)
+        kwargs.setdefault('help_text', "Token of a finalized chunked upload, sent instead of the file")
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        token = super().to_internal_value(data)
+        request = self.context.get('request')
+        upload = ChunkedUpload.objects.filter(
+            pk=token, user_id=getattr(request.user, 'pk', None), status='complete'
+        ).first() if request is not None else None
+        if upload is None:
+            raise serializers.ValidationError("Unknown or unfinished upload.")
+        return upload
+
+
+
+
+class UploadTokenMixin:
+    """
+    Serializer mixin that lets `upload_token_fields` ({token field: file
+    field}) stand in for an uploaded file. The stored file is attached by
+    name, so no bytes pass through the request, and the upload record is
+    dropped once the instance is saved.
+    """
+    upload_token_fields = {}
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        self._consumed_uploads = []
+        for token_field, file_field in self.upload_token_fields.items():
+            upload = attrs.pop(token_field, None)
+            if upload is None:
+                continue
+            if attrs.get(file_field):
+                raise serializers.ValidationError({token_field: f"Send either {file_field} or {token_field}, not both."})
+            attrs[file_field] = upload.file
+            self._consumed_uploads.append(upload.pk)
+        return attrs
+
+    def save(self, **kwargs):
+        instance = super().save(**kwargs)
+        if getattr(self, '_consumed_uploads', None):
+            ChunkedUpload.objects.filter(pk__in=self._consumed_uploads).delete()
+        return instance
@@ -1,10 +1,11 @@
 from django.urls import path,include
 from rest_framework.routers import DefaultRouter
-from .views import GoogleLoginView,LoginAPIView,RegisterApiView,CustomTokenRefreshView,SendOTPView,VerifyOTPView,ResetPasswordView,ProfileViewSet,VerifyEmailView,ResendOTPView
+from .views import GoogleLoginView,LoginAPIView,RegisterApiView,CustomTokenRefreshView,SendOTPView,VerifyOTPView,ResetPasswordView,ProfileViewSet,VerifyEmailView,ResendOTPView,ChunkedUploadViewSet
 from subscription.views import PublicPackageListView
 
 router = DefaultRouter()
 router.register('profile', ProfileViewSet, basename='profile')
+router.register('uploads', ChunkedUploadViewSet, basename='chunked-upload')
 
 urlpatterns = [
     path('register/', RegisterApiView.as_view(), name='register'),
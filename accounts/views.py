@@ -1,8 +1,8 @@
-from django.shortcuts import render
+from django.shortcuts import render, get_object_or_404
 from rest_framework.generics import CreateAPIView
-from .serializers import RegisterSerializer,CustomTokenObtainPairSerializer,GoogleLoginSerializer,SendOTPSerializer,VerifyOTPSerializer,ResetPasswordSerializer,ProfileSerializer,UserWithProfileSerializer,VerifyEmailSerializer
+from .serializers import ChunkedUploadSerializer,RegisterSerializer,CustomTokenObtainPairSerializer,GoogleLoginSerializer,SendOTPSerializer,VerifyOTPSerializer,ResetPasswordSerializer,ProfileSerializer,UserWithProfileSerializer,VerifyEmailSerializer
 from rest_framework.permissions import AllowAny,IsAuthenticated
-from .models import User,Profile,PasswordResetOTP,EmailVerificationOTP
+from .models import User,Profile,PasswordResetOTP,EmailVerificationOTP,ChunkedUpload
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -11,6 +11,9 @@ from django.conf import settings
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from .permissions import IsAdminRole
+from .fieldsets import SPARSE_FIELDSET_PARAMETERS, sparse_queryset
+from .uploads import ChunkError, discard_upload, finalize_upload, received_chunks, write_chunk
+from django.db import transaction
 from django.db.models.functions import TruncDate
 from django.db.models import Count,Min
 from datetime import timedelta
@@ -20,7 +23,7 @@ from subscription.models import Subscription
 from django.db.models import Sum, Count
 
 # Create your views here.
-from drf_yasg.utils import swagger_auto_schema
+from drf_yasg.utils import swagger_auto_schema, no_body
 from rest_framework_simplejwt.views import TokenRefreshView
 from rest_framework.exceptions import ValidationError
 from drf_yasg import openapi
@@ -409,6 +412,93 @@ class ProfileViewSet(viewsets.ViewSet):
 
 
 
+class ChunkedUploadViewSet(viewsets.ViewSet):
+    """
+    Resumable image uploads: initiate with the file's name, size and
+    SHA-256, PUT each chunk as the raw request body (retry any chunk as
+    often as needed), then finalize. The returned upload id is accepted as
+    `image_upload` by the recipe and profile endpoints.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def _get_upload(self, request, pk, queryset=ChunkedUpload.objects):
+        return get_object_or_404(queryset, pk=pk, user=request.user)
+
+    @staticmethod
+    def _representation(upload):
+        data = ChunkedUploadSerializer(upload).data
+        data['total_chunks'] = upload.total_chunks
+        if upload.status == 'uploading':
+            received = received_chunks(upload)
+            data['received_chunks'] = received
+            data['missing_chunks'] = sorted(set(range(upload.total_chunks)) - set(received))
+        else:
+            data['upload_token'] = str(upload.pk)
+        return data
+
+    @swagger_auto_schema(
+        operation_description="Start a resumable upload. Chunks are numbered from 0; every chunk but the last "
+                              "must be exactly `chunk_size` bytes.",
+        request_body=ChunkedUploadSerializer,
+        responses={201: ChunkedUploadSerializer()},
+        tags=['Uploads']
+    )
+    def create(self, request):
+        serializer = ChunkedUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.save(user=request.user)
+        return Response(self._representation(upload), status=status.HTTP_201_CREATED)
+
+    @swagger_auto_schema(
+        operation_description="Upload state: received and missing chunk indexes while uploading, "
+                              "`upload_token` once finalized. Use it to resume after a dropped connection.",
+        tags=['Uploads']
+    )
+    def retrieve(self, request, pk=None):
+        return Response(self._representation(self._get_upload(request, pk)))
+
+    @swagger_auto_schema(operation_description="Abort an upload and delete its data.", tags=['Uploads'])
+    def destroy(self, request, pk=None):
+        discard_upload(self._get_upload(request, pk))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @swagger_auto_schema(
+        operation_description="Send chunk `index` as the raw request body (application/octet-stream).",
+        request_body=openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_BINARY),
+        tags=['Uploads']
+    )
+    @action(detail=True, methods=['put'], url_path=r'chunks/(?P<index>\d+)')
+    def chunk(self, request, pk=None, index=None):
+        upload = self._get_upload(request, pk)
+        if upload.status != 'uploading':
+            return Response({"error": "This upload is already finalized."}, status=status.HTTP_409_CONFLICT)
+        try:
+            write_chunk(upload, int(index), request.stream)
+        except ChunkError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"index": int(index), "received_chunks": received_chunks(upload)})
+
+    @swagger_auto_schema(
+        operation_description="Assemble the chunks, verify the SHA-256 and the image, and store the file. "
+                              "Returns the `upload_token`.",
+        request_body=no_body,
+        tags=['Uploads']
+    )
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        # The row lock makes a concurrent finalize wait, then see the upload already complete
+        with transaction.atomic():
+            upload = self._get_upload(request, pk, ChunkedUpload.objects.select_for_update())
+            if upload.status == 'uploading':
+                try:
+                    finalize_upload(upload)
+                except ChunkError as e:
+                    return Response({"error": str(e), **self._representation(upload)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self._representation(upload))
+
+
+
+
 class AdminUserPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'page_size'
@@ -421,12 +511,14 @@ class AdminAllUsersView(APIView):
 
     @swagger_auto_schema(
         operation_description="Retrieve all users with their profile data (excluding the current admin and superusers).",
-        tags=['admin']
+        tags=['admin'],
+        manual_parameters=SPARSE_FIELDSET_PARAMETERS
     )
     def get(self, request):
         users = User.objects.select_related('profile')\
             .exclude(id=request.user.id)\
             .filter(is_superuser=False).order_by('-date_joined')
+        users = sparse_queryset(users, UserWithProfileSerializer, request)
 
         # Pagination setup
         paginator = AdminUserPagination()
@@ -2,8 +2,10 @@ from rest_framework.routers import DefaultRouter
 from subscription.views import PackageViewSet
 from django.urls import path, include
 from accounts.views import AdminAllUsersView, UserMonthlyStatsView
-from ManualRecipe.views import AdminUserRecipeStatsView,AdminUserRecipeListView
+from ManualRecipe.views import AdminUserRecipeStatsView,AdminUserRecipeListView,AdminMenuCostingView
 from Task.views import AdminAllTasksListView
+from AiRecipe.views import AIMetricsView, AIRecipeCacheStatsView, AISchedulerStatsView
+from .views import AdminExportView
 
 router = DefaultRouter()
 router.register('packages', PackageViewSet)
@@ -14,5 +16,10 @@ urlpatterns = [
     path('user-Monthly-stats/', UserMonthlyStatsView.as_view(), name='user-daily-stats'),
     path('users-with-recipes/', AdminUserRecipeStatsView.as_view(), name='admin-users-recipes'),
     path('user-recipes/', AdminUserRecipeListView.as_view(), name='admin-user-recipes'),
+    path('menu-costing/', AdminMenuCostingView.as_view(), name='admin-menu-costing'),
     path('tasks/', AdminAllTasksListView.as_view(), name='admin-task-list'),
+    path('ai-recipe-cache/', AIRecipeCacheStatsView.as_view(), name='admin-ai-recipe-cache'),
+    path('ai-scheduler/', AISchedulerStatsView.as_view(), name='admin-ai-scheduler'),
+    path('ai-metrics/', AIMetricsView.as_view(), name='admin-ai-metrics'),
+    path('exports/<str:kind>/', AdminExportView.as_view(), name='admin-export'),
 ]
\ No newline at end of file
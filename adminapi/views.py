@@ -1,3 +1,67 @@
-from django.shortcuts import render
+from django.db.models import F
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from accounts.exports import EXPORT_FORMAT_PARAMETER, EXPORT_FORMATS, export_response, requested_export_format
+from accounts.permissions import IsAdminRole
+from AiRecipe.models import AIGeneratedRecipe, ProTips
+from AiRecipe.views import AI_RECIPE_EXPORT_FIELDS, PRO_TIPS_EXPORT_EXPRESSIONS, PRO_TIPS_EXPORT_FIELDS
+from ManualRecipe.models import ManualRecipe
+from ManualRecipe.views import MANUAL_RECIPE_EXPORT_FIELDS
+
+# kind -> (model, owner lookup, fields, extra columns, file fields)
+ADMIN_EXPORTS = {
+    'manual-recipes': (
+        ManualRecipe, 'user_id', MANUAL_RECIPE_EXPORT_FIELDS,
+        {'user_email': F('user__email')}, ['image'],
+    ),
+    'ai-recipes': (
+        AIGeneratedRecipe, 'user_id', AI_RECIPE_EXPORT_FIELDS,
+        {'user_email': F('user__email')}, ['image'],
+    ),
+    'pro-tips': (
+        ProTips, 'manual_recipe__user_id', PRO_TIPS_EXPORT_FIELDS,
+        {**PRO_TIPS_EXPORT_EXPRESSIONS, 'user_email': F('manual_recipe__user__email')}, [],
+    ),
+}
+
+
+
+
+class AdminExportView(APIView):
+    permission_classes = [IsAdminRole]
+
+    @swagger_auto_schema(
+        operation_description="Stream manual recipes, AI recipes or pro tips as NDJSON or CSV, for one user "
+                              "(`user_id`) or for everyone. Rows carry the owner's email.",
+        manual_parameters=[
+            openapi.Parameter('kind', openapi.IN_PATH, type=openapi.TYPE_STRING, enum=[*ADMIN_EXPORTS]),
+            openapi.Parameter('user_id', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description="Only this user's rows"),
+            EXPORT_FORMAT_PARAMETER,
+        ],
+        tags=["admin"]
+    )
+    def get(self, request, kind):
+        if kind not in ADMIN_EXPORTS:
+            return Response({"error": f"Unknown export. Use one of: {', '.join(ADMIN_EXPORTS)}."},
+                            status=status.HTTP_404_NOT_FOUND)
+        export_format = requested_export_format(request)
+        if export_format is None:
+            return Response({"error": f"file_format must be one of: {', '.join(EXPORT_FORMATS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        model, owner_lookup, fields, expressions, file_fields = ADMIN_EXPORTS[kind]
+        rows = model.objects.order_by('id')
+        filename = kind
+        user_id = request.query_params.get('user_id')
+        if user_id:
+            if not user_id.isdigit():
+                return Response({"error": "user_id must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+            rows = rows.filter(**{owner_lookup: user_id})
+            filename = f"{kind}-user-{user_id}"
+
+        return export_response(request, rows, fields, filename, export_format,
+                               expressions=expressions, file_fields=file_fields)
@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from ManualRecipe.views import ManualRecipeViewSet
-from AiRecipe.views import AIGeneratedRecipeViewSet,CreateProTipsAPIView, ProTipsListAPIView
+from AiRecipe.views import AIGeneratedRecipeViewSet,CreateProTipsAPIView, BulkProTipsAPIView, ProTipsListAPIView, ProTipsExportAPIView
 
 router = DefaultRouter()
 router.register('manual-recipes', ManualRecipeViewSet, basename='manual-recipe')
@@ -10,6 +10,8 @@ router.register('ai-recipes', AIGeneratedRecipeViewSet, basename='ai-recipes')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('generate-pro-tips/bulk/', BulkProTipsAPIView.as_view(), name='generate_pro_tips_bulk'),
     path('generate-pro-tips/<int:recipe_id>/', CreateProTipsAPIView.as_view(), name='generate_pro_tips'),
     path('pro-tips/', ProTipsListAPIView.as_view(), name='list_pro_tips'),
+    path('pro-tips/export/', ProTipsExportAPIView.as_view(), name='export_pro_tips'),
 ]
\ No newline at end of file
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Package,Subscription,StripeEventLog
+from .models import Package,Subscription,StripeEventLog,UsageCounter
 # Register your models here.
 
 
@@ -37,4 +37,13 @@ class SubscriptionAdmin(admin.ModelAdmin):
     )
     list_filter = ('status', 'is_active', 'cancel_at_period_end', 'created_at')
     search_fields = ('user__email', 'package_name', 'stripe_customer_id', 'stripe_subscription_id')
-    ordering = ('-created_at',)
\ No newline at end of file
+    ordering = ('-created_at',)
+
+
+
+
+@admin.register(UsageCounter)
+class UsageCounterAdmin(admin.ModelAdmin):
+    list_display = ('user', 'resource', 'count', 'updated_at')
+    list_filter = ('resource',)
+    search_fields = ('user__email',)
@@ -2,4 +2,32 @@ STATUS_CHOICES = [
     
         ('hold', 'Hold'),
         ('active', 'Active'),
-]
\ No newline at end of file
+]
+
+
+# Resources metered by UsageCounter and their free-tier allowance
+USAGE_AI_RECIPE = 'ai_recipe'
+USAGE_PRO_TIP = 'pro_tip'
+USAGE_RECIPE_IMAGE = 'recipe_image'
+USAGE_RECIPE_IMAGE_URL = 'recipe_image_url'
+
+USAGE_RESOURCE_CHOICES = [
+        (USAGE_AI_RECIPE, 'AI-generated recipes'),
+        (USAGE_PRO_TIP, 'Pro tips'),
+        (USAGE_RECIPE_IMAGE, 'Recipes with an uploaded image'),
+        (USAGE_RECIPE_IMAGE_URL, 'Recipes with an image URL'),
+]
+
+FREE_TIER_LIMITS = {
+    USAGE_AI_RECIPE: 6,
+    USAGE_PRO_TIP: 3,
+    USAGE_RECIPE_IMAGE: 3,
+    USAGE_RECIPE_IMAGE_URL: 3,
+}
+
+QUOTA_EXCEEDED_MESSAGES = {
+    USAGE_AI_RECIPE: "You must buy a subscription to create more than 6 AI-generated recipes.",
+    USAGE_PRO_TIP: "You must buy a subscription to create more than 3 pro tips.",
+    USAGE_RECIPE_IMAGE: "You can only create up to 3 recipes with an image without an active subscription.",
+    USAGE_RECIPE_IMAGE_URL: "You can only create up to 3 recipes with an image URL without an active subscription.",
+}
@@ -1,7 +1,7 @@
 from functools import wraps
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Subscription
+from .entitlements import current_subscription
 
 
 
@@ -20,14 +20,9 @@ def subscription_required(view_func):
         if user.role != 'member':
             return Response({"error": "You are not a valid user."}, status=status.HTTP_403_FORBIDDEN)
         
-        try:
-            # Check if the user has an active subscription
-            subscription = user.subscriptions.filter(is_active=True).latest('created_at')
-            if subscription.is_active_subscription():  # Ensure that `is_active_subscription` is a method in your model
-                return view_func(request, *args, **kwargs)
-            else:
-                return Response({"error": "You do not have an active subscription plan."}, status=status.HTTP_403_FORBIDDEN)
-        except Subscription.DoesNotExist:
-            return Response({"error": "You do not have an active subscription plan."}, status=status.HTTP_403_FORBIDDEN)
+        # Check if the user has an active subscription whose billing period has not ended
+        if current_subscription(user) is not None:
+            return view_func(request, *args, **kwargs)
+        return Response({"error": "You do not have an active subscription plan."}, status=status.HTTP_403_FORBIDDEN)
 
     return _wrapped_view
\ No newline at end of file
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Subscription
+
+
+ENTITLEMENT_FIELDS = ('id', 'package_name', 'status', 'current_period_end', 'cancel_at_period_end')
+
+# Attribute on the user object that memoizes the entitlement for the rest of the request
+_REQUEST_ATTR = '_subscription_entitlement'
+_MISSING = object()
+
+
+def _cache_key(user_id):
+    return f"subscription:entitlement:{user_id}"
+
+
+def _user_id(user):
+    return getattr(user, 'pk', user)
+
+
+def _load_entitlement(user_id):
+    # Served by the partial index on active subscriptions
+    return (
+        Subscription.objects
+        .filter(user_id=user_id, is_active=True)
+        .order_by(F('current_period_end').desc(nulls_last=True))
+        .values(*ENTITLEMENT_FIELDS)
+        .first()
+    )
+
+
+def get_entitlement(user):
+    """
+    Return the user's active subscription as a dict of ENTITLEMENT_FIELDS,
+    or None. Resolved at most once per request (memoized on the user
+    object). With ENTITLEMENT_CACHE_TTL set it is also cached across
+    requests, which needs a cache shared by every worker (CACHE_URL) so
+    invalidate_entitlement() reaches them all.
+    """
+    entitlement = getattr(user, _REQUEST_ATTR, _MISSING)
+    if entitlement is not _MISSING:
+        return entitlement
+
+    if settings.ENTITLEMENT_CACHE_TTL > 0:
+        key = _cache_key(user.pk)
+        entitlement = cache.get(key, _MISSING)
+        if entitlement is _MISSING:
+            entitlement = _load_entitlement(user.pk)
+            cache.set(key, entitlement, settings.ENTITLEMENT_CACHE_TTL)
+    else:
+        entitlement = _load_entitlement(user.pk)
+
+    setattr(user, _REQUEST_ATTR, entitlement)
+    return entitlement
+
+
+def has_active_subscription(user):
+    """True if the user has a subscription flagged active (free-tier limits and AI priority)."""
+    return get_entitlement(user) is not None
+
+
+def current_subscription(user):
+    """The active subscription if its billing period has not ended yet, else None."""
+    entitlement = get_entitlement(user)
+    if entitlement is None or entitlement['current_period_end'] is None:
+        return None
+    if entitlement['current_period_end'] <= timezone.now():
+        return None
+    return entitlement
+
+
+def invalidate_entitlement(user):
+    """
+    Drop the cached entitlement of a user (instance or id) once the current
+    transaction commits, so the next request reads the new subscription state.
+    Called on every Subscription save and delete (see subscription.signals).
+    """
+    user_id = _user_id(user)
+    if hasattr(user, _REQUEST_ATTR):
+        delattr(user, _REQUEST_ATTR)
+    transaction.on_commit(lambda: cache.delete(_cache_key(user_id)))
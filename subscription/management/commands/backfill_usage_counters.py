@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import User
+from subscription.constants import FREE_TIER_LIMITS
+from subscription.models import UsageCounter
+from subscription.usage import count_usage
+
+
+class Command(BaseCommand):
+    help = "Recompute every member's usage counters from the rows they meter (safe to re-run)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="Only backfill this user id.")
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(role='member').only('id')
+        if options['user']:
+            users = users.filter(id=options['user'])
+
+        changed = 0
+        for user in users.iterator(chunk_size=500):
+            for resource in FREE_TIER_LIMITS:
+                count = count_usage(user, resource)
+                _, created = UsageCounter.objects.get_or_create(user=user, resource=resource, defaults={'count': count})
+                if not created:
+                    changed += UsageCounter.objects.filter(user=user, resource=resource).exclude(count=count).update(count=count)
+                else:
+                    changed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Usage counters written or corrected: {changed}"))
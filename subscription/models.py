@@ -1,5 +1,5 @@
 from django.db import models
-from .constants import STATUS_CHOICES
+from .constants import STATUS_CHOICES, USAGE_RESOURCE_CHOICES
 from accounts.models import User
 # Create your models here.
 
@@ -39,6 +39,16 @@ class Subscription(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Entitlement lookups only ever read active rows
+            models.Index(
+                fields=['user', 'is_active', 'current_period_end'],
+                condition=models.Q(is_active=True),
+                name='subscription_active_idx',
+            ),
+        ]
+
     def __str__(self):
         
         return f"{self.user.email} - {self.package_name}"
@@ -54,3 +64,21 @@ class StripeEventLog(models.Model):
 
     def __str__(self):
         return self.event_id
+    
+
+
+
+class UsageCounter(models.Model):
+    """Running count of a user's metered resource, kept in step with the rows it counts."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='usage_counters')
+    resource = models.CharField(max_length=30, choices=USAGE_RESOURCE_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'resource'], name='unique_usage_counter'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.email} - {self.resource}: {self.count}"
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .entitlements import invalidate_entitlement
+from .models import Subscription
+
+
+@receiver([post_save, post_delete], sender=Subscription)
+def invalidate_subscription_entitlement(sender, instance, **kwargs):
+    # Webhooks, cancellation and admin edits all save the row, so none of them can serve a stale entitlement
+    invalidate_entitlement(instance.user if Subscription.user.is_cached(instance) else instance.user_id)
@@ -1,3 +1,123 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from .constants import FREE_TIER_LIMITS, USAGE_PRO_TIP
+from .entitlements import get_entitlement
+from .models import Subscription, UsageCounter
+from .usage import QuotaExceeded, release_usage, reserve_usage, usage_remaining
+
+
+class UsageLedgerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email='member@example.com', username='member@example.com', role='member')
+
+    def count(self):
+        return UsageCounter.objects.get(user=self.user, resource=USAGE_PRO_TIP).count
+
+    def test_reserve_counts_down_to_the_free_tier_limit(self):
+        limit = FREE_TIER_LIMITS[USAGE_PRO_TIP]
+        remaining = [reserve_usage(self.user, USAGE_PRO_TIP) for _ in range(limit)]
+        self.assertEqual(remaining, list(range(limit - 1, -1, -1)))
+        with self.assertRaises(QuotaExceeded):
+            reserve_usage(self.user, USAGE_PRO_TIP)
+        self.assertEqual(self.count(), limit)
+
+    def test_release_gives_a_use_back(self):
+        reserve_usage(self.user, USAGE_PRO_TIP, amount=FREE_TIER_LIMITS[USAGE_PRO_TIP])
+        release_usage(self.user, USAGE_PRO_TIP)
+        self.assertEqual(usage_remaining(self.user, USAGE_PRO_TIP), 1)
+        reserve_usage(self.user, USAGE_PRO_TIP)
+
+    def test_first_use_seeded_by_a_concurrent_request_is_still_counted(self):
+        get_or_create = UsageCounter.objects.get_or_create
+
+        def seeded_concurrently(**kwargs):
+            # The parallel first request wins the insert between our update and get_or_create
+            UsageCounter.objects.create(user=self.user, resource=USAGE_PRO_TIP, count=1)
+            return get_or_create(**kwargs)
+
+        with mock.patch.object(UsageCounter.objects, 'get_or_create', side_effect=seeded_concurrently):
+            remaining = reserve_usage(self.user, USAGE_PRO_TIP)
+
+        self.assertEqual(self.count(), 2)
+        self.assertEqual(remaining, FREE_TIER_LIMITS[USAGE_PRO_TIP] - 2)
+
+    def test_concurrent_seed_at_the_limit_still_raises(self):
+        get_or_create = UsageCounter.objects.get_or_create
+        limit = FREE_TIER_LIMITS[USAGE_PRO_TIP]
+
+        def seeded_concurrently(**kwargs):
+            UsageCounter.objects.create(user=self.user, resource=USAGE_PRO_TIP, count=limit)
+            return get_or_create(**kwargs)
+
+        with mock.patch.object(UsageCounter.objects, 'get_or_create', side_effect=seeded_concurrently):
+            with self.assertRaises(QuotaExceeded):
+                reserve_usage(self.user, USAGE_PRO_TIP)
+        self.assertEqual(self.count(), limit)
+
+
+
+
+@override_settings(ENTITLEMENT_CACHE_TTL=300)
+class EntitlementTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create(email='member@example.com', username='member@example.com', role='member')
+        self.subscription = Subscription.objects.create(
+            user=self.user, stripe_customer_id='cus_1', stripe_subscription_id='sub_1', status='active',
+            is_active=True, current_period_end=timezone.now() + timedelta(days=30),
+        )
+
+    def fresh_entitlement(self):
+        # A new request loads a new user object, so only the shared cache can answer it
+        return get_entitlement(User.objects.get(pk=self.user.pk))
+
+    def test_entitlement_is_resolved_once_per_request(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_entitlement(self.user)['id'], self.subscription.pk)
+            get_entitlement(self.user)
+
+    def test_later_requests_are_served_from_the_cache(self):
+        self.fresh_entitlement()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.fresh_entitlement()['id'], self.subscription.pk)
+
+    @override_settings(ENTITLEMENT_CACHE_TTL=0)
+    def test_without_a_shared_cache_every_request_reads_the_database(self):
+        self.fresh_entitlement()
+        with self.assertNumQueries(2):
+            self.fresh_entitlement()
+
+    def test_any_save_of_the_subscription_drops_the_cached_entitlement(self):
+        self.fresh_entitlement()
+        with self.captureOnCommitCallbacks(execute=True):
+            # As an admin edit would
+            self.subscription.is_active = False
+            self.subscription.save()
+        self.assertIsNone(self.fresh_entitlement())
+
+    def test_cancelled_by_webhook(self):
+        self.fresh_entitlement()
+        event = {'id': 'evt_1', 'type': 'customer.subscription.deleted', 'data': {'object': {'id': 'sub_1'}}}
+        with mock.patch('stripe.Webhook.construct_event', return_value=event), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post('/subscription/stripe-webhook/', {}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(self.fresh_entitlement())
+
+    def test_cancelled_by_the_member(self):
+        self.fresh_entitlement()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch('stripe.Subscription.modify'), self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/subscription/cancel-subscription/')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertIsNone(self.fresh_entitlement())
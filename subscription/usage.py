@@ -0,0 +1,96 @@
+from django.db.models import F
+
+from .entitlements import has_active_subscription
+from .constants import (
+    FREE_TIER_LIMITS, QUOTA_EXCEEDED_MESSAGES,
+    USAGE_AI_RECIPE, USAGE_PRO_TIP, USAGE_RECIPE_IMAGE, USAGE_RECIPE_IMAGE_URL,
+)
+from .models import UsageCounter
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, resource):
+        self.resource = resource
+        super().__init__(QUOTA_EXCEEDED_MESSAGES[resource])
+
+
+def count_usage(user, resource):
+    """Count the rows a resource's ledger mirrors. Used to seed and backfill counters."""
+    from AiRecipe.models import AIGeneratedRecipe, ProTips
+    from ManualRecipe.models import ManualRecipe
+
+    if resource == USAGE_AI_RECIPE:
+        return AIGeneratedRecipe.objects.filter(user=user).count()
+    if resource == USAGE_PRO_TIP:
+        return ProTips.objects.filter(manual_recipe__user=user).count()
+    if resource == USAGE_RECIPE_IMAGE:
+        return ManualRecipe.objects.filter(user=user).exclude(image__isnull=True).exclude(image='').count()
+    if resource == USAGE_RECIPE_IMAGE_URL:
+        return ManualRecipe.objects.filter(user=user).exclude(image_url__isnull=True).exclude(image_url='').count()
+    raise ValueError(f"Unknown usage resource {resource!r}")
+
+
+def recipe_image_resource(image, image_url):
+    """The resource a manual recipe's picture counts against: an uploaded image wins over an image URL."""
+    if image:
+        return USAGE_RECIPE_IMAGE
+    if image_url:
+        return USAGE_RECIPE_IMAGE_URL
+    return None
+
+
+def _has_free_tier_limits(user):
+    return user.role == 'member' and not has_active_subscription(user)
+
+
+def reserve_usage(user, resource, amount=1):
+    """
+    Count `amount` new uses of `resource` against the user's ledger.
+
+    Free-tier members are checked and incremented in one conditional UPDATE,
+    so concurrent requests cannot both take the last unit. Raises
+    QuotaExceeded when the allowance would be exceeded. Returns the
+    remaining allowance, or None when the user is not limited (usage is
+    still counted so the ledger stays accurate if a subscription lapses).
+    """
+    limited = _has_free_tier_limits(user)
+    limit = FREE_TIER_LIMITS[resource]
+    counters = UsageCounter.objects.filter(user=user, resource=resource)
+    if limited:
+        counters = counters.filter(count__lte=limit - amount)
+
+    updated = counters.update(count=F('count') + amount)
+    if not updated:
+        # Maybe the first use of the resource: seed the counter from existing rows,
+        # then retry. The counter may just have been seeded by a concurrent request,
+        # so the conditional update decides either way.
+        UsageCounter.objects.get_or_create(
+            user=user, resource=resource, defaults={'count': count_usage(user, resource)}
+        )
+        updated = counters.update(count=F('count') + amount)
+    if not updated:
+        raise QuotaExceeded(resource)
+
+    if not limited:
+        return None
+    used = UsageCounter.objects.filter(user=user, resource=resource).values_list('count', flat=True).get()
+    return max(limit - used, 0)
+
+
+def release_usage(user, resource, amount=1):
+    """Give back uses of `resource` (failed generation or deleted row)."""
+    UsageCounter.objects.filter(user=user, resource=resource, count__gte=amount).update(count=F('count') - amount)
+
+
+def usage_remaining(user, resource):
+    """Remaining free-tier allowance from a single counter read; None when not limited."""
+    if not _has_free_tier_limits(user):
+        return None
+    counter = UsageCounter.objects.filter(user=user, resource=resource).values_list('count', flat=True).first()
+    used = count_usage(user, resource) if counter is None else counter
+    return max(FREE_TIER_LIMITS[resource] - used, 0)
+
+
+def quota_headers(remaining):
+    """Response headers reporting the allowance left after a metered request."""
+    return {'X-Quota-Remaining': 'unlimited' if remaining is None else str(remaining)}
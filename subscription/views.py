@@ -3,6 +3,7 @@ from django.conf import settings
 from rest_framework import viewsets,permissions,status,generics
 from .models import Package,Subscription,StripeEventLog
 from .serializers import PackageSerializer
+from .entitlements import current_subscription
 from drf_yasg.utils import swagger_auto_schema
 from django.utils.decorators import method_decorator
 from accounts.permissions import IsAdminRole
@@ -176,13 +177,7 @@ class CreateCheckoutSessionView(APIView):
                 return Response({'error': 'price_id is required'}, status=400)
             
 
-            active_subscription = Subscription.objects.filter(
-            user=user,
-            is_active=True,
-            current_period_end__gt=timezone.now()
-            ).first()
-
-            if active_subscription:
+            if current_subscription(user):
                 return Response({
                     'error': 'You already have an active subscription. Please cancel it before subscribing to a new package.'
                 }, status=400)
@@ -392,18 +387,14 @@ class SubscriptionStatusView(APIView):
     def get(self, request, *args, **kwargs):
         user = request.user
 
-        subscription = Subscription.objects.filter(
-            user=user,
-            is_active=True,
-            current_period_end__gt=timezone.now()
-        ).first()
+        subscription = current_subscription(user)
 
         if not subscription:
             return Response({'detail': 'No active subscription found.'}, status=404)
 
         return Response({
-            'package_name': subscription.package_name,
-            'status': subscription.status,
-            'current_period_end': subscription.current_period_end,
-            'cancel_at_period_end': subscription.cancel_at_period_end,
+            'package_name': subscription['package_name'],
+            'status': subscription['status'],
+            'current_period_end': subscription['current_period_end'],
+            'cancel_at_period_end': subscription['cancel_at_period_end'],
         })